@@ -0,0 +1,223 @@
+"""measures the throughput of IDACyber's color filters outside of IDA.
+
+every filter found in the "cyber" folder renders synthetic databases
+(random bytes, zeros, x86 code, text and a mix of these with unmapped
+gaps) at several canvas sizes, one byte per pixel (zoom 1). for each
+combination, the best of several runs is reported in MB/s, along with
+the peak of memory allocated while rendering once, in bytes per pixel
+(including the 5 bytes per pixel of the frame buffer) and in total.
+fetching the bytes isn't part of the measurement, taking snapshots of
+threaded filters is.
+
+instead of the synthetic databases, filters can render a raw or ELF
+file along with the functions, items, xrefs and names exported from
+an IDB by export_idb.py:
+
+    python bench/bench_filters.py --file target.elf --sidecar target.elf.cyber.json
+
+results can be saved and compared against those of another commit:
+
+    python bench/bench_filters.py --save before.json
+    git checkout other-branch
+    python bench/bench_filters.py --compare before.json --threshold 10
+
+--compare exits with status 1 if the throughput of any combination
+dropped, or its peak memory grew, by more than --threshold percent."""
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import traceback
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+FILTER_DIR = os.path.join(ROOT_DIR, 'cyber')
+sys.path[:0] = [ROOT_DIR, FILTER_DIR]
+
+import idastubs
+idastubs.install()
+
+from idacyber import IDBBufHandler, RenderEngine, RenderJob, FrameBuffer, SharedCache
+
+SIZES = ((64, 64), (256, 256), (640, 480), (1024, 768), (1920, 1080), (3840, 2160))
+DATASETS = ('random', 'zero', 'code', 'text', 'mixed')
+
+# -----------------------------------------------------------------------
+class BenchEngine(RenderEngine):
+    """RenderEngine that takes the place of the widget for filters,
+    ignoring their timers and requests to redraw the canvas"""
+    def on_filter_register_timer(self, interval, callback):
+        return None
+
+    def on_filter_unregister_timer(self, timer):
+        return True
+
+    def on_filter_request_update(self, ea=None, center=True, immediate=False):
+        return
+
+    def on_filter_request_overlay(self):
+        return
+
+    def on_filter_update_zoom_delta(self, delta):
+        return
+
+# -----------------------------------------------------------------------
+def load_filters(names=None):
+    """imports and activates the filters of the "cyber" folder.
+    returns a list of (module name, BenchEngine) tuples, sorted by
+    module name"""
+    filters = []
+    for entry in sorted(os.listdir(FILTER_DIR)):
+        mod, ext = os.path.splitext(entry)
+        if ext.lower() != '.py' or mod.lower() == '__init__':
+            continue
+        if names and mod not in names:
+            continue
+        try:
+            fmod = __import__(mod)
+            engine = BenchEngine(None)
+            engine.fm = fmod.FILTER_INIT(engine)
+            if engine.fm is not None:
+                engine.fm.on_activate(len(filters))
+                filters.append((mod, engine))
+        except Exception:
+            print('%s: failed to load' % mod)
+            traceback.print_exc()
+    return filters
+
+def render(engine, buffers, addr, width, height):
+    """colors one frame the way RenderEngine.render_frame() does,
+    using bytes that have been fetched in advance"""
+    fm = engine.fm
+    size = width * height
+    fb = FrameBuffer(width, height, sum(len(buf) for _, buf in buffers))
+    count = fb.set_mapped(buffers)
+    job = RenderJob(fm, buffers, addr, size, 0, fb, count)
+    if fm.threaded:
+        for _ in job.take_snapshot():
+            pass
+    return job.run()
+
+def measure(engine, buffers, addr, width, height, min_time, max_runs):
+    """returns (best time of one run in seconds, peak memory in bytes).
+    metadata cached by earlier runs is dropped before each run"""
+    engine.width = width
+    engine.count = width * height
+    times = []
+    while len(times) < max_runs and sum(times) < min_time:
+        SharedCache.get().invalidate_metadata()
+        start = time.perf_counter()
+        render(engine, buffers, addr, width, height)
+        times.append(time.perf_counter() - start)
+
+    SharedCache.get().invalidate_metadata()
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    render(engine, buffers, addr, width, height)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return (min(times), peak)
+
+def run(args):
+    sizes = [tuple(map(int, size.lower().split('x'))) for size in args.sizes.split(',')]
+    filters = load_filters(args.filters.split(',') if args.filters else None)
+    max_pixels = max(width * height for width, height in sizes)
+    if args.file:
+        db = idastubs.load_file(args.file, args.sidecar, int(args.base, 0))
+        databases = [(db.name, lambda: db)]
+    else:
+        databases = [(dataset, lambda dataset=dataset: idastubs.make_database(dataset, max_pixels))
+            for dataset in args.datasets.split(',')]
+
+    results = []
+    print('%-12s %-7s %10s %10s %10s %12s' % ('filter', 'data', 'canvas', 'MB/s', 'B/px', 'peak KiB'))
+    for dataset, make_database in databases:
+        db = make_database()
+        idastubs.use(db)
+        bh = IDBBufHandler(cache_size=2 * max_pixels)
+        addr = int(args.addr, 0) if args.addr else db.min_ea
+        for mod, engine in filters:
+            engine.bh = bh
+            prev = None
+            for width, height in sizes:
+                pixels = width * height
+                canvas = '%dx%d' % (width, height)
+                # skip canvases that would take longer than the budget
+                if prev and prev[0] * pixels / prev[1] > args.budget:
+                    print('%-12s %-7s %10s %10s' % (mod, dataset, canvas, 'skipped'))
+                    continue
+                buffers = bh.get_buffers(addr, pixels)
+                # files may end before the canvas does
+                count = sum(len(buf) for _, buf in buffers)
+                if not count:
+                    break
+                try:
+                    seconds, peak = measure(engine, buffers, addr, width, height, args.min_time, args.runs)
+                except Exception as e:
+                    print('%-12s %-7s %10s %10s  %r' % (mod, dataset, canvas, 'error', e))
+                    break
+                prev = (seconds, count)
+                result = {'filter': mod,
+                    'dataset': dataset,
+                    'canvas': canvas,
+                    'mbps': count / seconds / 1e6,
+                    'bytes_per_pixel': peak / pixels,
+                    'peak': peak}
+                results.append(result)
+                print('%-12s %-7s %10s %10.2f %10.1f %12.1f' % (mod, dataset, canvas,
+                    result['mbps'], result['bytes_per_pixel'], peak / 1024))
+    return results
+
+def compare(results, baseline, threshold):
+    """prints the combinations that regressed by more than 'threshold'
+    percent compared to 'baseline'. returns their number"""
+    base = {(r['filter'], r['dataset'], r['canvas']): r for r in baseline}
+    regressions = 0
+    for r in results:
+        b = base.get((r['filter'], r['dataset'], r['canvas']))
+        if b is None:
+            continue
+        speed = (r['mbps'] / b['mbps'] - 1) * 100
+        memory = (r['peak'] / b['peak'] - 1) * 100 if b['peak'] else 0
+        if speed < -threshold or memory > threshold:
+            regressions += 1
+            print('%-12s %-7s %10s  %8.2f -> %8.2f MB/s (%+.1f%%), peak %+.1f%%' % (
+                r['filter'], r['dataset'], r['canvas'], b['mbps'], r['mbps'], speed, memory))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the throughput of IDACyber color filters.')
+    parser.add_argument('--filters', help='comma separated module names of the filters, e.g. NES,xor (default: all)')
+    parser.add_argument('--datasets', default=','.join(DATASETS), help='comma separated datasets (default: %(default)s)')
+    parser.add_argument('--sizes', default=','.join('%dx%d' % size for size in SIZES), help='comma separated canvas sizes (default: %(default)s)')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds to spend repeating each measurement (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=20, help='maximum number of runs per measurement (default: %(default)s)')
+    parser.add_argument('--budget', type=float, default=10.0, help='skips canvases that are expected to take longer than this many seconds per run (default: %(default)s)')
+    parser.add_argument('--file', help='renders a raw or ELF file instead of the synthetic datasets')
+    parser.add_argument('--sidecar', help='JSON file written by export_idb.py (default: FILE%s if it exists)' % idastubs.SIDECAR_EXT)
+    parser.add_argument('--base', default=hex(idastubs.BASE), help='address at which raw files are loaded (default: %(default)s)')
+    parser.add_argument('--addr', help='address at which rendering starts (default: lowest address)')
+    parser.add_argument('--save', metavar='FILE', help='writes the results to a JSON file')
+    parser.add_argument('--compare', metavar='FILE', help='compares the results to those saved to a JSON file earlier')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percentage of change considered a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'sizes': args.sizes, 'results': results}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        print('\nregressions of more than %g%% compared to %s:' % (args.threshold, args.compare))
+        regressions = compare(results, baseline, args.threshold)
+        print('%d found' % regressions)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
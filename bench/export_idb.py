@@ -0,0 +1,108 @@
+"""IDAPython script that exports what the stand-in IDA modules of
+idastubs.py need to know about the database open in IDA: segments,
+functions, items, instructions, xrefs and names. run it from within
+IDA (File/Script file...) to write a JSON sidecar, which by default is
+named after the input file followed by ".cyber.json". along with the
+input file, the sidecar allows filters to be run outside of IDA:
+
+    python bench/bench_filters.py --file target.elf"""
+import json
+
+import ida_bytes
+import ida_segment
+import ida_funcs
+import ida_ua
+import ida_idp
+import ida_xref
+import ida_name
+import ida_nalt
+import ida_loader
+import ida_kernwin
+import ida_idaapi
+
+SIDECAR_EXT = '.cyber.json'
+
+# item kinds, see idastubs.py
+ITEM_DATA, ITEM_CODE, ITEM_STRING = range(3)
+
+# -----------------------------------------------------------------------
+def export_segments():
+    segments = []
+    for i in range(ida_segment.get_segm_qty()):
+        seg = ida_segment.getnseg(i)
+        # bytes of segments that aren't backed by the input file have no value
+        offset = ida_loader.get_fileregion_offset(seg.start_ea)
+        segments.append({'name': ida_segment.get_segm_name(seg),
+            'start': seg.start_ea,
+            'end': seg.end_ea,
+            'perm': seg.perm,
+            'offset': offset,
+            'size': seg.end_ea - seg.start_ea if offset != -1 else 0})
+    return segments
+
+def export_heads():
+    """returns (items, insns, xrefs). single byte data items are left out"""
+    items = []
+    insns = []
+    xrefs = []
+    insn = ida_ua.insn_t()
+    xb = ida_xref.xrefblk_t()
+    for i in range(ida_segment.get_segm_qty()):
+        seg = ida_segment.getnseg(i)
+        ea = seg.start_ea
+        if not ida_bytes.is_head(ida_bytes.get_flags(ea)):
+            ea = ida_bytes.next_head(ea, seg.end_ea)
+        while ea != ida_idaapi.BADADDR:
+            flags = ida_bytes.get_flags(ea)
+            size = ida_bytes.get_item_size(ea)
+            if ida_bytes.is_code(flags):
+                items.append([ea, size, ITEM_CODE])
+                if ida_ua.decode_insn(insn, ea) > 0:
+                    insns.append([ea, insn.get_canon_mnem(), insn.Op1.type, insn.Op2.type,
+                        bool(ida_idp.is_ret_insn(insn))])
+            elif ida_bytes.is_strlit(flags):
+                items.append([ea, size, ITEM_STRING])
+            elif size > 1:
+                items.append([ea, size, ITEM_DATA])
+
+            ok = xb.first_to(ea, ida_xref.XREF_ALL)
+            while ok:
+                xrefs.append([ea, xb.frm])
+                ok = xb.next_to()
+            ea = ida_bytes.next_head(ea, seg.end_ea)
+    return (items, insns, xrefs)
+
+def export_functions():
+    functions = []
+    for i in range(ida_funcs.get_func_qty()):
+        f = ida_funcs.getn_func(i)
+        functions.append([f.start_ea, f.end_ea, ida_funcs.get_func_name(f.start_ea)])
+    return functions
+
+def export_names():
+    return [[ida_name.get_nlist_ea(i), ida_name.get_nlist_name(i)]
+        for i in range(ida_name.get_nlist_size())]
+
+def export(fname):
+    items, insns, xrefs = export_heads()
+    info = {'version': 1,
+        'input_file': ida_nalt.get_root_filename(),
+        'segments': export_segments(),
+        'functions': export_functions(),
+        'items': items,
+        'insns': insns,
+        'xrefs': xrefs,
+        'names': export_names()}
+    with open(fname, 'w') as f:
+        json.dump(info, f, separators=(',', ':'))
+    ida_kernwin.msg('Exported %d items, %d functions and %d xrefs to %s\n' % (
+        len(items), len(info['functions']), len(xrefs), fname))
+
+def main():
+    fname = ida_kernwin.ask_file(1, ida_nalt.get_input_file_path() + SIDECAR_EXT,
+        'Export IDACyber sidecar')
+    if fname:
+        export(fname)
+
+if __name__ == '__main__':
+    main()
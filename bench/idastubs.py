@@ -0,0 +1,648 @@
+"""stand-in IDA modules that allow IDACyber and its filters to be run
+outside of IDA, e.g. for benchmarks. install() registers them with
+sys.modules, where they answer for a Database, which is either synthetic
+(see make_database()) or backed by a raw or ELF file plus a JSON sidecar
+written by export_idb.py (see load_file()). IDA functions that aren't
+implemented here are replaced by functions returning None."""
+import os
+import sys
+import json
+import types
+import struct
+from random import Random
+from bisect import bisect_right
+
+BADADDR = 0xFFFFFFFFFFFFFFFF
+BASE = 0x400000
+
+# address space of a Database: segments, gaps of SEGMENT_GAP bytes
+# between them and uninitialized bytes within
+SEGMENT_GAP = 0x2000
+
+# suffix of the JSON sidecar written by export_idb.py
+SIDECAR_EXT = '.cyber.json'
+
+# flags as returned by get_flags()
+MS_CLS = 0x600
+FF_CODE = 0x600
+FF_DATA = 0x400
+FF_TAIL = 0x200
+FF_IVL = 0x100
+DT_TYPE = 0xF0000000
+FF_STRLIT = 0x50000000
+
+SEGPERM_EXEC = 1
+SEGPERM_WRITE = 2
+SEGPERM_READ = 4
+
+# operand types, same values as IDA's
+o_void, o_reg, o_mem, o_phrase, o_displ, o_imm, o_far, o_near = range(8)
+
+# instruction types
+NN_null, NN_mov, NN_push, NN_pop, NN_xor, NN_call, NN_jmp, NN_nop, NN_retn, NN_int3 = range(10)
+
+# canonical mnemonics, as exported by export_idb.py -> instruction type
+MNEMONICS = {'mov': NN_mov, 'push': NN_push, 'pop': NN_pop, 'xor': NN_xor,
+    'call': NN_call, 'jmp': NN_jmp, 'nop': NN_nop, 'retn': NN_retn, 'int3': NN_int3}
+
+# x86 instructions known to decode_insn(): opcode -> (itype, op1, op2, size).
+# a size of None means the size depends on the ModR/M byte
+OPCODES = {
+    0x31: (NN_xor, o_reg, o_reg, 2),
+    0x55: (NN_push, o_reg, o_void, 1),
+    0x5D: (NN_pop, o_reg, o_void, 1),
+    0x89: (NN_mov, o_reg, o_reg, None),
+    0x8B: (NN_mov, o_reg, o_reg, None),
+    0x90: (NN_nop, o_void, o_void, 1),
+    0xA1: (NN_mov, o_reg, o_mem, 5),
+    0xC3: (NN_retn, o_void, o_void, 1),
+    0xCC: (NN_int3, o_void, o_void, 1),
+    0xE8: (NN_call, o_near, o_void, 5),
+    0xEB: (NN_jmp, o_near, o_void, 2)}
+
+# item kinds
+ITEM_DATA, ITEM_CODE, ITEM_STRING = range(3)
+
+WORDS = ("the", "of", "and", "error", "file", "cannot", "open", "invalid",
+    "%s", "%d", "memory", "allocation", "failed", "user", "config", "path",
+    "version", "0x%08X", "unknown", "option", "Usage:", "--help", "http://",
+    "window", "buffer", "overflow", "read", "write", "key", "value")
+
+# -----------------------------------------------------------------------
+class Segment():
+    """'size' bytes of data at 'start_ea', built by repeating 'block'.
+    'items' describes the items of one block as sorted lists of
+    (heads, sizes, kinds), bytes not covered by any item are single
+    byte data items. the last 'uninitialized' bytes of the segment
+    have no value"""
+    def __init__(self, start_ea, size, block, items=None, perm=SEGPERM_READ|SEGPERM_WRITE, uninitialized=0, name=None):
+        self.start_ea = start_ea
+        self.end_ea = start_ea + size
+        self.perm = perm
+        self.name = name
+        self.block_size = len(block)
+        self.data = (block * (size // len(block) + 1))[:size]
+        self.initialized = size - uninitialized
+        self.heads, self.sizes, self.kinds = items if items else ([], [], [])
+
+    def contains(self, ea):
+        return self.start_ea <= ea < self.end_ea
+
+    def get_item(self, ea):
+        """returns (head, size, kind) of the item at 'ea'"""
+        offs = ea - self.start_ea
+        if offs < self.initialized:
+            block_offs = offs % self.block_size
+            i = bisect_right(self.heads, block_offs) - 1
+            if i >= 0 and block_offs < self.heads[i] + self.sizes[i]:
+                head = ea - (block_offs - self.heads[i])
+                if head + self.sizes[i] <= self.start_ea + self.initialized:
+                    return (head, self.sizes[i], self.kinds[i])
+        return (ea, 1, ITEM_DATA)
+
+# -----------------------------------------------------------------------
+class Database():
+    """database made of Segments, sorted by address. 'functions' is a
+    list of (start, end) tuples, 'names' maps addresses to names, 'xrefs'
+    maps addresses to the list of addresses referring to them and 'insns'
+    maps the heads of instructions to (itype, op1, op2). without them,
+    every block of a code segment is one function, there are no names,
+    xrefs are made up and instructions are decoded from their bytes"""
+    def __init__(self, segments, name=None, functions=None, names=None, xrefs=None, insns=None):
+        self.name = name
+        self.segments = sorted(segments, key=lambda seg: seg.start_ea)
+        self.starts = [seg.start_ea for seg in self.segments]
+        self.min_ea = self.segments[0].start_ea if self.segments else BASE
+        self.max_ea = self.segments[-1].end_ea if self.segments else BASE
+        self.functions = sorted(functions) if functions is not None else None
+        self.func_starts = [start for start, _ in self.functions or ()]
+        self.names = names or {}
+        self.xrefs = xrefs
+        self.insns = insns
+
+    def getseg(self, ea):
+        i = bisect_right(self.starts, ea) - 1
+        if i >= 0 and self.segments[i].contains(ea):
+            return self.segments[i]
+        return None
+
+    def get_bytes_and_mask(self, ea, size):
+        """returns (bytes, mask) like ida_bytes.get_bytes_and_mask(),
+        where bit n of the mask is set if byte n has a value"""
+        end = min(ea + size, self.max_ea)
+        if ea >= end or ea < self.min_ea:
+            return None
+        buf = bytearray(end - ea)
+        bits = bytearray(end - ea)
+        i = max(0, bisect_right(self.starts, ea) - 1)
+        for seg in self.segments[i:]:
+            if seg.start_ea >= end:
+                break
+            lo = max(ea, seg.start_ea)
+            hi = min(end, seg.end_ea)
+            if lo >= hi:
+                continue
+            buf[lo - ea:hi - ea] = seg.data[lo - seg.start_ea:hi - seg.start_ea]
+            init_hi = min(hi, seg.start_ea + seg.initialized)
+            if lo < init_hi:
+                bits[lo - ea:init_hi - ea] = b'\x01' * (init_hi - lo)
+        return (bytes(buf), pack_bits(bits))
+
+    def get_byte(self, ea):
+        seg = self.getseg(ea)
+        if seg is None or ea - seg.start_ea >= seg.initialized:
+            return 0xFF
+        return seg.data[ea - seg.start_ea]
+
+    def get_item(self, ea):
+        seg = self.getseg(ea)
+        if seg is None:
+            return (ea, 1, ITEM_DATA)
+        return seg.get_item(ea)
+
+    def get_flags(self, ea):
+        seg = self.getseg(ea)
+        if seg is None:
+            return 0
+        if ea - seg.start_ea >= seg.initialized:
+            return FF_DATA
+        head, _, kind = seg.get_item(ea)
+        flags = FF_IVL | self.get_byte(ea)
+        flags |= FF_CODE if kind == ITEM_CODE else FF_DATA
+        if kind == ITEM_STRING:
+            flags |= FF_STRLIT
+        if head != ea:
+            flags = (flags & ~MS_CLS) | FF_TAIL
+        return flags
+
+    def get_func(self, ea):
+        if self.functions is not None:
+            i = bisect_right(self.func_starts, ea) - 1
+            if i >= 0 and ea < self.functions[i][1]:
+                return func_t(*self.functions[i])
+            return None
+
+        # functions span whole blocks of code segments
+        seg = self.getseg(ea)
+        if seg is None or not seg.perm & SEGPERM_EXEC or ea - seg.start_ea >= seg.initialized:
+            return None
+        start = ea - (ea - seg.start_ea) % seg.block_size
+        return func_t(start, min(start + seg.block_size, seg.start_ea + seg.initialized))
+
+    def get_next_func(self, ea):
+        """returns the first function starting after 'ea'"""
+        if self.functions is not None:
+            i = bisect_right(self.func_starts, ea)
+            return func_t(*self.functions[i]) if i < len(self.functions) else None
+
+        i = max(0, bisect_right(self.starts, ea) - 1)
+        for seg in self.segments[i:]:
+            if not seg.perm & SEGPERM_EXEC:
+                continue
+            start = seg.start_ea
+            if ea >= start:
+                start = ea - (ea - seg.start_ea) % seg.block_size + seg.block_size
+            if start < seg.start_ea + seg.initialized:
+                return self.get_func(start)
+        return None
+
+    def decode(self, ea):
+        """decodes the instruction at 'ea'.
+        returns (itype, op1, op2, size) or None"""
+        seg = self.getseg(ea)
+        if seg is None or ea - seg.start_ea >= seg.initialized:
+            return None
+        offs = ea - seg.start_ea
+        if self.insns is not None and ea in self.insns:
+            _, size, _ = seg.get_item(ea)
+            return self.insns[ea] + (size,)
+        insn = OPCODES.get(seg.data[offs])
+        if insn is None:
+            return None
+        itype, op1, op2, size = insn
+        if size is None:
+            if offs + 1 >= seg.initialized:
+                return None
+            modrm = seg.data[offs + 1]
+            mod, rm = modrm >> 6, modrm & 7
+            size = {0: 6 if rm == 5 else 2, 1: 3, 2: 6, 3: 2}[mod]
+            if mod != 3:
+                memop = o_mem if mod == 0 and rm == 5 else o_phrase if mod == 0 else o_displ
+                op1, op2 = (memop, o_reg) if seg.data[offs] == 0x89 else (o_reg, memop)
+        if offs + size > seg.initialized:
+            return None
+        return (itype, op1, op2, size)
+
+    def get_xrefs_to(self, ea):
+        """returns the addresses referring to 'ea'"""
+        if self.xrefs is not None:
+            return self.xrefs.get(ea, ())
+        # made up xrefs to the heads of code items
+        head, _, kind = self.get_item(ea)
+        if head != ea or kind != ITEM_CODE:
+            return ()
+        return [ea - 0x10 * i for i in range(1, ((ea * 2654435761) >> 11) % 4 + 1)]
+
+    def get_name(self, ea):
+        return self.names.get(ea, '')
+
+    def get_func_name(self, ea):
+        f = self.get_func(ea)
+        if f is None:
+            return None
+        return self.names.get(f.start_ea) or 'sub_%X' % f.start_ea
+
+# -----------------------------------------------------------------------
+def pack_bits(bits):
+    """packs a sequence of 0/1 bytes, least significant bit first"""
+    count = len(bits)
+    if not count:
+        return b''
+    digits = bytes(bits[::-1]).translate(BIT_DIGITS)
+    return int(digits, 2).to_bytes((count + 7) // 8, 'little')
+
+BIT_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+# -----------------------------------------------------------------------
+def make_random_block(rnd, size):
+    return (rnd.randbytes(size), None)
+
+def make_zero_block(rnd, size):
+    return (bytes(size), None)
+
+def make_code_block(rnd, size):
+    """returns x86 code made of functions with a prologue, a body of
+    random instructions and an epilogue, padded with int3"""
+    out = bytearray()
+    heads, sizes, kinds = [], [], []
+
+    def emit(insn):
+        heads.append(len(out))
+        sizes.append(len(insn))
+        kinds.append(ITEM_CODE)
+        out.extend(insn)
+
+    body = (lambda: b'\x89\xe5',
+        lambda: b'\x31\xc0',
+        lambda: b'\x90',
+        lambda: bytes((0x8b, 0x40 | rnd.randrange(0x40), rnd.randrange(0x100))),
+        lambda: bytes((0x89, 0x45, rnd.randrange(0x80, 0x100))),
+        lambda: b'\xa1' + rnd.randrange(BASE, BASE + size).to_bytes(4, 'little'),
+        lambda: b'\xe8' + rnd.randrange(-size, size).to_bytes(4, 'little', signed=True),
+        lambda: bytes((0xeb, rnd.randrange(0x100))))
+    while True:
+        func = [b'\x55', b'\x89\xe5']
+        func += [rnd.choice(body)() for _ in range(rnd.randrange(4, 40))]
+        func += [b'\x5d', b'\xc3']
+        func += [b'\xcc'] * rnd.randrange(0, 12)
+        if len(out) + sum(map(len, func)) > size:
+            break
+        for insn in func:
+            emit(insn)
+    while len(out) < size:
+        emit(b'\xcc')
+    return (bytes(out), (heads, sizes, kinds))
+
+def make_text_block(rnd, size):
+    """returns zero terminated strings of random words,
+    separated by a few bytes of data"""
+    out = bytearray()
+    heads, sizes, kinds = [], [], []
+    while True:
+        text = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randrange(1, 12))).encode()
+        pad = bytes(rnd.randrange(0, 4))
+        if len(out) + len(text) + 1 + len(pad) > size:
+            break
+        heads.append(len(out))
+        sizes.append(len(text) + 1)
+        kinds.append(ITEM_STRING)
+        out += text + b'\0' + pad
+    out += bytes(size - len(out))
+    return (bytes(out), (heads, sizes, kinds))
+
+# name -> (block generator, segment permissions)
+DATASETS = {
+    'random': (make_random_block, SEGPERM_READ|SEGPERM_WRITE),
+    'zero': (make_zero_block, SEGPERM_READ|SEGPERM_WRITE),
+    'code': (make_code_block, SEGPERM_READ|SEGPERM_EXEC),
+    'text': (make_text_block, SEGPERM_READ),
+    'mixed': None}
+
+def make_database(dataset, size, block_size=0x10000, seed=0):
+    """returns a Database of at least 'size' bytes, starting at BASE.
+    'mixed' alternates segments of code, text and random data that are
+    partly uninitialized and separated by gaps"""
+    rnd = Random(seed)
+    if dataset != 'mixed':
+        make_block, perm = DATASETS[dataset]
+        block, items = make_block(rnd, block_size)
+        return Database([Segment(BASE, size, block, items, perm, name=dataset)], dataset)
+
+    blocks = [(make_code_block(rnd, block_size), SEGPERM_READ|SEGPERM_EXEC, 'code'),
+        (make_text_block(rnd, block_size), SEGPERM_READ, 'text'),
+        (make_random_block(rnd, block_size), SEGPERM_READ|SEGPERM_WRITE, 'random')]
+    segments = []
+    ea = BASE
+    # the address space spanned must cover 'size', gaps included
+    while ea < BASE + size:
+        (block, items), perm, name = blocks[len(segments) % len(blocks)]
+        seg_size = block_size * rnd.randrange(1, 4)
+        uninitialized = rnd.choice((0, 0, block_size // 4))
+        segments.append(Segment(ea, seg_size, block, items, perm, uninitialized, name))
+        ea += seg_size + SEGMENT_GAP
+    return Database(segments, dataset)
+
+# -----------------------------------------------------------------------
+PT_LOAD = 1
+
+def read_elf_segments(data):
+    """returns the loadable segments of ELF file 'data' in the format
+    of the sidecar, or None if 'data' isn't an ELF file"""
+    if data[:4] != b'\x7fELF':
+        return None
+    is64 = data[4] == 2
+    endian = '<' if data[5] == 1 else '>'
+    if is64:
+        phoff, = struct.unpack_from(endian + 'Q', data, 0x20)
+        phentsize, phnum = struct.unpack_from(endian + 'HH', data, 0x36)
+    else:
+        phoff, = struct.unpack_from(endian + 'I', data, 0x1C)
+        phentsize, phnum = struct.unpack_from(endian + 'HH', data, 0x2A)
+
+    segments = []
+    for i in range(phnum):
+        if is64:
+            p_type, p_flags, p_offset, p_vaddr, _, p_filesz, p_memsz = struct.unpack_from(
+                endian + 'IIQQQQQ', data, phoff + i * phentsize)
+        else:
+            p_type, p_offset, p_vaddr, _, p_filesz, p_memsz, p_flags = struct.unpack_from(
+                endian + 'IIIIIII', data, phoff + i * phentsize)
+        if p_type == PT_LOAD and p_memsz:
+            # PF_X, PF_W and PF_R match SEGPERM_EXEC, SEGPERM_WRITE and SEGPERM_READ
+            segments.append({'name': 'LOAD%d' % len(segments),
+                'start': p_vaddr,
+                'end': p_vaddr + p_memsz,
+                'perm': p_flags & 7,
+                'offset': p_offset,
+                'size': p_filesz})
+    return segments
+
+def load_file(path, sidecar=None, base=BASE):
+    """returns a Database backed by the raw or ELF file at 'path'.
+
+    functions, items, instructions, xrefs and names are read from the JSON
+    'sidecar' written by export_idb.py, which defaults to 'path' followed
+    by SIDECAR_EXT. the segments are those of the sidecar, else those of
+    the ELF file, else the whole file is loaded at 'base'"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if sidecar is None and os.path.exists(path + SIDECAR_EXT):
+        sidecar = path + SIDECAR_EXT
+    info = {}
+    if sidecar:
+        with open(sidecar) as f:
+            info = json.load(f)
+
+    layout = info.get('segments') or read_elf_segments(data) or [{'name': 'RAW',
+        'start': base,
+        'end': base + len(data),
+        'perm': SEGPERM_READ|SEGPERM_WRITE|SEGPERM_EXEC,
+        'offset': 0,
+        'size': len(data)}]
+
+    items = sorted(info.get('items', ()))
+    item_eas = [ea for ea, _, _ in items]
+    segments = []
+    for desc in layout:
+        start, end = desc['start'], desc['end']
+        if end <= start:
+            continue
+        offset = desc.get('offset', -1)
+        filebytes = data[offset:offset + min(desc.get('size', 0), end - start)] if offset >= 0 else b''
+        block = filebytes + bytes(end - start - len(filebytes))
+        lo, hi = bisect_right(item_eas, start - 1), bisect_right(item_eas, end - 1)
+        heads = ([ea - start for ea, _, _ in items[lo:hi]],
+            [size for _, size, _ in items[lo:hi]],
+            [kind for _, _, kind in items[lo:hi]])
+        segments.append(Segment(start, end - start, block, heads, desc.get('perm', SEGPERM_READ),
+            len(block) - len(filebytes), desc.get('name')))
+
+    if not sidecar:
+        return Database(segments, os.path.basename(path))
+
+    names = {ea: name for ea, name in info.get('names', ())}
+    functions = []
+    for start, end, name in info.get('functions', ()):
+        functions.append((start, end))
+        names.setdefault(start, name)
+    xrefs = {}
+    for to, frm in info.get('xrefs', ()):
+        xrefs.setdefault(to, []).append(frm)
+    insns = {}
+    for ea, mnem, op1, op2, is_ret in info.get('insns', ()):
+        insns[ea] = (NN_retn if is_ret else MNEMONICS.get(mnem, NN_null), op1, op2)
+    return Database(segments, os.path.basename(path), functions, names, xrefs, insns)
+
+# -----------------------------------------------------------------------
+class func_t():
+    def __init__(self, start_ea, end_ea):
+        self.start_ea = start_ea
+        self.end_ea = end_ea
+
+    def contains(self, ea):
+        return self.start_ea <= ea < self.end_ea
+
+class op_t():
+    def __init__(self):
+        self.type = o_void
+
+class insn_t():
+    def __init__(self):
+        self.ea = BADADDR
+        self.itype = NN_null
+        self.size = 0
+        self.Op1 = op_t()
+        self.Op2 = op_t()
+
+class xrefblk_t():
+    def __init__(self):
+        self.frm = BADADDR
+        self.to = BADADDR
+        self._refs = iter(())
+
+    def first_to(self, ea, flags):
+        self.to = ea
+        self._refs = iter(DB.get_xrefs_to(ea))
+        return self.next_to()
+
+    def next_to(self):
+        self.frm = next(self._refs, BADADDR)
+        return self.frm != BADADDR
+
+class Hooks():
+    def __init__(self, *args):
+        pass
+
+    def hook(self):
+        return True
+
+    def unhook(self):
+        return True
+
+class plugin_t():
+    pass
+
+class PluginForm():
+    WOPN_MENU = WOPN_ONTOP = WOPN_RESTORE = WOPN_PERSIST = WOPN_TAB = 0
+    WCLS_SAVE = WCLS_CLOSE_LATER = 0
+
+    def __init__(self):
+        pass
+
+class inf_structure():
+    procname = 'metapc'
+
+    def is_64bit(self):
+        return False
+
+    def is_32bit(self):
+        return True
+
+class ph():
+    id = 0
+
+# the Database the stand-in modules answer for, see use()
+DB = Database([])
+
+def use(db):
+    """makes the stand-in modules answer for Database 'db'"""
+    global DB
+    DB = db
+
+def _decode_insn(insn, ea):
+    result = DB.decode(ea)
+    if result is None:
+        return 0
+    insn.ea = ea
+    insn.itype, insn.Op1.type, insn.Op2.type, insn.size = result
+    return insn.size
+
+def _get_segm_qty():
+    return len(DB.segments)
+
+def _getnseg(n):
+    return DB.segments[n] if 0 <= n < len(DB.segments) else None
+
+# -----------------------------------------------------------------------
+MODULES = {
+    'ida_bytes': lambda: {
+        'get_bytes_and_mask': lambda ea, size, *args: DB.get_bytes_and_mask(ea, size),
+        'get_byte': lambda ea: DB.get_byte(ea),
+        'get_flags': lambda ea: DB.get_flags(ea),
+        'get_full_flags': lambda ea: DB.get_flags(ea),
+        'get_item_head': lambda ea: DB.get_item(ea)[0],
+        'get_item_end': lambda ea: sum(DB.get_item(ea)[:2]),
+        'get_item_size': lambda ea: DB.get_item(ea)[1],
+        'is_code': lambda flags: flags & MS_CLS == FF_CODE,
+        'is_strlit': lambda flags: flags & MS_CLS == FF_DATA and flags & DT_TYPE == FF_STRLIT},
+    'idc': lambda: {
+        'BADADDR': BADADDR,
+        'is_code': lambda flags: flags & MS_CLS == FF_CODE},
+    'ida_funcs': lambda: {
+        'func_t': func_t,
+        'get_func': lambda ea: DB.get_func(ea),
+        'get_fchunk': lambda ea: DB.get_func(ea),
+        'get_next_fchunk': lambda ea: DB.get_next_func(ea),
+        'get_func_name': lambda ea: DB.get_func_name(ea)},
+    'ida_ua': lambda: {
+        'insn_t': insn_t,
+        'op_t': op_t,
+        'can_decode': lambda ea: DB.decode(ea) is not None,
+        'decode_insn': _decode_insn,
+        'o_void': o_void, 'o_reg': o_reg, 'o_mem': o_mem, 'o_phrase': o_phrase,
+        'o_displ': o_displ, 'o_imm': o_imm, 'o_far': o_far, 'o_near': o_near},
+    'ida_allins': lambda: {
+        'NN_mov': NN_mov, 'NN_push': NN_push, 'NN_pop': NN_pop, 'NN_xor': NN_xor,
+        'NN_call': NN_call, 'NN_jmp': NN_jmp, 'NN_nop': NN_nop, 'NN_retn': NN_retn},
+    'ida_idp': lambda: {
+        'IDB_Hooks': Hooks,
+        'IDP_Hooks': Hooks,
+        'ph': ph,
+        'PLFM_386': 0,
+        'is_ret_insn': lambda insn, *args: insn.itype == NN_retn},
+    'ida_xref': lambda: {
+        'xrefblk_t': xrefblk_t,
+        'XREF_ALL': 0},
+    'ida_segment': lambda: {
+        'segment_t': Segment,
+        'get_segm_qty': _get_segm_qty,
+        'getnseg': _getnseg,
+        'getseg': lambda ea: DB.getseg(ea),
+        'get_segm_name': lambda seg, *args: seg.name,
+        'SEGPERM_EXEC': SEGPERM_EXEC, 'SEGPERM_WRITE': SEGPERM_WRITE, 'SEGPERM_READ': SEGPERM_READ},
+    'ida_ida': lambda: {
+        'inf_get_min_ea': lambda: DB.min_ea,
+        'inf_get_max_ea': lambda: DB.max_ea},
+    'ida_idaapi': lambda: {
+        'BADADDR': BADADDR,
+        'plugin_t': plugin_t,
+        'PLUGIN_MOD': 1, 'PLUGIN_SKIP': 0, 'PLUGIN_KEEP': 2,
+        'get_inf_structure': inf_structure},
+    'ida_kernwin': lambda: {
+        'UI_Hooks': Hooks,
+        'PluginForm': PluginForm,
+        'msg': lambda text: sys.stdout.write(text),
+        'warning': lambda text: sys.stdout.write(text + '\n'),
+        'get_screen_ea': lambda: DB.min_ea,
+        'read_range_selection': lambda *args: (False, BADADDR, BADADDR),
+        'ask_yn': lambda default, *args: default,
+        'ask_long': lambda default, *args: default,
+        'ask_str': lambda default, *args: default,
+        'ask_text': lambda maxsize, default, *args: default,
+        'ask_addr': lambda default, *args: default,
+        'BWN_DISASM': 27, 'CK_EXTRA1': 1, 'CK_EXTRA2': 2, 'CK_EXTRA3': 3,
+        'UIJMP_ANYVIEW': 1},
+    'ida_dbg': lambda: {
+        'DBG_Hooks': Hooks,
+        'is_debugger_on': lambda: False},
+    'ida_lines': lambda: {
+        'GENDSM_FORCE_CODE': 1, 'GENDSM_REMOVE_TAGS': 2,
+        'generate_disasm_line': lambda ea, *args: ''},
+    'ida_name': lambda: {
+        'get_name': lambda ea: DB.get_name(ea)},
+    'ida_auto': lambda: {
+        'auto_is_ok': lambda: True},
+    'ida_diskio': lambda: {
+        'idadir': lambda subdir: '',
+        'get_user_idadir': lambda: ''},
+    'ida_pro': lambda: {
+        'IDA_SDK_VERSION': 770},
+    'ida_frame': dict,
+    'ida_struct': dict,
+    'ida_idd': dict,
+    'ida_nalt': dict,
+    'ida_segregs': dict}
+
+def _unimplemented(attr):
+    if attr.startswith('__'):
+        raise AttributeError(attr)
+    return lambda *args, **kwargs: None
+
+def install(db=None):
+    """registers the stand-in modules with sys.modules, unless IDA's
+    own modules can be imported. 'db' is the Database they answer for,
+    see use(). returns True if the stand-in modules were installed"""
+    try:
+        import ida_bytes
+        return False
+    except ImportError:
+        pass
+    if db is not None:
+        use(db)
+    for name, attrs in MODULES.items():
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs())
+        # anything not implemented above is a function returning None
+        mod.__getattr__ = _unimplemented
+        sys.modules[name] = mod
+    return True
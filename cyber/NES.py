@@ -4,21 +4,17 @@ from idacyber import ColorFilter
 class NES(ColorFilter):
     name = "NES"
     help = "Simple 8-Bit color filter"
+    pure = True
+    use_lut = True
+    local = True
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
+    def on_get_color(self, c):
         #Bit    7  6  5  4  3  2  1  0
         #Data   R  R  R  G  G  G  B  B
-        colors = []
-        for mapped, buf in buffers:
-            if mapped:
-                for c in buf:
-                    red = c & 0xE0
-                    green = (c << 3) & 0xE0
-                    blue = (c << 6) & 0xC0
-                    colors.append((True, qRgb(red, green, blue)))
-            else:
-                colors += [(False, None)]*len(buf)
-        return colors
+        red = c & 0xE0
+        green = (c << 3) & 0xE0
+        blue = (c << 6) & 0xC0
+        return qRgb(red, green, blue)
     
 def FILTER_INIT(pw):
     return NES()
@@ -14,34 +14,24 @@ class Annotations(ColorFilter):
         self.colormap = [0x343d46, 0x4f5b66, 0x65737e, 0xa7adba, 0xc0c5ce]
         self.red = [0xCC3700, 0xFF4500]
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
-        goffs = 0
+    def on_get_color(self, c):
+        return self.colormap[int(c/(0xff/(len(self.colormap)-1)))]
 
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
+        total = sum(len(buf) for _, buf in buffers)
+        self.get_lut().fill(buffers, colors)
+
+        # highlight the item under the cursor
         if mouse_offs is not None:
             head = get_item_head(addr + mouse_offs)
             tail = get_item_end(addr + mouse_offs)
 
-        for mapped, buf in buffers:
-            if mapped:        
-                for i in range(len(buf)):           
-                    c = buf[i]
-                    if addr + i + goffs >= head and addr + i + goffs < tail:
-                        col = self.red[1]
-                    else:
-                        col = self.colormap[int(c/(0xff/(len(self.colormap)-1)))]
-
-                    colors.append((True, col))
-            else:
-                for i in range(len(buf)):
-                    if addr + i + goffs >= head and addr + i + goffs < tail:
-                        colors.append((False, self.red[0]))
-                    else:
-                        colors.append((False, None))
-
-            goffs += len(buf)
-
-        return colors
+            for i in range(max(head - addr, 0), min(tail - addr, total)):
+                if mask[i]:
+                    colors[i] = self.red[1]
+                else:
+                    colors[i] = self.red[0]
+                    mask[i] = 1
 
     def on_get_annotations(self, address, size, mouse_offs):
         item_ea = get_item_head(address + mouse_offs)
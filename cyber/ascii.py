@@ -1,3 +1,4 @@
+from array import array
 from PyQt5.QtGui import qRgb
 from PyQt5.QtCore import Qt
 from idacyber import ColorFilter
@@ -6,6 +7,7 @@ from ida_kernwin import ask_long
 class Ascii(ColorFilter):
     name = 'Ascii'
     help = 'This filter highlights ascii strings.\n\nSet threshold using right mouse button.'
+    pure = True
 
     def __init__(self):
         self.threshold = 4
@@ -19,15 +21,17 @@ class Ascii(ColorFilter):
         if event.button() == Qt.RightButton:
             self._set_threshold()
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def get_state(self):
+        return self.threshold
+
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
+        goffs = 0
 
         for mapped, buf in buffers:
             last_offs = None
             cur_len = 0
             offsets = {}
             if mapped:
-                localcolors = []
                 for i in range(len(buf)):
                     c = buf[i]
                     r = 0
@@ -43,8 +47,8 @@ class Ascii(ColorFilter):
                             offsets[last_offs] = cur_len
                         last_offs = None
                         cur_len = 0
-                    # bg color
-                    localcolors.append(0x101010)
+                # bg color
+                colors[goffs:goffs+len(buf)] = array('I', [0x101010]) * len(buf)
 
                 for k, v in offsets.items():
                     for i in range(v):
@@ -54,15 +58,10 @@ class Ascii(ColorFilter):
                             if (c >= 0x41 and c <= 0x5A or
                                     c >= 0x61 and c <= 0x7A or
                                     c >= 0x30 and c <= 0x39):
-                                localcolors[k+i] = qRgb(b, b&0x7E, 0)
+                                colors[goffs+k+i] = qRgb(b, b&0x7E, 0)
                             else:
-                                localcolors[k+i] = qRgb(b&0x7E, b&0x7E, b&0x7E)
-                for color in localcolors:
-                    colors.append((True, color))
-            else:
-                colors += [(False, None)]*len(buf)
-
-        return colors
+                                colors[goffs+k+i] = qRgb(b&0x7E, b&0x7E, b&0x7E)
+            goffs += len(buf)
     
 def FILTER_INIT(pw):
     return Ascii()
@@ -1,7 +1,7 @@
 from PyQt5.QtGui import qRgb
 from PyQt5.QtCore import Qt
 from idacyber import ColorFilter
-from ida_kernwin import msg, register_timer, unregister_timer
+from ida_kernwin import msg
 from collections import Counter
 
 class AutoXor(ColorFilter):
@@ -30,14 +30,14 @@ RMB toggles key highlighting."""
 
     def on_deactivate(self):
         if self.timer:
-            unregister_timer(self.timer)
+            self.pw.on_filter_unregister_timer(self.timer)
             self.timer = None
         return
 
     def on_mb_click(self, event, addr, size, mouse_offs):
         if event.button() == Qt.RightButton:
             if self.highlight_key and self.timer:
-                unregister_timer(self.timer)
+                self.pw.on_filter_unregister_timer(self.timer)
             else:
                 self._enable_timer()
             self.highlight_key = not self.highlight_key
@@ -49,14 +49,14 @@ RMB toggles key highlighting."""
 
     def _enable_timer(self):
         if self.timer:
-            unregister_timer(self.timer)
-        self.timer = register_timer(self.ms, self._flip_hl_color)
+            self.pw.on_filter_unregister_timer(self.timer)
+        self.timer = self.pw.on_filter_register_timer(self.ms, self._flip_hl_color)
         return
 
     def _flip_hl_color(self):
         self.hl_color_idx = (self.hl_color_idx + 1) % 2
         if self.pw:
-            self.pw.on_filter_request_update()
+            self.pw.on_filter_request_overlay()
         return self.ms
 
     def _update_key(self, buffers):
@@ -80,20 +80,31 @@ RMB toggles key highlighting."""
                     self.key = cur
         return
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
         self._update_key(buffers)
+        goffs = 0
         for mapped, buf in buffers:
             if mapped:
-                for c in buf:
+                for i, c in enumerate(buf, goffs):
                     c = (c ^ self.key)
-                    if self.highlight_key and not c:
-                        colors.append((True, [qRgb(0x20, c, c), qRgb(0x7a, 0x0e, 0x7a)][self.hl_color_idx]))
-                    else:
-                        colors.append((True, qRgb(0x20, c, c)))
-            else:
-                colors += [(False, None)]*len(buf)
-        return colors
+                    colors[i] = qRgb(0x20, c, c)
+            goffs += len(buf)
+
+    def on_get_overlay(self, buffers, addr, size, mouse_offs):
+        # blinking key bytes
+        if not self.highlight_key or not self.hl_color_idx:
+            return None
+        overlay = []
+        key = bytes([self.key])
+        goffs = 0
+        for mapped, buf in buffers:
+            if mapped:
+                i = buf.find(key)
+                while i != -1:
+                    overlay.append((goffs+i, (qRgb(0x7a, 0x0e, 0x7a),)))
+                    i = buf.find(key, i+1)
+            goffs += len(buf)
+        return overlay
 
     def on_get_tooltip(self, addr, size, mouse_offs):
         result = None
@@ -43,6 +43,9 @@ class Crawl(ColorFilter):
             self.switch ^= 1
             msg('Highlighting %s\n' % self.mode[self.switch])
 
+    def get_state(self):
+        return (self.switch, self.last_sel)
+
     def _get_func_name(self, ea):
         f = get_func(ea)
         if f:
@@ -67,8 +70,7 @@ class Crawl(ColorFilter):
                 tooltip += '%s' % name
         return tooltip
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
         head = BADADDR
         tail = BADADDR
         goffs = 0
@@ -97,13 +99,10 @@ class Crawl(ColorFilter):
                         if addr + pos + goffs >= lhead and addr + pos + goffs < lhead+lsize:
                             highlight = True
                     if highlight:
-                        colors.append((True, qRgb(c, 0xFF, self.hl_color)))
+                        colors[goffs+pos] = qRgb(c, 0xFF, self.hl_color)
                     else:
-                        colors.append((True, qRgb(c, 0, 0)))
-            else:
-                colors += [(False, None)]*len(buf)
+                        colors[goffs+pos] = qRgb(c, 0, 0)
             goffs += len(buf)
-        return colors
 
 def FILTER_INIT(pw):
     return Crawl()
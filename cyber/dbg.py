@@ -5,7 +5,7 @@ from ida_idd import regval_t
 from ida_dbg import (get_reg_val, get_ip_val, get_sp_val,
     DBG_Hooks, is_debugger_on, get_process_state)
 from ida_bytes import get_item_size
-from ida_kernwin import register_timer, unregister_timer, ask_yn
+from ida_kernwin import ask_yn
 from ida_idaapi import get_inf_structure
 from ida_pro import IDA_SDK_VERSION
 
@@ -64,12 +64,12 @@ class DbgHook(DBG_Hooks):
 
     def enable_timer(self):
         self.disable_timer()
-        self.timer = register_timer(200, self._flash_cb)
+        self.timer = self.pw.on_filter_register_timer(200, self._flash_cb)
         return
 
     def disable_timer(self):
         if self.timer:
-            unregister_timer(self.timer)
+            self.pw.on_filter_unregister_timer(self.timer)
             self.timer = None
         return
 
@@ -88,15 +88,15 @@ class DbgHook(DBG_Hooks):
         if self.pw:
             # if debugger is running and process is suspended
             if is_debugger_on() and get_process_state() == -1:
-                self.pw.on_filter_request_update()
+                self.pw.on_filter_request_overlay()
                 self.highlighted = not self.highlighted
         # timer will unregister itself if it returns -1
         return 200
 
-    def _request_update_ip_view(self, ip=None):
+    def _request_update_ip_view(self, ip=None, immediate=False):
         _ip = ip if ip else c_get_ip_val()
         if self.pw:
-            self.pw.on_filter_request_update(_ip, center=True)
+            self.pw.on_filter_request_update(_ip, center=True, immediate=immediate)
 
     """there is a bug which causes this callback to not be
     called if step tracing is enabled, then disabled, then
@@ -116,7 +116,8 @@ class DbgHook(DBG_Hooks):
     that have been commented out below"""
     def dbg_suspend_process(self):
         self._add_hit()
-        self._request_update_ip_view()
+        # show where the process stopped right away
+        self._request_update_ip_view(immediate=True)
         return 0
 
 class Dbg(ColorFilter):
@@ -155,6 +156,7 @@ It can be used with step-tracing enabled."""
         if event.button() == Qt.RightButton:
             if ask_yn(1, "Clear trace?") == 1:
                 self.hook.hits = {}
+                self.pw.on_filter_request_update()
         return
 
     def _byte2coloridx(self, c):
@@ -169,40 +171,44 @@ It can be used with step-tracing enabled."""
             ann.append((sp, Qt.green, "%X (SP)" % sp, Qt.green))
         return ann
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
         goffs = 0
 
         for mapped, buf in buffers:
             if mapped:
-                ip = c_get_ip_val()
                 i = 0
-                while i < len(buf):
-                    if ip is not None and ip == addr + goffs + i and self.hook.highlighted:
-                        size = get_item_size(ip)
+                blen = len(buf)
+                while i < blen:
+                    if addr + goffs + i in self.hook.hits:
+                        data = self.hook.hits[addr + goffs + i]
+                        size = min(data[1], blen - i)
+                        hits = data[0]
+                        base = self.palette[len(self.palette)-1]
+                        col = QColor(base).darker(round(100+(float(hits)/self.hook.maxhits)*105)).rgb()
                         for j in range(size):
-                            colors.append((True, qRgb(0xFF, 0x45, 0)))
+                            colors[goffs+i+j] = col
                         i += size
                         continue
-                    else:
-                        if addr + goffs + i in self.hook.hits:
-                            data = self.hook.hits[addr + goffs + i]
-                            size = data[1]
-                            hits = data[0]
-                            for j in range(size):
-                                base = self.palette[len(self.palette)-1]
-                                col = QColor(base).darker(round(100+(float(hits)/self.hook.maxhits)*105)).rgb()
-                                colors.append((True, col))
-                            i += size
-                            continue
-                        else:                            
-                            c = buf[i]
-                            colors.append((True, self.palette[self._byte2coloridx(c)]))
+                    else:                            
+                        c = buf[i]
+                        colors[goffs+i] = self.palette[self._byte2coloridx(c)]
                     i += 1
-            else:
-                colors += [(False, None)]*len(buf)
             goffs += len(buf)
-        return colors
+
+    def on_get_overlay(self, buffers, addr, size, mouse_offs):
+        # flashing instruction pointer
+        ip = c_get_ip_val()
+        if ip is None or not self.hook.highlighted:
+            return None
+        goffs = 0
+        for mapped, buf in buffers:
+            blen = len(buf)
+            if mapped and addr + goffs <= ip < addr + goffs + blen:
+                i = ip - addr - goffs
+                size = min(get_item_size(ip), blen - i)
+                return [(goffs+i, (qRgb(0xFF, 0x45, 0),) * size)]
+            goffs += blen
+        return None
     
 def FILTER_INIT(pw):
     return Dbg(pw)
@@ -7,6 +7,7 @@ class xpression(ColorFilter):
     name = "expression"
     help = """Specify expression for RGB color values.
 Press right mousebutton in order to change expression."""
+    pure = True
 
     def __init__(self):
         self.xpr = "r, g, b"
@@ -30,17 +31,18 @@ Press right mousebutton in order to change expression."""
         if event.button() == Qt.RightButton:
             self._set_user_expr()
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def get_state(self):
+        return self.xpr
+
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
+        goffs = 0
         for mapped, buf in buffers:
             if mapped:
-                for c in buf:
+                for i, c in enumerate(buf, goffs):
                     r = g = b = c & 0xFF
                     r, g, b = eval(self.xpr)
-                    colors.append((True, qRgb(r&0xFF, g&0xFF, b&0xFF)))
-            else:
-                colors += [(False, None)]*len(buf)
-        return colors
+                    colors[i] = qRgb(r&0xFF, g&0xFF, b&0xFF)
+            goffs += len(buf)
 
 def FILTER_INIT(pw):
     return xpression()
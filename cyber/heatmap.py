@@ -4,17 +4,13 @@ from ida_bytes import get_byte
 
 class Heatmap(ColorFilter):
     name = "Heatmap"
+    pure = True
+    use_lut = True
+    local = True
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
-        for mapped, buf in buffers:
-            if mapped:                
-                for c in buf:
-                    r, g, b = self.hm(c)
-                    colors.append((True, qRgb(r, g, b)))
-            else:
-                colors += [(False, None)]*len(buf)
-        return colors
+    def on_get_color(self, c):
+        r, g, b = self.hm(c)
+        return qRgb(r, g, b)
 
     def on_get_tooltip(self, addr, size, mouse_offs):
         return "0x%02X" % get_byte(addr + mouse_offs)
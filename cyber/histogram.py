@@ -1,4 +1,5 @@
 from math import log
+from array import array
 from idacyber import ColorFilter
 import ida_kernwin
 from PyQt5.QtCore import Qt
@@ -55,6 +56,9 @@ MMB cycles through different palettes."""
             self.cur_palette = (self.cur_palette + 1) % len(self.palettes)
             self.palette = self.palettes[self.cur_palette]
 
+    def get_state(self):
+        return self.cur_palette
+
     def on_get_annotations(self, address, size, mouse_offs):
         cursor_x = mouse_offs % Histogram.width
         annotations = None
@@ -74,11 +78,14 @@ MMB cycles through different palettes."""
             (None, None, ' Palette: %d/%d' % (self.cur_palette+1, len(self.palettes)),  self.palettes[self.cur_palette][3])]
         return annotations
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = [(True, self.palettes[self.cur_palette][0])] * size
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
         self.hist = [0] * 256
         width = Histogram.width
 
+        # the histogram covers the whole canvas, mapped or not
+        colors[0:size] = array('I', [self.palettes[self.cur_palette][0]]) * size
+        mask[0:size] = b'\x01' * size
+
         height = round(size / width)
         e = ""
         self.bufsize = 0
@@ -101,9 +108,9 @@ MMB cycles through different palettes."""
             for i in range(len(bars)):
                 dst_y = bars[i]
                 for y in range(dst_y):
-                    colors[height*width - width+i - y*width] = (True, self.palettes[self.cur_palette][-1] if i == cursor_x else self.palettes[self.cur_palette][1+i%2])
+                    colors[height*width - width+i - y*width] = self.palettes[self.cur_palette][-1] if i == cursor_x else self.palettes[self.cur_palette][1+i%2]
 
-        return colors
+        return size
 
     def on_get_tooltip(self, addr, size, mouse_offs):
         i = mouse_offs % Histogram.width
@@ -1,7 +1,8 @@
+from array import array
 from PyQt5.QtGui import qRgb
 from PyQt5.QtCore import Qt
 from idacyber import ColorFilter
-from ida_kernwin import register_timer, unregister_timer, ask_long
+from ida_kernwin import ask_long
 import time
 
 # made with Piskel (https://www.piskelapp.com/)
@@ -288,7 +289,7 @@ class Hubert(ColorFilter):
                 #self.match = True"""
 
             self.prev_timestamp = ms
-            self.pw.on_filter_request_update()
+            self.pw.on_filter_request_overlay()
         return self.timer_speed
 
 
@@ -306,40 +307,33 @@ class Hubert(ColorFilter):
 
     def on_activate(self, idx):
         if self.timer is not None:
-            unregister_timer(self.timer)
-        self.timer = register_timer(self.initial_timer_speed, self._timer_cb)
+            self.pw.on_filter_unregister_timer(self.timer)
+        self.timer = self.pw.on_filter_register_timer(self.initial_timer_speed, self._timer_cb)
         return
 
     def on_deactivate(self):
         if self.timer is not None:
-            unregister_timer(self.timer)
+            self.pw.on_filter_unregister_timer(self.timer)
             self.timer = None
         return       
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
+        # black bg
+        colors[0:size] = array('I', bytes(4 * size))
+        mask[0:size] = b'\x01' * size
+        return size
+
+    def on_get_overlay(self, buffers, addr, size, mouse_offs):
         global hubert
 
-        colors = []
         framesize = len(hubert[0])
 
         start_offs = int((size/2) - (framesize/2))
         start_offs -= (start_offs%Hubert.width)
-
-        # black bg
-        for i in range(start_offs):
-            colors.append((False, 0))
+        start_offs = max(0, start_offs)
 
         # hubert
-        frame = hubert[self.idx_frame]
-        for color in frame:
-            colors.append((True, color))
-
-        # black bg
-        for i in range(start_offs + framesize):
-            colors.append((False, 0))
-
-        return colors
-
+        return [(start_offs, hubert[self.idx_frame])]
 
 def FILTER_INIT(pw):
     return Hubert(pw)
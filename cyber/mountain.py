@@ -2,39 +2,62 @@ from PyQt5.QtGui import qRgb
 from idacyber import ColorFilter
 from ida_kernwin import msg
 from ida_bytes import get_byte
-from ida_funcs import get_func
-from ida_bytes import get_flags, is_strlit, get_item_head
+from ida_bytes import is_strlit
 
 class Mountain(ColorFilter):
     name = 'Mountain'
     help = 'Highlight functions and strings.'
+    preview = True
+    progressive = True
 
     def _is_string(self, ea):
-        head = get_item_head(ea)
-        flags = get_flags(head)
+        _, _, flags = self.get_metadata().get_item(ea)
         return is_strlit(flags)
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def on_get_color(self, c):
+        return qRgb(c, c, c)
+
+    def on_fill_preview(self, buffers, addr, size, mouse_offs, colors, mask):
+        # plain grayscale, functions and strings aren't looked up
+        self.get_lut().fill(buffers, colors)
+
+    def _classify(self, buffers, addr):
+        """yields (offset, kind) for every mapped byte, where kind is
+        0 for functions, 1 for strings and 2 for anything else"""
         goffs = 0
+        func_start = func_end = None
         for mapped, buf in buffers:
             if mapped:
                 for offs in range(len(buf)):
-                    r = g = b = 0
-                    c = buf[offs] & 0xFF
                     ea = addr + goffs + offs
-                    f = get_func(ea)
-                    if f:
-                        g = b = c
+                    # spare lookups within the function chunk that was found last
+                    if func_start is None or not func_start <= ea < func_end:
+                        chunk = self.get_metadata().get_func_chunk(ea)
+                        func_start, func_end = chunk if chunk else (None, None)
+                    if func_start is not None:
+                        kind = 0
                     elif self._is_string(ea):
-                        g = c
+                        kind = 1
                     else:
-                        r = g = b = c
-                    colors.append((True, qRgb(r, g, b)))
-            else:
-                colors += [(False, None)]*len(buf)
+                        kind = 2
+                    yield goffs + offs, kind
             goffs += len(buf)
-        return colors
+
+    def _get_color(self, c, kind):
+        r = g = b = 0
+        if kind == 0:
+            g = b = c
+        elif kind == 1:
+            g = c
+        else:
+            r = g = b = c
+        return qRgb(r, g, b)
+
+    def on_fill_progressive(self, buffers, addr, size, mouse_offs, colors, mask):
+        data = b''.join(buf for _, buf in buffers)
+        for i, kind in self._classify(buffers, addr):
+            colors[i] = self._get_color(data[i], kind)
+            yield i + 1
 
     def on_get_tooltip(self, addr, size, mouse_offs):
         return '0x%02X' % get_byte(addr + mouse_offs)
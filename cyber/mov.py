@@ -1,7 +1,7 @@
 from PyQt5.QtGui import qRgb, QColor
 from PyQt5.QtCore import Qt
 from idacyber import ColorFilter
-from ida_bytes import get_item_size, get_byte, get_item_head, get_item_end, get_full_flags
+from ida_bytes import get_item_size, get_byte, get_item_head, get_item_end
 from idc import is_code
 from ida_lines import generate_disasm_line, GENDSM_FORCE_CODE, GENDSM_REMOVE_TAGS
 from ida_ua import can_decode, decode_insn, insn_t, o_mem, o_phrase, o_displ
@@ -16,6 +16,9 @@ class MovFilter(ColorFilter):
     name = 'Highight Load/Store'
     help = """Highlights memory load/store (mov) instructions.
 Currently compatible with x86 only."""
+    threaded = True
+    progressive = True
+    preview = True
 
     def __init__(self):
         # s+b teal Color Palette http://www.color-hex.com/color-palette/309
@@ -31,9 +34,8 @@ Currently compatible with x86 only."""
         col = _len = 0
         acc = -1
 
-        head = get_item_head(addr)
+        head, _, f = self.get_metadata().get_item(addr)
         if can_decode(head):
-            f = get_full_flags(head)
             if is_code(f):
                 _len = decode_insn(self.insn, head)
                 if _len:
@@ -81,35 +83,63 @@ Currently compatible with x86 only."""
         return ann
 
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def _scan(self, buffers, addr):
+        """yields (offset, mov) for every step taken, where mov is either
+        None or (offset, length, acc, ea) of a load/store"""
         goffs = 0
-        ann_n = 0
-        self.annotations = []
+        # decode every item once, no matter how many bytes it spans
+        cache = {}
 
         for is_mapped, buf in buffers:
             if is_mapped:
                 i = 0
                 blen = len(buf)
                 while i < blen:
-                    col, _len, acc = self._ins2color(addr+goffs+i)
+                    head = self.get_metadata().get_item(addr+goffs+i)[0]
+                    if head not in cache:
+                        cache[head] = self._ins2color(head)
+                    col, _len, acc = cache[head]
                     if acc != -1 and col and _len:
                         maxlen = min(blen-i, _len)
-                        self.annotations.append((ann_n, acc, addr+goffs+i))
-                        ann_n += 1
-                        for j in range(maxlen):
-                            colors.append((True, col))
+                        yield goffs+i+maxlen, (goffs+i, maxlen, acc, addr+goffs+i)
                         i += maxlen
                     else:
-                        col = int(self.colormap[int(buf[i]/(0xff/(len(self.colormap)-1)))])
-                        colors.append((True, col))
                         i += 1
-            else:
-                # indicate transparent area
-                colors += [(False, None)]*len(buf)
+                        yield goffs+i, None
 
             goffs += len(buf)
-        return colors
+
+    def on_snapshot_progressive(self, buffers, addr, size, mouse_offs):
+        # list of (offset, length, acc, ea) of every load/store
+        movs = []
+        for _, mov in self._scan(buffers, addr):
+            if mov:
+                movs.append(mov)
+            yield
+        return {"movs": movs}
+
+    def on_get_color(self, c):
+        return int(self.colormap[int(c/(0xff/(len(self.colormap)-1)))])
+
+    def on_fill_preview(self, buffers, addr, size, mouse_offs, colors, mask):
+        # instructions aren't decoded
+        self.get_lut().fill(buffers, colors)
+
+    def on_fill_snapshot(self, snapshot, buffers, addr, size, mouse_offs, colors, mask):
+        annotations = []
+        self.get_lut().fill(buffers, colors)
+
+        for ann_n, (offs, maxlen, acc, ea) in enumerate(snapshot["movs"]):
+            annotations.append((ann_n, acc, ea))
+            col = self.insn_colors[acc]
+            for j in range(maxlen):
+                colors[offs+j] = col
+
+        # published by on_snapshot_done(), this runs on a worker thread
+        snapshot["annotations"] = annotations
+
+    def on_snapshot_done(self, snapshot):
+        self.annotations = snapshot["annotations"]
 
 def FILTER_INIT(pw):
     if ida_idp.ph.id != ida_idp.PLFM_386:
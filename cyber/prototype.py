@@ -61,9 +61,12 @@ def process(base, offs, b, size, width, moffs):
         if event.button() == Qt.RightButton:
             self._set_user_func()
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def get_state(self):
+        return self.func_def
+
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
         width = self.pw.get_pixel_qty_per_line()
+        goffs = 0
 
         for mapped, buf in buffers:
             if mapped:
@@ -76,12 +79,10 @@ def process(base, offs, b, size, width, moffs):
                             size,
                             width,
                             mouse_offs)
-                        colors.append((True, qRgb(r&0xFF, g&0xFF, b&0xFF)))
+                        colors[goffs+offs] = qRgb(r&0xFF, g&0xFF, b&0xFF)
                     except:
-                        colors.append((False, None))
-            else:
-                colors += [(False, None)]*len(buf)
-        return colors
+                        mask[goffs+offs] = 0
+            goffs += len(buf)
 
 def FILTER_INIT(pw):
     return Prototype(pw)
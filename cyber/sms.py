@@ -4,7 +4,6 @@ from ida_idd import regval_t
 from ida_dbg import (get_reg_val, get_ip_val, get_sp_val,
     DBG_Hooks, is_debugger_on, get_process_state)
 from ida_bytes import get_item_size
-from ida_kernwin import register_timer, unregister_timer
 from ida_funcs import get_func, get_func_name
 from ida_frame import get_frame, get_spd
 from ida_struct import get_member_name, get_struc_size
@@ -101,12 +100,12 @@ class DbgHook(DBG_Hooks):
 
     def enable_timer(self):
         self.disable_timer()
-        self.timer = register_timer(300, self._flash_cb)
+        self.timer = self.pw.on_filter_register_timer(300, self._flash_cb)
         return
 
     def disable_timer(self):
         if self.timer:
-            unregister_timer(self.timer)
+            self.pw.on_filter_unregister_timer(self.timer)
             self.timer = None
         return
 
@@ -114,7 +113,7 @@ class DbgHook(DBG_Hooks):
         if self.pw:
             # if debugger is running and process is suspended
             if is_debugger_on() and get_process_state() == -1:
-                self.pw.on_filter_request_update()
+                self.pw.on_filter_request_overlay()
                 self.highlighted = not self.highlighted
         return 300
 
@@ -174,6 +173,9 @@ through memory (Press F3 for help)
             self.sp_arrow = not self.sp_arrow
             self.palette = self.palettes[self.cur_palette]
 
+    def get_state(self):
+        return (self.cur_palette, self.sp_arrow)
+
     def on_activate(self, idx):
         self.hook = DbgHook(self.pw)
         self.hook.hook()
@@ -242,13 +244,10 @@ through memory (Press F3 for help)
 
         return annotations
 
-    def on_process_buffer(self, buffers, addr, total, mouse_offs):
-        colors = []
+    def on_fill_buffer(self, buffers, addr, total, mouse_offs, colors, mask):
         goffs = 0
         mouse_boundaries = None
 
-        sp = c_get_sp_val()
-        #ip = c_get_ip_val()
         fi = FrameInfo()
 
         if mouse_offs is not None:
@@ -257,54 +256,67 @@ through memory (Press F3 for help)
         for mapped, buf in buffers:
             if mapped:
                 i = 0
-                while i < len(buf):
+                blen = len(buf)
+                while i < blen:
                     # highlight stack var pointed to by mouse
                     if mouse_offs and mouse_boundaries:
                         start, end = mouse_boundaries
 
                         if addr + goffs + i in range(start, end):
-                            size = min(end - start, total-i)
+                            size = min(end - start, total-i, blen-i)
                             for j in range(size):
-                                colors.append((True, self.palette[3]))
+                                colors[goffs+i+j] = self.palette[3]
                             i += size
                             continue
-                    # flash sp
-                    if sp is not None and self.hook.highlighted and sp == addr + goffs + i:
-                        size = get_item_size(sp)
-                        boundaries = fi.get_element_boundaries(sp)
-                        if boundaries:
-                            start, end = boundaries
-                            size = min(end - start, total-i)
-                        for j in range(size):
-                            colors.append((True, self.palette[4]))
-                        i += size
-                        continue
                     # locals
                     if goffs + addr + i in range(fi.ea, fi.ea + fi.framesize):
                         size = 1
                         boundaries = fi.get_element_boundaries(goffs + addr + i)
                         if boundaries: # if anything on the stackframe
                             start, end = boundaries
-                            size = min(end - start, total-i)
+                            size = min(end - start, total-i, blen-i)
                             for j in range(size):
-                                colors.append((True, self.palette[2]))
+                                colors[goffs+i+j] = self.palette[2]
                             i += size
                             continue
                         else: #gap between locals
-                            colors.append((True, self.palette[1]))
+                            colors[goffs+i] = self.palette[1]
                             i += 1
                             continue
 
                     # default bg color
-                    colors.append((True, self.palette[0]))
+                    colors[goffs+i] = self.palette[0]
                     i += 1
 
-            # unmapped, transparency
-            else:
-                colors += [(False, None)]*len(buf)
             goffs += len(buf)
-        
-        return colors
+
+    def on_get_overlay(self, buffers, addr, total, mouse_offs):
+        # flash sp
+        sp = c_get_sp_val()
+        if sp is None or not self.hook.highlighted:
+            return None
+
+        fi = FrameInfo()
+        if mouse_offs:
+            # the stack var pointed to by mouse is highlighted already
+            mouse_boundaries = fi.get_element_boundaries(addr+mouse_offs)
+            if mouse_boundaries and sp in range(*mouse_boundaries):
+                return None
+
+        goffs = 0
+        for mapped, buf in buffers:
+            blen = len(buf)
+            if mapped and addr + goffs <= sp < addr + goffs + blen:
+                i = sp - addr - goffs
+                size = get_item_size(sp)
+                boundaries = fi.get_element_boundaries(sp)
+                if boundaries:
+                    start, end = boundaries
+                    size = min(end - start, total-i)
+                size = min(size, blen-i)
+                return [(goffs+i, (self.palette[4],) * size)]
+            goffs += blen
+        return None
    
 def FILTER_INIT(pw):
     return StackyMcStackface(pw)
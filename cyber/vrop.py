@@ -7,7 +7,7 @@ from ida_lines import generate_disasm_line, GENDSM_FORCE_CODE, GENDSM_REMOVE_TAG
 from ida_ua import can_decode, insn_t, decode_insn
 from ida_idp import is_ret_insn
 from ida_segment import getseg, SEGPERM_EXEC
-from ida_kernwin import register_timer, unregister_timer, warning
+from ida_kernwin import warning
 
 class VROP(ColorFilter):
     name = "VisualROP"
@@ -18,6 +18,9 @@ This filter will make you look like a real hacker.
 RMB toggles cyber mode for even more beef."""
     zoom = 10
     width = 16
+    threaded = True
+    progressive = True
+    preview = True
 
     def __init__(self, pw):
         # "Dark Hope Color Palette" http://www.color-hex.com/color-palette/46221
@@ -25,6 +28,7 @@ RMB toggles cyber mode for even more beef."""
         self.ptrcol = 0xe2e2e2
         self.txtcol = 0xb2b2b2
         self.ret_locs = []
+        self.glow = None
         self.threshold = 9
         self.pw = pw
         self.torch = False
@@ -43,8 +47,8 @@ RMB toggles cyber mode for even more beef."""
 
     def _enable_timer(self):
         if self.timer:
-            unregister_timer(self.timer)
-        self.timer = register_timer(self.ms, self._flicker_cb)
+            self.pw.on_filter_unregister_timer(self.timer)
+        self.timer = self.pw.on_filter_register_timer(self.ms, self._flicker_cb)
         return
 
     def _is_ret(self, x):
@@ -75,8 +79,8 @@ RMB toggles cyber mode for even more beef."""
 
     def _flicker_cb(self):
         self.flicker_idx = (self.flicker_idx + 1) % len(self.flicker_values)
-        if self.pw:
-            self.pw.on_filter_request_update()
+        if self.pw and self.torch:
+            self.pw.on_filter_request_overlay()
         return self.ms
 
     def on_mb_click(self, event, addr, size, mouse_offs):
@@ -84,7 +88,7 @@ RMB toggles cyber mode for even more beef."""
             if self.torch:
                 self.flicker_idx = self.flicker_values[floor(self.numframes/2)]
                 if self.timer:
-                    unregister_timer(self.timer)
+                    self.pw.on_filter_unregister_timer(self.timer)
                     self.timer = None
                 else:
                     warning("!!!Bug!!!")
@@ -94,70 +98,92 @@ RMB toggles cyber mode for even more beef."""
             self.pw.on_filter_request_update()
         return
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
-        goffs = 0
-        self.ret_locs = []
-        nret = 0
-        colidx = 0
-        width = self.pw.get_pixel_qty_per_line()
+    def on_get_color(self, c):
+        return self.colormap[floor(c/(0xff/(len(self.colormap)-1)))]
+
+    def on_fill_preview(self, buffers, addr, size, mouse_offs, colors, mask):
+        # return instructions aren't looked up
+        self.get_lut().fill(buffers, colors)
 
+    def _find_rets(self, buffers, addr):
+        """yields (offset, is_ret) for every mapped byte"""
+        goffs = 0
         for mapped, buf in buffers:
-            if mapped:        
-                for i in range(len(buf)):
-                    c = buf[i]
-                    if self._is_ret(addr+goffs+i):
-                        self.ret_locs.append((nret, colidx, addr+goffs+i))
-                        nret += 1
-                        col = (~((self.colormap[floor(c/(0xff/(len(self.colormap)-1)))])&0xFFFFFF) & 0xFFFFFFFF)
-                    else:
-                        col = self.colormap[floor(c/(0xff/(len(self.colormap)-1)))]
-                    colors.append((True,  col))
-                    colidx += 1
-            else:
+            if mapped:
                 for i in range(len(buf)):
-                    colors.append((False, None))
-                    colidx += 1
-
+                    yield goffs+i, self._is_ret(addr+goffs+i)
             goffs += len(buf)
 
-        # apply glow
+    def on_snapshot_progressive(self, buffers, addr, size, mouse_offs):
+        rets = set()
+        for offs, is_ret in self._find_rets(buffers, addr):
+            if is_ret:
+                rets.add(offs)
+            yield
+        return {"rets": rets, "width": self.pw.get_pixel_qty_per_line()}
+
+    def on_fill_snapshot(self, snapshot, buffers, addr, size, mouse_offs, colors, mask):
+        rets, width = snapshot["rets"], snapshot["width"]
+        self.get_lut().fill(buffers, colors)
+        goffs = sum(len(buf) for _, buf in buffers)
+
+        ret_locs = []
+        for colidx in sorted(rets):
+            ret_locs.append((len(ret_locs), colidx, addr+colidx))
+            colors[colidx] = (~(colors[colidx] & 0xFFFFFF) & 0xFFFFFFFF)
+        nret = len(ret_locs)
+        # published by on_snapshot_done(), this runs on a worker thread
+        snapshot["ret_locs"] = ret_locs
+
+        # glow is drawn by on_get_overlay(), remember the pixels it affects
+        # and their colors before the shadow is applied
+        glow = []
+        base = {}
         if nret:
-            offs = self._get_selection_offs()
+            offs = self._get_selection_offs(ret_locs)
             end = min(offs+self.threshold+1, nret)
-            cur_item_idx = 0
             for i in range(offs, end):
-                _, colidx, _ = self.ret_locs[i]
+                _, colidx, _ = ret_locs[i]
                 for row in range(-4, 5):
                     targetpxl_idx = colidx+(width*row)
                     for neighbour in range(-4, 5):
                         realpxl_idx = targetpxl_idx+neighbour
                         brightness = (abs(row)+abs(neighbour))*10
                         # check top, bottom, left, right borders
-                        if realpxl_idx > 0 and realpxl_idx < size and floor(realpxl_idx/width) == floor(targetpxl_idx/width):
-                            mapped, col = colors[realpxl_idx]
+                        if realpxl_idx > 0 and realpxl_idx < min(size, goffs) and floor(realpxl_idx/width) == floor(targetpxl_idx/width):
+                            if mask[realpxl_idx]:
+                                glow.append((realpxl_idx, brightness))
+                                base[realpxl_idx] = colors[realpxl_idx]
+        snapshot["glow"] = (buffers, width, size, base, glow)
 
-                            if mapped:
-                                # uncomment for "debugging"
-                                #col = 0xFF0000
-                                flicker = self.maxbrightness
-                                if self.torch:
-                                    flicker = self.flicker_values[self.flicker_idx]*self.factor
-                                colors[realpxl_idx] = (mapped, QColor(col).lighter(max(100, 100-brightness+flicker)).rgb())
-                cur_item_idx += 1
+        # apply shadow
+        for colidx in range(goffs):
+            if mask[colidx]:
+                colors[colidx] = self._apply_shadow_fx(colors[colidx], colidx, width, size)
 
+    def on_snapshot_done(self, snapshot):
+        self.ret_locs = snapshot["ret_locs"]
+        self.glow = snapshot["glow"]
 
-        # apply shadow
-        colidx = 0
-        for mapped, col in colors:
-            if mapped:
-                colors[colidx] = (mapped, self._apply_shadow_fx(col, colidx, width, size))
-            colidx += 1
-        return colors
+    def on_get_overlay(self, buffers, addr, size, mouse_offs):
+        # the glow belongs to the frame that is shown
+        if self.glow is None or self.glow[0] is not buffers:
+            return None
+        _, width, size, base, glow = self.glow
 
-    def _get_selection_offs(self):
+        flicker = self.maxbrightness
+        if self.torch:
+            flicker = self.flicker_values[self.flicker_idx]*self.factor
+        colors = dict(base)
+        for idx, brightness in glow:
+            # uncomment for "debugging"
+            #colors[idx] = 0xFF0000
+            colors[idx] = QColor(colors[idx]).lighter(max(100, 100-brightness+flicker)).rgb()
+        return [(idx, (self._apply_shadow_fx(col, idx, width, size),)) for idx, col in colors.items()]
+
+    def _get_selection_offs(self, ret_locs):
         offs = 0
-        nret = len(self.ret_locs)
+        nret = len(ret_locs)
         if nret > self.threshold:
             offs = floor(nret/2 - self.threshold/2)
         return offs
@@ -168,7 +194,7 @@ RMB toggles cyber mode for even more beef."""
 
     def on_deactivate(self):
         if self.timer:
-            unregister_timer(self.timer)
+            self.pw.on_filter_unregister_timer(self.timer)
             self.timer = None
         return
 
@@ -177,7 +203,7 @@ RMB toggles cyber mode for even more beef."""
         ann = [(None, None, caption, self.colormap[-1])]
         if len(self.ret_locs):
             i = 0
-            offs = self._get_selection_offs()
+            offs = self._get_selection_offs(self.ret_locs)
             nret = len(self.ret_locs)
             for x in range(offs,nret):
                 _, __, ret = self.ret_locs[x]
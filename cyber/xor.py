@@ -7,6 +7,9 @@ from ida_bytes import get_byte
 class Xor(ColorFilter):
     name = "XOR"
     help = "Apply 8-bit XOR operation.\n\nMMB: Set XOR key.\nRMB: Pick XOR key."
+    pure = True
+    use_lut = True
+    local = True
 
     def __init__(self):
         self.key = 0
@@ -32,16 +35,12 @@ class Xor(ColorFilter):
             self._set_xor_key(key)
         return
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
-        for mapped, buf in buffers:
-            if mapped:  
-                for c in buf:
-                    c = (c ^ self.key) & 0xFF
-                    colors.append((True, qRgb(0, c, c)))
-            else:
-                colors += [(False, None)]*len(buf)
-        return colors
+    def get_state(self):
+        return self.key
+
+    def on_get_color(self, c):
+        c = (c ^ self.key) & 0xFF
+        return qRgb(0, c, c)
 
     def on_get_tooltip(self, addr, size, mouse_offs):
         return "%X:\nCursor 0x%02X\nKey: 0x%02X" % (addr + mouse_offs, get_byte(addr + mouse_offs), self.key)
@@ -1,6 +1,5 @@
 from PyQt5.QtGui import qRgb
 from idacyber import ColorFilter
-from ida_xref import xrefblk_t
 
 class xrefsto(ColorFilter):
     name = "xrefs to"
@@ -8,36 +7,42 @@ class xrefsto(ColorFilter):
     zoom = 20
     highlight_cursor = False
     help = "Experimental code which highlights xrefs."
+    progressive = True
 
     def xrefcount(self, addr):
-        count = 0
-        xrefs = xrefblk_t()
-        if xrefs.first_to(addr, 0):
-            count +=1
-            while xrefs.next_to():
-                count += 1
-        return count
+        # shared with other windows and cached for as long as the xrefs don't change
+        return self.get_metadata().get_xref_count(addr)
         
 
-    def on_process_buffer(self, buffers, addr, size, mouse_offs):
-        colors = []
+    def _fill(self, counts, colors):
+        """colors the (offset, list of xref counts) tuples of 'counts'"""
+        for goffs, xrefs in counts:
+            if xrefs:
+                minimum, maximum = min(xrefs), max(xrefs)
+
+            for i, count in enumerate(xrefs, goffs):
+                r, g, b = self.hm(minimum, maximum, count)
+                colors[i] = qRgb(r, g, b)
+
+    def on_fill_progressive(self, buffers, addr, size, mouse_offs, colors, mask):
         goffs = 0
+        counts = []
         for mapped, buf in buffers:
-            xrefs = []
-            if mapped: 
+            if mapped:
+                xrefs = []
+                counts.append((goffs, xrefs))
+                minimum = maximum = None
                 for i in range(len(buf)):
-                    xrefs.append(self.xrefcount(addr + goffs + i))
-
-                if xrefs:
-                    minimum, maximum = min(xrefs), max(xrefs)
-                    
-                for count in xrefs:
-                    r, g, b = self.hm(minimum, maximum, count)
-                    colors.append((True, qRgb(r, g, b)))
-            else:
-                colors += [(False, None)]*len(buf)
+                    count = self.xrefcount(addr + goffs + i)
+                    xrefs.append(count)
+                    # scaled to what has been counted so far, fixed below
+                    minimum = count if minimum is None else min(minimum, count)
+                    maximum = count if maximum is None else max(maximum, count)
+                    r, g, b = self.hm(minimum, maximum, count) if minimum < maximum else self.hm(0, 0, 0)
+                    colors[goffs + i] = qRgb(r, g, b)
+                    yield goffs + i + 1
             goffs += len(buf)
-        return colors
+        self._fill(counts, colors)
 
     def hm(self, minimum, maximum, value):
         if minimum == maximum:
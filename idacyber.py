@@ -1,20 +1,42 @@
 import os
 import sys
+import time
+import copy
+import json
+import threading
+import traceback
 from random import randrange
-from math import floor
+from math import floor, ceil
+from array import array
+from collections import OrderedDict, deque
+from itertools import repeat
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from PyQt5.QtWidgets import (QWidget, QCheckBox, QLabel, QComboBox, QSizePolicy,
     QVBoxLayout, QHBoxLayout)
-from PyQt5.QtGui import QPainter, QColor, QFont, QImage, qRgb, QPainterPath
-from PyQt5.QtCore import Qt, QObject, pyqtSignal, QRect, QPoint
+from PyQt5.QtGui import (QPainter, QColor, QFont, QImage, qRgb, QPainterPath,
+    QPixmap, QKeyEvent, QMouseEvent, QWheelEvent)
+from PyQt5.QtCore import (Qt, QObject, pyqtSignal, QRect, QPoint, QTimer,
+    QPointF, QRectF, QEvent)
+from PyQt5.QtWidgets import QApplication
 
 
 import ida_kernwin
 import ida_diskio
 import ida_bytes
+import ida_funcs
+import ida_xref
 import ida_segment
 import ida_idaapi
 import ida_ida
+import ida_idp
+import ida_dbg
+import ida_auto
 from ida_pro import IDA_SDK_VERSION
 
 __author__ = 'Dennis Elser'
@@ -48,6 +70,8 @@ PLUGIN_HELP = """
     Data: Off/Ascii/Hex  |                              | d
     Data: composition    |                              | t
     Toggle sync          |                              | s
+    Frame timings (HUD)  |                              | p
+    Record session       |                              | Ctrl+Shift+r
     Help: Controls       |                              | Ctrl+F1
     Help: Current filter |                              | Ctrl+F2
     Close help           |                              | Escape
@@ -87,6 +111,65 @@ FONT_DEFAULT = "Consolas"
 HL_COLOR = ida_kernwin.CK_EXTRA3
 HIGHLIGHTED_ITEM = None
 
+# "transparency" effect for unmapped bytes and for pixels a filter didn't provide
+TRANSPARENCY_DARK = (qRgb(0x2F,0x4F,0x4F), qRgb(0x00,0x00,0x00))
+TRANSPARENCY_ERR = (qRgb(0x7F,0x00,0x00), qRgb(0x33,0x00,0x00))
+
+# byte offset of the alpha channel within a packed 0xAARRGGBB pixel
+ALPHA_OFFS = 3 if sys.byteorder == 'little' else 0
+
+# IDBBufHandler caches database bytes in pages of PAGE_SIZE bytes,
+# using at most BYTE_CACHE_SIZE bytes of memory
+PAGE_SIZE = 0x1000
+BYTE_CACHE_SIZE = 64 * 1024 * 1024
+
+# MetadataCache caches items, function chunks and xrefs in pages of
+# PAGE_SIZE addresses, using roughly at most META_CACHE_SIZE bytes of memory
+META_CACHE_SIZE = 32 * 1024 * 1024
+
+# read-ahead while scrolling: warm up the bytes of at most PREFETCH_MAX_VIEWS
+# views, looking PREFETCH_LOOKAHEAD seconds ahead at the current scroll
+# velocity. the colors of pure filters are rendered ahead, too.
+PREFETCH_MAX_VIEWS = 4
+PREFETCH_LOOKAHEAD = 0.5
+PREFETCH_COLORS = True
+
+# while the user drags or spins the mouse wheel, annotations, the data
+# overlay and the status panel are skipped and filters render previews.
+# full quality is restored after INTERACTIVE_IDLE_MS milliseconds of idle input
+INTERACTIVE_IDLE_MS = 150
+
+# generators of progressive filters are run for at most
+# PROGRESSIVE_BUDGET seconds per turn of the event loop
+PROGRESSIVE_BUDGET = 0.008
+
+# repaint requests are coalesced into at most MAX_FPS frames per second (0 = no limit)
+MAX_FPS = 60
+
+# while the user scrolls with sync enabled, the disassembly view follows once
+# input has been idle for SYNC_DEBOUNCE_MS milliseconds, but at most and, while
+# input lasts, at least SYNC_MAX_RATE times per second (0 = only once idle).
+# releasing a mouse button or key jumps right away
+SYNC_DEBOUNCE_MS = 100
+SYNC_MAX_RATE = 8
+
+# frame timings are kept for the last STATS_WINDOW frames of every filter
+STATS_WINDOW = 120
+
+# output of local filters is cached in tiles of TILE_SIZE bytes,
+# using at most TILE_CACHE_SIZE bytes of memory
+TILE_SIZE = PAGE_SIZE
+TILE_CACHE_SIZE = 32 * 1024 * 1024
+
+# the hex/ascii data overlay is drawn only if it is expected to take no
+# longer than DATA_OVERLAY_BUDGET seconds per frame, based on the measured
+# cost per glyph. DATA_OVERLAY_MAX_PIXELS is an additional hard limit (0 = none)
+DATA_OVERLAY_BUDGET = 0.025
+DATA_OVERLAY_MAX_PIXELS = 0
+
+# the 8 bits of every possible mask byte, lsb first
+UNPACKED_BITS = [bytes([(b >> i) & 1 for i in range(8)]) for b in range(256)]
+
 class ColorFilter():
     """every new color filters must inherit this class"""
     name = None
@@ -101,6 +184,32 @@ class ColorFilter():
     link_pixel = True
     support_selection = False
     disable_data = False
+    # True if on_fill_buffer() depends on nothing but the bytes, addr and
+    # size it is passed (neither on the mouse, the database nor on time)
+    pure = False
+    # True if the filter splits its work into on_snapshot(), which is run on
+    # the main thread, and on_fill_snapshot(), which is run on a worker thread.
+    # threaded frames are rendered again only if the view or the database
+    # changes or the filter calls on_filter_request_update(), not on mouse moves
+    threaded = False
+    # True if every mapped byte is colored through the ColorLUT returned by
+    # get_lut(), see on_get_color()
+    use_lut = False
+    # True if the color of a pixel depends on nothing but its own byte (and
+    # the filter's parameters). such frames are scrolled by shifting the
+    # previous frame and coloring the newly exposed pixels only. their
+    # output is also cached in tiles, see get_state()
+    local = False
+    # True if the filter implements on_fill_preview()
+    preview = False
+    # True if the filter implements on_fill_progressive(), which is used
+    # instead of on_fill_buffer() for the live view. threaded filters that
+    # set it implement on_snapshot_progressive() instead, their snapshot is
+    # taken in slices on the main thread and colored on the worker thread
+    progressive = False
+
+    _lut = None
+    _lut_state = None
 
 
     def __init__(self, pw=None):
@@ -118,19 +227,253 @@ class ColorFilter():
     def on_mb_click(self, event, addr, size, mouse_offs):
         pass
     
-    """called whenever a new frame is about to be drawn"""
+    """called whenever a new frame is about to be drawn (legacy API).
+    returns a list of (mapped, color) tuples, one per pixel"""
     def on_process_buffer(self, buffers, addr, size, mouse_offs):
         return []
 
+    """called whenever a new frame is about to be drawn.
+    fills the preallocated 'colors' array (packed 0xRRGGBB values) and
+    'mask' (one byte per pixel, 1 = opaque, 0 = transparent) in place.
+    both hold at least one element per byte of 'buffers', the mask is
+    initialized with the mapped state of every byte.
+    may return the number of pixels provided, defaults to the number of
+    bytes within 'buffers'. the default implementation adapts filters
+    that implement on_process_buffer() only."""
+    def on_fill_buffer(self, buffers, addr, size, mouse_offs, colors, mask):
+        if self.use_lut:
+            self.get_lut().fill(buffers, colors)
+            return None
+        pixels = self.on_process_buffer(buffers, addr, size, mouse_offs)
+        return pack_pixels(pixels, colors, mask)
+
+    """cheaper version of on_fill_buffer() that is called instead while the
+    user drags the graph or the slider, or spins the mouse wheel (filters
+    that set 'preview' only). a full-quality frame follows once input has
+    been idle for INTERACTIVE_IDLE_MS milliseconds"""
+    def on_fill_preview(self, buffers, addr, size, mouse_offs, colors, mask):
+        return self.on_fill_buffer(buffers, addr, size, mouse_offs, colors, mask)
+
+    """generator version of on_fill_buffer() (progressive filters only).
+    it is driven from an idle timer in slices of PROGRESSIVE_BUDGET seconds,
+    so it may call the IDA API without blocking the user interface for long.
+    yields the number of leading pixels that are colored so far, these are
+    drawn while the remaining ones show the filter's preview (if any).
+    returns what on_fill_buffer() would return. the generator is closed
+    as soon as the view changes"""
+    def on_fill_progressive(self, buffers, addr, size, mouse_offs, colors, mask):
+        result = self.on_fill_buffer(buffers, addr, size, mouse_offs, colors, mask)
+        yield len(mask)
+        return result
+
+    """maps a byte value to a packed 0xRRGGBB color (lut filters only).
+    evaluated once per byte value whenever the lookup table is built"""
+    def on_get_color(self, c):
+        return 0
+
+    """returns a hashable value describing the filter's parameters, e.g.
+    the key of a XOR filter. cached lookup tables and tiles are dropped
+    whenever it changes, and so are the frames in flight if it changes
+    on a mouse click. filters with parameters must implement this"""
+    def get_state(self):
+        return None
+
+    """returns the lookup table built from on_get_color(). filters that
+    combine the table with colors of their own can call this from within
+    on_fill_buffer()"""
+    def get_lut(self):
+        state = self.get_state()
+        if self._lut is None or self._lut_state != state:
+            self._lut = ColorLUT([self.on_get_color(c) for c in range(256)])
+            self._lut_state = state
+        return self._lut
+
+    """returns the MetadataCache that all windows and filters share.
+    filters that look up items, functions or xrefs for every byte should
+    do so through it, which must be done on the main thread"""
+    def get_metadata(self):
+        return SharedCache.get().meta
+
+    """called on the main thread before on_fill_snapshot() (threaded
+    filters only). collects and returns everything from the database that
+    on_fill_snapshot() is going to need"""
+    def on_snapshot(self, buffers, addr, size, mouse_offs):
+        return None
+
+    """generator version of on_snapshot() (threaded filters that set
+    'progressive' only). driven from an idle timer PROGRESSIVE_BUDGET
+    seconds at a time, it yields whenever it may be interrupted and
+    returns what on_snapshot() would return. abandoned once the view
+    changes, so it must not modify the filter"""
+    def on_snapshot_progressive(self, buffers, addr, size, mouse_offs):
+        snapshot = self.on_snapshot(buffers, addr, size, mouse_offs)
+        yield
+        return snapshot
+
+    """called on a worker thread whenever a new frame is about to be drawn
+    (threaded filters only). works like on_fill_buffer() but must not call
+    the IDA API, the database is available through 'snapshot' only.
+    results needed later on, e.g. by on_get_annotations(), must be stored
+    in 'snapshot' rather than the filter, see on_snapshot_done()"""
+    def on_fill_snapshot(self, snapshot, buffers, addr, size, mouse_offs, colors, mask):
+        return self.on_fill_buffer(buffers, addr, size, mouse_offs, colors, mask)
+
+    """called on the main thread once the frame colored by on_fill_snapshot()
+    is going to be shown (threaded filters only). 'snapshot' is the one
+    on_fill_snapshot() was passed, which may publish its results here"""
+    def on_snapshot_done(self, snapshot):
+        return
+
+    """called whenever the graph is painted, on top of the frame that
+    on_fill_buffer() rendered earlier. returns a list of (offset, colors)
+    tuples or None. 'offset' is the pixel at which the sequence of packed
+    0xRRGGBB 'colors' starts. animated filters draw their animation here
+    and call on_filter_request_overlay() from their timers, which keeps
+    the rest of the frame from being rendered again on every tick"""
+    def on_get_overlay(self, buffers, addr, size, mouse_offs):
+        return None
+
     """called before tooltip is shown"""
     def on_get_tooltip(self, addr, size, mouse_offs):
         return None
 
-    """called after on_process_buffer
+    """called after on_fill_buffer
     returns annotations and arrows/pointers"""
     def on_get_annotations(self, addr, size, mouse_offs):
         return None
 
+# -----------------------------------------------------------------------
+class FilterInfo():
+    """describes the filter of a module in the "cyber" folder without
+    creating it. name, help and capabilities are the class attributes of
+    the ColorFilter the module defines. FILTER_INIT() is called by
+    create(), once the filter is about to be used"""
+    # class attributes describing what a filter does
+    capabilities = ("threaded", "progressive", "preview", "local", "use_lut",
+        "pure", "support_selection")
+
+    def __init__(self, fmod):
+        self.fmod = fmod
+        classes = [obj for obj in vars(fmod).values() if isinstance(obj, type) and
+            issubclass(obj, ColorFilter) and obj.__module__ == fmod.__name__]
+        # of several filter classes, the one derived from all others is used
+        leaves = [cls for cls in classes if not any(other is not cls and
+            issubclass(other, cls) for other in classes)]
+        cls = leaves[0] if len(leaves) == 1 else ColorFilter
+        # updated by create(), in case FILTER_INIT() returns another class
+        self.name = cls.name
+        self.help = cls.help
+        self.caps = [cap for cap in FilterInfo.capabilities if getattr(cls, cap, False)]
+
+    def create(self, pw):
+        """returns a new instance of the filter or None if it
+        isn't available, e.g. for the current processor"""
+        fm = self.fmod.FILTER_INIT(pw)
+        if fm is not None:
+            self.name = fm.name
+            self.help = fm.help
+        return fm
+
+    def get_label(self):
+        """returns the text shown by the filter chooser"""
+        return self.name or self.fmod.__name__
+
+# -----------------------------------------------------------------------
+def pack_pixels(pixels, colors, mask):
+    """packs a list of (mapped, color) tuples into 'colors' and 'mask'"""
+    pixels = pixels[:len(colors)]
+    count = len(pixels)
+    colors[:count] = array('I', [0 if c is None else c & 0xFFFFFFFF for _, c in pixels])
+    mask[:count] = bytes([m or c is not None for m, c in pixels])
+    return count
+
+# -----------------------------------------------------------------------
+def unpack_mask(mask, count):
+    """expands the bitmask returned by get_bytes_and_mask() to one
+    byte per bit (1 = mapped, 0 = unmapped)"""
+    if np is not None:
+        return np.unpackbits(np.frombuffer(mask, dtype=np.uint8),
+            count=count, bitorder='little').tobytes()
+    return b''.join(map(UNPACKED_BITS.__getitem__, mask))[:count]
+
+# -----------------------------------------------------------------------
+def get_runs(bits):
+    """splits an unpacked mask into runs of equal values.
+    returns a list of (mapped, start, end) tuples"""
+    count = len(bits)
+    if not count:
+        return []
+
+    if np is not None:
+        a = np.frombuffer(bits, dtype=np.uint8)
+        bounds = (np.flatnonzero(a[1:] != a[:-1]) + 1).tolist()
+    else:
+        bounds = []
+        value = bits[0]
+        pos = bits.find(value ^ 1)
+        while pos != -1:
+            bounds.append(pos)
+            value ^= 1
+            pos = bits.find(value ^ 1, pos)
+
+    runs = []
+    mapped = bits[0] != 0
+    start = 0
+    for end in bounds + [count]:
+        runs.append((mapped, start, end))
+        mapped = not mapped
+        start = end
+    return runs
+
+# -----------------------------------------------------------------------
+def slice_buffers(buffers, start, end):
+    """returns the (mapped, buf) tuples covering bytes 'start' to 'end'
+    of the concatenation of 'buffers'"""
+    result = []
+    offs = 0
+    for mapped, buf in buffers:
+        lo = max(start - offs, 0)
+        hi = min(end - offs, len(buf))
+        if lo < hi:
+            result.append((mapped, buf[lo:hi]))
+        offs += len(buf)
+        if offs >= end:
+            break
+    return result
+
+# -----------------------------------------------------------------------
+class ColorLUT():
+    """table of 256 packed colors, indexed by byte value"""
+    def __init__(self, table):
+        self.table = [c & 0xFFFFFFFF for c in table]
+        if np is not None:
+            self.np_table = np.array(self.table, dtype=np.uint32)
+        else:
+            # one translation table per byte of a pixel, in memory order
+            shifts = range(0, 32, 8) if sys.byteorder == 'little' else range(24, -8, -8)
+            self.planes = [bytes((c >> shift) & 0xFF for c in self.table) for shift in shifts]
+
+    def __getitem__(self, c):
+        return self.table[c]
+
+    def fill(self, buffers, colors):
+        """colors the mapped bytes of 'buffers' in one go per buffer"""
+        if np is not None:
+            out = np.frombuffer(colors, dtype=np.uint32)
+        else:
+            out = memoryview(colors).cast('B')
+        offs = 0
+        for mapped, buf in buffers:
+            count = len(buf)
+            if mapped and count:
+                if np is not None:
+                    out[offs:offs+count] = self.np_table[np.frombuffer(buf, dtype=np.uint8)]
+                else:
+                    end = 4 * (offs + count)
+                    for i, plane in enumerate(self.planes):
+                        out[4*offs+i:end:4] = buf.translate(plane)
+            offs += count
+
 # -----------------------------------------------------------------------
 def is_ida_version(min_ver_required):
     return IDA_SDK_VERSION >= min_ver_required
@@ -163,62 +506,1770 @@ class UIHook(ida_kernwin.UI_Hooks):
 
 # -----------------------------------------------------------------------
 class ScreenEAHook(ida_kernwin.UI_Hooks):
+    """coalesces changes of the screen ea into one batch per iteration of
+    the event loop. 'new_ea' is emitted once the UI callback has returned,
+    no matter how many changes it has been notified of in between"""
     def __init__(self):
         ida_kernwin.UI_Hooks.__init__(self)
         self.sh = SignalHandler()
         self.new_ea = self.sh.ida_newea
+        self.changes = 0
+        self.batches = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._emit_batch)
     
     def screen_ea_changed(self, ea, prev_ea):
+        self.changes += 1
+        if not self.timer.isActive():
+            self.timer.start(0)
+
+    def _emit_batch(self):
+        self.batches += 1
         self.new_ea.emit()
 
+    def unhook(self):
+        self.timer.stop()
+        return ida_kernwin.UI_Hooks.unhook(self)
+
+    def get_stats(self):
+        return {"changes": self.changes,
+            "batches": self.batches,
+            "coalesced": self.changes - self.batches}
+
+# -----------------------------------------------------------------------
+class IDBHook(ida_idp.IDB_Hooks):
+    """invalidates cached bytes and metadata whenever the database changes"""
+    def __init__(self, cache):
+        ida_idp.IDB_Hooks.__init__(self)
+        self.cache = cache
+
+    def byte_patched(self, ea, old_value):
+        self.cache.invalidate(ea, ea + 1)
+        return 0
+
+    def segm_added(self, s):
+        self.cache.invalidate(s.start_ea, s.end_ea)
+        self.cache.invalidate_segments()
+        return 0
+
+    def segm_deleted(self, start_ea, end_ea, *args):
+        self.cache.invalidate(start_ea, end_ea)
+        self.cache.invalidate_segments()
+        return 0
+
+    def segm_start_changed(self, s, oldstart):
+        self.cache.invalidate(min(s.start_ea, oldstart), max(s.start_ea, oldstart))
+        self.cache.invalidate_segments()
+        return 0
+
+    def segm_end_changed(self, s, oldend):
+        self.cache.invalidate(min(s.end_ea, oldend), max(s.end_ea, oldend))
+        self.cache.invalidate_segments()
+        return 0
+
+    def segm_moved(self, _from, to, size, changed_netmap):
+        self.cache.invalidate(_from, _from + size)
+        self.cache.invalidate(to, to + size)
+        self.cache.invalidate_segments()
+        return 0
+
+    def allsegs_moved(self, info):
+        self.cache.invalidate()
+        self.cache.invalidate_segments()
+        return 0
+
+    def loader_finished(self, *args):
+        self.cache.invalidate()
+        self.cache.invalidate_segments()
+        return 0
+
+    def _items_changed(self, start, end):
+        self.cache.invalidate_metadata(start, end)
+        # the xrefs of new or destroyed items may refer to anywhere
+        self.cache.invalidate_metadata(kinds=("xrefs",))
+
+    def make_code(self, insn):
+        self._items_changed(insn.ea, insn.ea + insn.size)
+        return 0
+
+    def make_data(self, ea, flags, tid, size):
+        self._items_changed(ea, ea + size)
+        return 0
+
+    def destroyed_items(self, ea1, ea2, will_disable_range):
+        self._items_changed(ea1, ea2)
+        return 0
+
+    def _funcs_changed(self, *args):
+        # functions may consist of several chunks anywhere
+        self.cache.invalidate_metadata()
+        return 0
+
+    func_added = _funcs_changed
+    func_updated = _funcs_changed
+    func_deleted = _funcs_changed
+    set_func_start = _funcs_changed
+    set_func_end = _funcs_changed
+    func_tail_appended = _funcs_changed
+    func_tail_deleted = _funcs_changed
+    tail_owner_changed = _funcs_changed
+
+# -----------------------------------------------------------------------
+class DbgMemHook(ida_dbg.DBG_Hooks):
+    """invalidates cached bytes whenever the debuggee may have
+    changed its memory"""
+    def __init__(self, cache):
+        ida_dbg.DBG_Hooks.__init__(self)
+        self.cache = cache
+
+    def _invalidate(self, *args):
+        self.cache.invalidate()
+        return 0
+
+    def _invalidate_all(self, *args):
+        # the debugger adds and removes segments, too
+        self.cache.invalidate()
+        self.cache.invalidate_segments()
+        return 0
+
+    dbg_process_start = _invalidate_all
+    dbg_process_exit = _invalidate_all
+    dbg_process_attach = _invalidate_all
+    dbg_process_detach = _invalidate_all
+    # the debugger may not suspend the process after every event that
+    # follows a write to its memory, e.g. when a step or a request fails
+    dbg_suspend_process = _invalidate
+    dbg_trace = _invalidate
+    dbg_bpt = _invalidate
+    dbg_step_into = _invalidate
+    dbg_step_over = _invalidate
+    dbg_run_to = _invalidate
+    dbg_request_error = _invalidate
+
 # -----------------------------------------------------------------------
 class SignalHandler(QObject):    
     pw_statechanged = pyqtSignal()
     pw_next_filter = pyqtSignal()
     pw_prev_filter = pyqtSignal()
     ida_newea = pyqtSignal()
+    pw_frame_ready = pyqtSignal()
+
+# -----------------------------------------------------------------------
+class FrameBuffer():
+    """canvas of packed 0xAARRGGBB pixels (colors) plus one byte per pixel
+    that tells whether a pixel is opaque (mask). The colors array is handed
+    to QImage as is, without copying it."""
+    patterns = {}
+
+    def __init__(self, width, height, capacity=0):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        # filters may be passed more bytes than fit onto the canvas
+        capacity = max(capacity, self.size)
+        self.colors = array('I', bytes(4 * capacity))
+        self.mask = bytearray(capacity)
+        # number of pixels provided by the filter
+        self.count = 0
+
+    def set_mapped(self, buffers):
+        """initializes the mask from the mapped state of 'buffers'.
+        returns the total number of bytes"""
+        offs = 0
+        for mapped, buf in buffers:
+            count = len(buf)
+            if mapped:
+                self.mask[offs:offs+count] = b'\x01' * count
+            offs += count
+        return offs
+
+    def get_pattern(self, colors):
+        """returns a checkerboard of 2x2 px blocks covering the canvas"""
+        key = (colors, self.width, self.height)
+        pattern = FrameBuffer.patterns.get(key)
+        if pattern is None:
+            row_a = array('I', [colors[(x&2) != 0] for x in range(self.width)])
+            row_b = array('I', [colors[(x&2) == 0] for x in range(self.width)])
+            block = row_a * 2 + row_b * 2
+            pattern = (block * ((self.height + 3) // 4))[:self.size]
+            if len(FrameBuffer.patterns) > 8:
+                FrameBuffer.patterns.clear()
+            FrameBuffer.patterns[key] = pattern
+        return pattern
+
+    def apply_transparency(self, count):
+        """replaces transparent pixels by a checkerboard pattern.
+        pixels beyond 'count' were not provided by the filter at all."""
+        count = min(count, self.size)
+        colors = self.colors
+        mask = self.mask
+        self.count = count
+        # filters may have been passed more bytes than fit onto the canvas,
+        # e.g. a selection, or have changed the size of the arrays
+        if len(colors) > self.size:
+            del colors[self.size:]
+        if len(mask) > self.size:
+            del mask[self.size:]
+        if len(colors) < self.size:
+            colors.extend(array('I', bytes(4 * (self.size - len(colors)))))
+        if len(mask) < self.size:
+            mask.extend(bytes(self.size - len(mask)))
+        pattern = None
+        start = mask.find(0, 0, count)
+        while start != -1:
+            end = mask.find(1, start, count)
+            if end == -1:
+                end = count
+            if pattern is None:
+                pattern = self.get_pattern(TRANSPARENCY_DARK)
+            colors[start:end] = pattern[start:end]
+            start = mask.find(0, end, count)
+
+        if count < self.size:
+            colors[count:] = self.get_pattern(TRANSPARENCY_ERR)[count:]
+
+        # Format_RGB32 requires the alpha channel to be 0xFF
+        memoryview(colors).cast('B')[ALPHA_OFFS::4] = b'\xff' * self.size
+
+    def apply_overlay(self, overlay):
+        """draws the (offset, colors) tuples returned by a filter's
+        on_get_overlay() onto the opaque pixels of the canvas"""
+        colors = self.colors
+        mask = self.mask
+        for offs, pixels in overlay:
+            for i in range(max(offs, 0), min(offs + len(pixels), self.count)):
+                if mask[i]:
+                    colors[i] = pixels[i - offs] | 0xFF000000
+
+    def invert_pixel(self, x, y):
+        if x >= 0 and x < self.width and y >= 0 and y < self.height:
+            self.colors[y * self.width + x] ^= 0x00FFFFFF
+
+    def copy(self):
+        """returns a copy that doesn't share its colors with this canvas"""
+        fb = copy.copy(self)
+        fb.colors = array('I', self.colors)
+        return fb
+
+    def get_image(self):
+        """returns a QImage that shares memory with the colors array.
+        the FrameBuffer must be kept alive for as long as the image is used."""
+        if not self.size:
+            return QImage(self.width, self.height, QImage.Format_RGB32)
+        return QImage(self.colors, self.width, self.height, 4 * self.width, QImage.Format_RGB32)
+
+# -----------------------------------------------------------------------
+class GlyphAtlas():
+    """pixmap holding pre-rendered glyphs of all 256 byte values, laid out
+    as 16x16 cells of 'cell' x 'cell' px each. atlases are cached per
+    format, cell size, font and device pixel ratio"""
+    atlases = OrderedDict()
+    max_atlases = 8
+
+    formats = {
+        1: lambda c: chr(c) if 0x20 <= c < 0x7e else ".",
+        2: lambda c: "%02X" % c}
+
+    def __init__(self, fmt, cell, font, dpr=1.0):
+        self.cell = cell
+        self.scale = 1.0 / dpr
+        size = int(ceil(16 * cell * dpr))
+        self.pixmap = QPixmap(size, size)
+        self.pixmap.fill(Qt.transparent)
+
+        qp = QPainter(self.pixmap)
+        qp.scale(dpr, dpr)
+        qp.setFont(font)
+        qp.setPen(QColor(Qt.white))
+        glyph = GlyphAtlas.formats[fmt]
+        for c in range(256):
+            x = (c & 15) * cell
+            y = (c >> 4) * cell
+            qp.drawText(x, y, cell, cell, Qt.AlignCenter, glyph(c))
+        qp.end()
+
+        # source rectangles in device pixels, indexed by byte value
+        side = cell * dpr
+        self.rects = [QRectF((c & 15) * side, (c >> 4) * side, side, side) for c in range(256)]
+        self.positions = None
+        self.positions_key = None
+
+    @staticmethod
+    def get(fmt, cell, font, dpr=1.0):
+        key = (fmt, cell, font.key(), dpr)
+        atlas = GlyphAtlas.atlases.get(key)
+        if atlas is None:
+            atlas = GlyphAtlas(fmt, cell, font, dpr)
+            if len(GlyphAtlas.atlases) >= GlyphAtlas.max_atlases:
+                GlyphAtlas.atlases.popitem(last=False)
+            GlyphAtlas.atlases[key] = atlas
+        else:
+            GlyphAtlas.atlases.move_to_end(key)
+        return atlas
+
+    def get_positions(self, x0, y0, width, count):
+        """returns the centers of the first 'count' cells of the grid"""
+        key = (x0, y0, width, count)
+        if self.positions_key != key:
+            half = self.cell / 2.0
+            x0 += half
+            y0 += half
+            cell = self.cell
+            self.positions = [QPointF(x0 + (i % width) * cell, y0 + (i // width) * cell) for i in range(count)]
+            self.positions_key = key
+        return self.positions
+
+    def draw(self, qp, buffers, x0, y0, width, count):
+        """blits the glyphs of the mapped bytes of 'buffers' in one batch.
+        the glyph of pixel i is centered on cell (i % width, i // width)
+        of the grid starting at x0, y0. returns the number of glyphs drawn"""
+        positions = self.get_positions(x0, y0, width, count)
+        rects = self.rects
+        scale = repeat(self.scale)
+        create = QPainter.PixmapFragment.create
+        fragments = []
+        offs = 0
+        for mapped, buf in buffers:
+            if offs >= count:
+                break
+            if mapped:
+                end = min(offs + len(buf), count)
+                fragments += map(create,
+                    positions[offs:end],
+                    [rects[c] for c in buf[:end - offs]],
+                    scale,
+                    scale)
+            offs += len(buf)
+        if fragments:
+            qp.drawPixmapFragments(fragments, self.pixmap)
+        return len(fragments)
 
 # -----------------------------------------------------------------------
 class IDBBufHandler():
-    def __init__(self, loaderSegmentsOnly=False):
-        pass
+    def __init__(self, loaderSegmentsOnly=False, cache_size=BYTE_CACHE_SIZE):
+        # page address -> (bytes, unpacked mask), least recently used first
+        self.pages = OrderedDict()
+        self.max_pages = 1
+        self.hits = 0
+        self.misses = 0
+        # incremented whenever cached bytes are invalidated
+        self.generation = 0
+        # sorted start and end addresses of all segments, built on demand
+        self.seg_starts = None
+        self.seg_ends = None
+        self.set_cache_size(cache_size)
+
+    def set_cache_size(self, cache_size):
+        self.max_pages = max(1, cache_size // PAGE_SIZE)
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+
+    def get_cache_stats(self):
+        return {'pages': len(self.pages),
+            'max_pages': self.max_pages,
+            'hits': self.hits,
+            'misses': self.misses}
+
+    def invalidate(self, start=None, end=None):
+        """drops cached pages that overlap [start, end),
+        all pages if no range is given"""
+        # frames and tiles rendered from these bytes are outdated, too
+        self.generation += 1
+        if start is None or end is None:
+            self.pages.clear()
+            return
+        page_ea = start - start % PAGE_SIZE
+        if (end - page_ea) // PAGE_SIZE > len(self.pages):
+            for ea in [ea for ea in self.pages if ea + PAGE_SIZE > start and ea < end]:
+                del self.pages[ea]
+        else:
+            while page_ea < end:
+                self.pages.pop(page_ea, None)
+                page_ea += PAGE_SIZE
+
+    def _get_page(self, page_ea):
+        page = self.pages.get(page_ea)
+        if page is not None:
+            self.pages.move_to_end(page_ea)
+            self.hits += 1
+            return page
+
+        self.misses += 1
+        return self._load_page(page_ea)
+
+    def _load_page(self, page_ea):
+        result = ida_bytes.get_bytes_and_mask(page_ea, PAGE_SIZE)
+        if not result:
+            return None
+        buf, mask = result
+        page = (buf, unpack_mask(mask, len(buf)))
+        self.pages[page_ea] = page
+        if len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return page
+
+    def prefetch(self, ea, count):
+        """loads the pages covering [ea, ea+count) that aren't cached yet"""
+        end = min(ea + count, ea + (self.max_pages // 2) * PAGE_SIZE)
+        page_ea = ea - ea % PAGE_SIZE
+        while page_ea < end:
+            if page_ea not in self.pages and self._load_page(page_ea) is None:
+                break
+            page_ea += PAGE_SIZE
 
     def get_buffers(self, ea, count=0):
-        buffers = []
-        base = offs = 0
-        i = 0
-
-        result = ida_bytes.get_bytes_and_mask(ea, count)
-        if result:
-            buf, mask = result
-            for m in range(len(mask)):
-                b = mask[m]
-                if i == 0:
-                    ismapped = (b&1) != 0
-                for j in range(8):
-                    bitset = ((b>>j) & 1) != 0
-                    if bitset != ismapped:
-                        offs = i+j
-                        buffers.append((ismapped, buf[base:offs]))
-                        base = i+j
-                        ismapped = not ismapped
-
-                if j == 7:
-                    offs = i+j+1
-                    if m == len(mask)-1:
-                        buffers.append((ismapped, buf[base:offs]))
-                i += 8
-        return buffers
+        bufs = []
+        masks = []
+        end = ea + count
+        page_ea = ea - ea % PAGE_SIZE
+        while page_ea < end:
+            page = self._get_page(page_ea)
+            if page is None:
+                break
+            buf, bits = page
+            lo = max(ea, page_ea) - page_ea
+            hi = min(end, page_ea + PAGE_SIZE) - page_ea
+            bufs.append(buf[lo:hi])
+            masks.append(bits[lo:hi])
+            page_ea += PAGE_SIZE
+
+        buf = b''.join(bufs)
+        return [(mapped, buf[start:end]) for mapped, start, end in get_runs(b''.join(masks))]
+
+    def invalidate_segments(self):
+        self.seg_starts = self.seg_ends = None
+
+    def _build_segment_index(self):
+        bounds = []
+        for i in range(ida_segment.get_segm_qty()):
+            seg = ida_segment.getnseg(i)
+            if seg:
+                bounds.append((seg.start_ea, seg.end_ea))
+        bounds.sort()
+        self.seg_starts = [start for start, _ in bounds]
+        self.seg_ends = [end for _, end in bounds]
 
     def get_base(self, ea):
-        base = ida_idaapi.BADADDR
-        qty = ida_segment.get_segm_qty()
-        for i in range(qty):
-            seg = ida_segment.getnseg(i)
-            if seg and seg.contains(ea):
-                base = seg.start_ea
-                break
-        return base
+        if self.seg_starts is None:
+            self._build_segment_index()
+        i = bisect_right(self.seg_starts, ea) - 1
+        if i >= 0 and ea < self.seg_ends[i]:
+            return self.seg_starts[i]
+        return ida_idaapi.BADADDR
+
+# -----------------------------------------------------------------------
+class MetadataCache():
+    """LRU cache of what filters look up in the database for every byte:
+    items, function chunks and the number of xrefs. lookups are done for
+    a page of PAGE_SIZE addresses at once, the IDA API is called once per
+    item or chunk where possible. must be used on the main thread"""
+    def __init__(self, cache_size=META_CACHE_SIZE):
+        # (kind, page address) -> (metadata, size), least recently used first
+        self.pages = OrderedDict()
+        # kind -> (page address, metadata) of the page looked up last
+        self.last = {}
+        self.max_size = cache_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # incremented whenever cached metadata is invalidated
+        self.generation = 0
+        self.loaders = {"items": self._load_items,
+            "chunks": self._load_chunks,
+            "xrefs": self._load_xrefs}
+
+    def get_cache_stats(self):
+        return {'pages': len(self.pages),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses}
+
+    def invalidate(self, start=None, end=None, kinds=None):
+        """drops cached pages of 'kinds' ("items", "chunks", "xrefs")
+        that overlap [start, end), all pages if no range is given"""
+        if kinds is None:
+            kinds = self.loaders
+        # frames rendered from this metadata are outdated, too
+        self.generation += 1
+        self.last.clear()
+        if start is None or end is None:
+            keys = [key for key in self.pages if key[0] in kinds]
+        elif (end - start) // PAGE_SIZE + 1 > len(self.pages):
+            keys = [key for key in self.pages if key[0] in kinds and
+                key[1] + PAGE_SIZE > start and key[1] < end]
+        else:
+            page_ea = start - start % PAGE_SIZE
+            keys = [(kind, ea) for kind in kinds for ea in range(page_ea, end, PAGE_SIZE)]
+        for key in keys:
+            page = self.pages.pop(key, None)
+            if page is not None:
+                self.size -= page[1]
+
+    def _get_page(self, kind, ea):
+        page_ea = ea - ea % PAGE_SIZE
+        last = self.last.get(kind)
+        if last is not None and last[0] == page_ea:
+            self.hits += 1
+            return last[1]
+
+        key = (kind, page_ea)
+        page = self.pages.get(key)
+        if page is not None:
+            self.pages.move_to_end(key)
+            self.hits += 1
+            self.last[kind] = (page_ea, page[0])
+            return page[0]
+
+        self.misses += 1
+        data, size = self.loaders[kind](page_ea)
+        self.last[kind] = (page_ea, data)
+        self.pages[key] = (data, size)
+        self.size += size
+        while self.size > self.max_size and len(self.pages) > 1:
+            self.size -= self.pages.popitem(last=False)[1][1]
+        return data
+
+    def _load_items(self, page_ea):
+        heads = array('Q')
+        ends = array('Q')
+        flags = array('Q')
+        end_page = page_ea + PAGE_SIZE
+        ea = ida_bytes.get_item_head(page_ea)
+        while ea < end_page:
+            end = max(ida_bytes.get_item_end(ea), ea + 1)
+            heads.append(ea)
+            ends.append(end)
+            flags.append(ida_bytes.get_flags(ea))
+            ea = end
+        return ((heads, ends, flags), 24 * len(heads))
+
+    def _load_chunks(self, page_ea):
+        starts = array('Q')
+        ends = array('Q')
+        end_page = page_ea + PAGE_SIZE
+        chunk = ida_funcs.get_fchunk(page_ea) or ida_funcs.get_next_fchunk(page_ea)
+        while chunk and chunk.start_ea < end_page:
+            starts.append(chunk.start_ea)
+            ends.append(chunk.end_ea)
+            chunk = ida_funcs.get_next_fchunk(chunk.start_ea)
+        return ((starts, ends), 16 * len(starts))
+
+    def _load_xrefs(self, page_ea):
+        counts = array('H', bytes(2 * PAGE_SIZE))
+        xb = ida_xref.xrefblk_t()
+        for i in range(PAGE_SIZE):
+            count = 0
+            ok = xb.first_to(page_ea + i, ida_xref.XREF_ALL)
+            while ok and count < 0xFFFF:
+                count += 1
+                ok = xb.next_to()
+            counts[i] = count
+        return (counts, 2 * PAGE_SIZE)
+
+    def get_item(self, ea):
+        """returns (head, end, flags) of the item at 'ea', like
+        get_item_head(), get_item_end() and get_flags(head)"""
+        heads, ends, flags = self._get_page("items", ea)
+        # the first item of a page starts at or before the page
+        i = bisect_right(heads, ea) - 1
+        return (heads[i], ends[i], flags[i])
+
+    def get_func_chunk(self, ea):
+        """returns (start, end) of the function chunk at 'ea', or None
+        if 'ea' doesn't belong to a function, like get_func()"""
+        starts, ends = self._get_page("chunks", ea)
+        i = bisect_right(starts, ea) - 1
+        if i >= 0 and ea < ends[i]:
+            return (starts[i], ends[i])
+        return None
+
+    def get_xref_count(self, ea):
+        """returns the number of xrefs to 'ea'"""
+        return self._get_page("xrefs", ea)[ea % PAGE_SIZE]
+
+# -----------------------------------------------------------------------
+class SharedCache():
+    """the bytes (IDBBufHandler) and metadata (MetadataCache) of the
+    database, shared by all IDACyber windows and their filters. windows
+    acquire() it when they are created and release() it when closed,
+    everything cached is dropped once the last one is gone"""
+    cache = None
+
+    @staticmethod
+    def get():
+        if SharedCache.cache is None:
+            SharedCache.cache = SharedCache()
+        return SharedCache.cache
+
+    def __init__(self):
+        self.bytes = IDBBufHandler(True, cache_size=BYTE_CACHE_SIZE)
+        self.meta = MetadataCache()
+        self.owners = set()
+
+    def acquire(self, owner):
+        self.owners.add(owner)
+        return self
+
+    def release(self, owner):
+        self.owners.discard(owner)
+        if not self.owners:
+            # what is cached may belong to a database that is about to be closed
+            self.invalidate()
+
+    def invalidate(self, start=None, end=None):
+        self.bytes.invalidate(start, end)
+        self.meta.invalidate(start, end)
+
+    def invalidate_metadata(self, start=None, end=None, kinds=None):
+        self.meta.invalidate(start, end, kinds)
+
+    def invalidate_segments(self):
+        self.bytes.invalidate_segments()
+
+    def get_stats(self):
+        return {"windows": len(self.owners),
+            "bytes": self.bytes.get_cache_stats(),
+            "meta": self.meta.get_cache_stats()}
+
+# -----------------------------------------------------------------------
+class TileCache():
+    """LRU cache of the colors and masks local filters produce for tiles
+    of TILE_SIZE bytes, keyed by (filter, state, tile address)"""
+    def __init__(self, cache_size=TILE_CACHE_SIZE):
+        self.tiles = OrderedDict()
+        # every tile takes 4 bytes of colors plus 1 byte of mask per byte
+        self.max_tiles = max(1, cache_size // (5 * TILE_SIZE))
+        # last state seen per filter
+        self.states = {}
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.tiles.clear()
+        self.states.clear()
+
+    def validate(self, fm, state, generation):
+        """evicts the tiles that are outdated because the database
+        or the parameters of filter 'fm' have changed"""
+        if generation != self.generation:
+            self.clear()
+            self.generation = generation
+        if fm in self.states and self.states[fm] != state:
+            for key in [key for key in self.tiles if key[0] is fm]:
+                del self.tiles[key]
+        self.states[fm] = state
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {"tiles": len(self.tiles),
+            "max_tiles": self.max_tiles,
+            "size": len(self.tiles) * 5 * TILE_SIZE,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0}
+
+# -----------------------------------------------------------------------
+class Prefetcher():
+    """tracks the scroll direction and velocity of a PixelWidget and
+    warms up the views ahead of it while the event loop is idle"""
+    def __init__(self, pw):
+        self.pw = pw
+        self.prev_addr = None
+        self.prev_time = 0
+        self.direction = 0
+        self.velocity = 0.0
+        self.queue = []
+        # (filter, addr, width, height, generation) -> (buffers, fb)
+        self.frames = OrderedDict()
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._work)
+
+    def reset(self):
+        self.queue = []
+        self.frames.clear()
+        self.timer.stop()
+
+    def _get_key(self, addr, width, height):
+        return (self.pw.fm, addr, width, height, self.pw.engine.get_generation())
+
+    def take_frame(self, addr, width, height):
+        return self.frames.pop(self._get_key(addr, width, height), None)
+
+    def on_frame(self, addr, size):
+        """called for every frame drawn, schedules read-ahead"""
+        now = time.perf_counter()
+        delta = 0 if self.prev_addr is None else addr - self.prev_addr
+        dt = max(now - self.prev_time, 1e-3)
+        self.prev_addr = addr
+        self.prev_time = now
+
+        if not size or not delta:
+            return
+
+        direction = 1 if delta > 0 else -1
+        if direction != self.direction or (abs(delta) > size * PREFETCH_MAX_VIEWS and not self.pw.is_scrolling):
+            # turned around or jumped somewhere else
+            self.direction = direction
+            self.velocity = 0.0
+            self.reset()
+            return
+
+        # exponential moving average of bytes scrolled per second
+        self.velocity = 0.5 * self.velocity + 0.5 * (abs(delta) / dt)
+        views = min(max(1, ceil(self.velocity * PREFETCH_LOOKAHEAD / size)), PREFETCH_MAX_VIEWS)
+        self.queue = []
+        fm = self.pw.fm
+        # scrolling the frames of local filters is cheaper than prefetching them
+        if PREFETCH_COLORS and fm is not None and fm.pure and not fm.local:
+            # the next two frames, assuming the user keeps scrolling at the same pace
+            self.queue += [(True, addr + delta * i) for i in range(1, 3)]
+        self.queue += [(False, addr + direction * size * i) for i in range(1, views + 1)]
+        self.timer.start(0)
+
+    def _work(self):
+        if not self.queue:
+            return
+        render, ea = self.queue.pop(0)
+        pw = self.pw
+        size = pw.get_pixel_qty()
+
+        if render:
+            width = pw.get_pixel_qty_per_line()
+            height = size // width
+            key = self._get_key(ea, width, height)
+            if key not in self.frames:
+                self.frames[key] = pw.engine.render_frame(ea, size, width, height, pw.mouseOffs)
+                while len(self.frames) > PREFETCH_MAX_VIEWS:
+                    self.frames.popitem(last=False)
+        else:
+            pw.bh.prefetch(ea, size)
+
+        if self.queue:
+            self.timer.start(0)
+
+# -----------------------------------------------------------------------
+class RenderJob():
+    """everything needed to color a frame, taken on the main thread"""
+    def __init__(self, fm, buffers, addr, size, mouse_offs, fb, count, snapshot=None, preview=False):
+        self.fm = fm
+        self.preview = preview
+        self.buffers = buffers
+        self.addr = addr
+        self.size = size
+        self.mouse_offs = mouse_offs
+        self.fb = fb
+        self.count = count
+        self.snapshot = snapshot
+        # False until the snapshot of a threaded filter has been taken
+        self.ready = True
+        self.key = None
+
+    def run(self):
+        """colors the frame. returns (buffers, FrameBuffer)"""
+        if self.preview:
+            result = self.fm.on_fill_preview(self.buffers, self.addr,
+                self.size, self.mouse_offs, self.fb.colors, self.fb.mask)
+        elif self.fm.threaded:
+            result = self.fm.on_fill_snapshot(self.snapshot, self.buffers, self.addr,
+                self.size, self.mouse_offs, self.fb.colors, self.fb.mask)
+        elif self.fm.progressive:
+            steps = self.fm.on_fill_progressive(self.buffers, self.addr,
+                self.size, self.mouse_offs, self.fb.colors, self.fb.mask)
+            result = None
+            try:
+                while True:
+                    next(steps)
+            except StopIteration as e:
+                result = e.value
+        else:
+            result = self.fm.on_fill_buffer(self.buffers, self.addr,
+                self.size, self.mouse_offs, self.fb.colors, self.fb.mask)
+        self.fb.apply_transparency(self.count if result is None else result)
+        return (self.buffers, self.fb)
+
+    def take_snapshot(self):
+        """takes the snapshot of a threaded filter step by step using
+        on_snapshot_progressive(). must be run on the main thread"""
+        self.snapshot = yield from self.fm.on_snapshot_progressive(self.buffers,
+            self.addr, self.size, self.mouse_offs)
+        self.ready = True
+
+    def publish(self):
+        """hands what on_fill_snapshot() stored in the snapshot over to
+        the filter. must be called on the main thread"""
+        if self.fm.threaded and not self.preview:
+            self.fm.on_snapshot_done(self.snapshot)
+
+    def iterate(self):
+        """colors the frame step by step using on_fill_progressive().
+        yields the number of pixels done, returns (buffers, FrameBuffer)"""
+        result = yield from self.fm.on_fill_progressive(self.buffers, self.addr,
+            self.size, self.mouse_offs, self.fb.colors, self.fb.mask)
+        self.fb.apply_transparency(self.count if result is None else result)
+        return (self.buffers, self.fb)
+
+# -----------------------------------------------------------------------
+class ProgressiveRenderer():
+    """colors the frames of progressive filters from an idle timer,
+    PROGRESSIVE_BUDGET seconds at a time. frames are shown while they
+    progress, and the work on a frame is abandoned once the view changes"""
+    def __init__(self, pw):
+        self.pw = pw
+        # key of the frame in progress
+        self.key = None
+        self.job = None
+        self.steps = None
+        # number of pixels done
+        self.done = 0
+        # (buffers, FrameBuffer) of the filter's preview
+        self.preview = None
+        # (key, (buffers, FrameBuffer)) of the frame completed last
+        self.frame = None
+        self.abandoned = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._work)
+
+    def invalidate(self):
+        """forces the next frame to be rendered again"""
+        self.stop()
+        self.key = None
+        self.frame = None
+
+    def stop(self):
+        self.timer.stop()
+        if self.steps is not None:
+            self.steps.close()
+            self.abandoned += 1
+        self.steps = self.job = self.preview = None
+
+    def get_frame(self, key, prepare, prepare_preview=None):
+        """returns the frame for 'key', which may still be in progress.
+        'prepare' is called to create the RenderJob of a new frame,
+        'prepare_preview' to render what is shown until pixels are done"""
+        if self.frame is not None and self.frame[0] == key:
+            buffers, fb = self.frame[1]
+            return (buffers, fb.copy())
+
+        if key != self.key:
+            self.stop()
+            self.key = key
+            self.job = prepare()
+            self.steps = self.job.iterate()
+            self.done = 0
+            if prepare_preview is not None:
+                self.preview = prepare_preview()
+            self.timer.start(0)
+        return self._get_partial()
+
+    def _get_partial(self):
+        """composes the pixels done so far with the preview"""
+        buffers, fb = self.job.buffers, self.job.fb
+        done = min(self.done, len(fb.mask))
+        partial = FrameBuffer(fb.width, fb.height, len(fb.mask))
+        if self.preview is not None:
+            preview = self.preview[1]
+            partial.colors[:] = preview.colors[:len(partial.colors)]
+            partial.mask[:] = preview.mask[:len(partial.mask)]
+        partial.colors[:done] = fb.colors[:done]
+        partial.mask[:done] = fb.mask[:done]
+        partial.apply_transparency(self.job.count)
+        return (buffers, partial)
+
+    def _work(self):
+        if self.steps is None:
+            return
+
+        start = time.perf_counter()
+        deadline = start + PROGRESSIVE_BUDGET
+        name = self.job.fm.name
+        try:
+            while time.perf_counter() < deadline:
+                self.done = next(self.steps)
+        except StopIteration as e:
+            self.frame = (self.key, e.value)
+            self.steps = self.job = self.preview = None
+        except Exception:
+            ida_kernwin.msg("IDACyber: %s failed:\n%s" % (self.pw.fm.name, traceback.format_exc()))
+            # keep what has been done, don't start over
+            self.frame = (self.key, self._get_partial())
+            self.steps = self.job = self.preview = None
+        else:
+            self.timer.start(0)
+        self.pw.stats.add_sample(name, "progressive", time.perf_counter() - start)
+        self.pw.request_frame()
+
+# -----------------------------------------------------------------------
+class RenderWorker():
+    """colors the frames of threaded filters on a worker thread. only the
+    most recent job is kept, older ones are cancelled before they start or
+    discarded once they are done. until a new frame is ready, the last one
+    completed stays on screen. snapshots that aren't ready are taken on
+    the main thread from an idle timer first, PROGRESSIVE_BUDGET seconds
+    at a time"""
+    def __init__(self, pw):
+        self.pw = pw
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        # job waiting to be picked up by the thread
+        self.job = None
+        # (key, frame, error) of the job the thread finished last
+        self.result = None
+        # key of the job submitted last
+        self.key = None
+        # (key, (buffers, FrameBuffer)) of the frame completed last
+        self.frame = None
+        # (job, steps) of the snapshot being taken
+        self.snapshot = None
+        self.cancelled = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._take_snapshot)
+        pw.sh.pw_frame_ready.connect(self._on_frame_ready)
+
+    def invalidate(self):
+        """forces the next frame to be rendered again"""
+        self._cancel_snapshot()
+        self.key = None
+
+    def set_placeholder(self, fm, frame):
+        """shows 'frame' (e.g. a preview) until the next one is ready"""
+        self._cancel_snapshot()
+        self.frame = ((fm,), frame)
+        self.key = None
+
+    def stop(self):
+        self._cancel_snapshot()
+        with self.cond:
+            self.stopped = True
+            self.job = None
+            self.cond.notify()
+
+    def get_frame(self, key, prepare, prepare_preview=None):
+        """returns the frame for 'key' if it is ready, the last frame
+        completed otherwise. 'prepare' is called on the main thread to
+        create the RenderJob of a frame that hasn't been requested yet,
+        'prepare_preview' to render what is shown while the first frame
+        of a filter is in progress"""
+        if key != self.key:
+            self._cancel_snapshot()
+            self.key = key
+            job = prepare()
+            job.key = key
+            if self.frame is None or self.frame[0][0] is not key[0]:
+                if not job.ready and prepare_preview is not None:
+                    self.frame = ((key[0],), prepare_preview())
+                    self._start_snapshot(job)
+                else:
+                    # nothing to show for this filter yet, don't make the user wait
+                    start = time.perf_counter()
+                    if not job.ready:
+                        for _ in job.take_snapshot():
+                            pass
+                    self.frame = (key, job.run())
+                    job.publish()
+                    self.pw.stats.add("filter", time.perf_counter() - start)
+            elif not job.ready:
+                self._start_snapshot(job)
+            else:
+                self._submit(job)
+        buffers, fb = self.frame[1]
+        # the caller may draw onto the frame
+        return (buffers, fb.copy())
+
+    def _start_snapshot(self, job):
+        self.snapshot = (job, job.take_snapshot())
+        self.timer.start(0)
+
+    def _cancel_snapshot(self):
+        self.timer.stop()
+        if self.snapshot is not None:
+            self.snapshot[1].close()
+            self.snapshot = None
+            self.cancelled += 1
+
+    def _take_snapshot(self):
+        if self.snapshot is None:
+            return
+
+        job, steps = self.snapshot
+        start = time.perf_counter()
+        deadline = start + PROGRESSIVE_BUDGET
+        try:
+            while time.perf_counter() < deadline:
+                next(steps)
+        except StopIteration:
+            self.snapshot = None
+            self._submit(job)
+        except Exception:
+            ida_kernwin.msg("IDACyber: %s failed:\n%s" % (job.fm.name, traceback.format_exc()))
+            self.snapshot = None
+        else:
+            self.timer.start(0)
+        self.pw.stats.add_sample(job.fm.name, "progressive", time.perf_counter() - start)
+
+    def _submit(self, job):
+        with self.cond:
+            if self.job is not None:
+                self.cancelled += 1
+            self.job = job
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="IDACyber render worker")
+                self.thread.daemon = True
+                self.thread.start()
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.job is None and not self.stopped:
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                job = self.job
+                self.job = None
+
+            frame = error = None
+            start = time.perf_counter()
+            try:
+                frame = job.run()
+            except Exception:
+                error = traceback.format_exc()
+            self.pw.stats.add_sample(job.fm.name, "worker", time.perf_counter() - start)
+
+            with self.cond:
+                self.result = (job, frame, error)
+            self.pw.sh.pw_frame_ready.emit()
+
+    def _on_frame_ready(self):
+        with self.cond:
+            result = self.result
+            self.result = None
+        if result is None:
+            return
+
+        job, frame, error = result
+        key = job.key
+        if error:
+            ida_kernwin.msg("IDACyber: %s failed:\n%s" % (key[0].name, error))
+        if key != self.key:
+            # the view has moved on in the meantime
+            self.cancelled += 1
+            return
+        if frame is not None:
+            job.publish()
+            self.frame = (key, frame)
+            self.pw.request_frame()
+
+# -----------------------------------------------------------------------
+class RenderEngine():
+    """renders the frames of a filter without a widget. fetches bytes from
+    a buffer source such as IDBBufHandler, has them colored by the filter
+    and keeps what the next frame can reuse. PixelWidget is one client,
+    headless ones call render(). filters that query the geometry of the
+    canvas can be created with the engine in place of the widget"""
+    def __init__(self, bh, fm=None):
+        self.bh = bh
+        self.fm = fm
+        self.tiles = TileCache()
+        self.stats = FrameStats()
+        # geometry of the last call to render()
+        self.width = 1
+        self.count = 0
+        # (filter, addr, width, height, generation, FrameBuffer) of local filters
+        self.last_frame = None
+
+    def discard(self):
+        """forgets the previous frame, e.g. because the filter's
+        parameters changed"""
+        self.last_frame = None
+
+    def get_pixel_qty_per_line(self):
+        return self.width
+
+    def get_pixel_qty(self):
+        return self.count
+
+    def get_generation(self):
+        """returns what changes whenever the bytes or the metadata
+        frames are rendered from are invalidated"""
+        return (self.bh.generation, SharedCache.get().meta.generation)
+
+    def render(self, addr, width, count, mouse_offs=None):
+        """renders 'count' pixels starting at 'addr', 'width' pixels per line.
+        returns (colors, annotations), where colors is an array of
+        packed 0xAARRGGBB values, one per pixel"""
+        self.width = width
+        self.count = count
+        height = max(1, ceil(count / width))
+        buffers, fb = self.render_view(addr, count, width, height, mouse_offs)
+        overlay = self.fm.on_get_overlay(buffers, addr, width * height, mouse_offs)
+        if overlay:
+            fb = fb.copy()
+            fb.apply_overlay(overlay)
+        annotations = self.fm.on_get_annotations(addr, count, mouse_offs)
+        return (fb.colors[:count], annotations)
+
+    def render_view(self, addr, buf_size, width, height, mouse_offs=None):
+        """renders 'buf_size' bytes at 'addr' on the calling thread, reusing
+        the previous frame or cached tiles of local filters if possible.
+        the frame returned may be shared and must not be drawn onto.
+        returns (buffers, FrameBuffer)"""
+        frame = None
+        full = buf_size == width * height
+        if self.fm.local and full:
+            frame = self.scroll_frame(addr, width, height, mouse_offs)
+        if self.fm.local and frame is None and full:
+            frame = self.render_tiles(addr, width, height, mouse_offs)
+        if frame is None:
+            frame = self.render_frame(addr, buf_size, width, height, mouse_offs)
+        if self.fm.local and full:
+            self.last_frame = (self.fm, addr, width, height, self.get_generation(), frame[1])
+        return frame
+
+    def prepare_frame(self, addr, buf_size, width, height, mouse_offs=None, preview=False, snapshot=True):
+        """fetches 'buf_size' bytes at 'addr' and, for threaded filters,
+        takes a snapshot of the database unless 'snapshot' is False, in
+        which case it is left to RenderJob.take_snapshot(). returns a
+        RenderJob"""
+        start = time.perf_counter()
+        buffers = self.bh.get_buffers(addr, buf_size)
+        self.stats.add("buffers", time.perf_counter() - start)
+        fb = FrameBuffer(width, height, sum(len(buf) for _, buf in buffers))
+        count = fb.set_mapped(buffers)
+        job = RenderJob(self.fm, buffers, addr, width * height, mouse_offs, fb, count, preview=preview)
+        if self.fm.threaded and not preview:
+            job.ready = False
+            if snapshot:
+                for _ in job.take_snapshot():
+                    pass
+        return job
+
+    def render_frame(self, addr, buf_size, width, height, mouse_offs=None, preview=False):
+        """fetches 'buf_size' bytes at 'addr' and colors them using
+        the current filter. returns (buffers, FrameBuffer)"""
+        job = self.prepare_frame(addr, buf_size, width, height, mouse_offs, preview)
+        start = time.perf_counter()
+        frame = job.run()
+        job.publish()
+        self.stats.add("filter", time.perf_counter() - start)
+        return frame
+
+    def scroll_frame(self, addr, width, height, mouse_offs=None):
+        """renders the frame at 'addr' by shifting the previous one
+        and coloring only the pixels that have been scrolled into view.
+        returns (buffers, FrameBuffer) or None if that isn't possible"""
+        if not self.last_frame:
+            return None
+        fm, prev_addr, prev_width, prev_height, generation, prev_fb = self.last_frame
+        size = width * height
+        delta = addr - prev_addr
+        if (fm is not self.fm or
+            (prev_width, prev_height) != (width, height) or
+            generation != self.get_generation() or
+            not delta or abs(delta) >= size or
+            prev_fb.count != size):
+            return None
+
+        start = time.perf_counter()
+        buffers = self.bh.get_buffers(addr, size)
+        self.stats.add("buffers", time.perf_counter() - start)
+        if sum(len(buf) for _, buf in buffers) != size:
+            return None
+
+        fb = FrameBuffer(width, height)
+        keep = size - abs(delta)
+        if delta > 0:
+            fb.colors[:keep] = prev_fb.colors[delta:size]
+            fb.mask[:keep] = prev_fb.mask[delta:size]
+            start, end = keep, size
+        else:
+            fb.colors[-delta:size] = prev_fb.colors[:keep]
+            fb.mask[-delta:size] = prev_fb.mask[:keep]
+            start, end = 0, -delta
+
+        exposed = slice_buffers(buffers, start, end)
+        part = FrameBuffer(end - start, 1)
+        part.set_mapped(exposed)
+        fill_start = time.perf_counter()
+        result = self.fm.on_fill_buffer(exposed, addr + start, size, mouse_offs, part.colors, part.mask)
+        self.stats.add("filter", time.perf_counter() - fill_start)
+        if result is not None and result < end - start:
+            return None
+        fb.colors[start:end] = part.colors[:end - start]
+        fb.mask[start:end] = part.mask[:end - start]
+        fb.apply_transparency(size)
+        return (buffers, fb)
+
+    def render_tiles(self, addr, width, height, mouse_offs=None):
+        """renders the frame at 'addr' from cached tiles, coloring
+        only the tiles that are missing from the cache.
+        returns (buffers, FrameBuffer) or None if that isn't possible"""
+        size = width * height
+        start = time.perf_counter()
+        buffers = self.bh.get_buffers(addr, size)
+        self.stats.add("buffers", time.perf_counter() - start)
+        if sum(len(buf) for _, buf in buffers) != size:
+            return None
+
+        fm = self.fm
+        state = fm.get_state()
+        self.tiles.validate(fm, state, self.get_generation())
+
+        fb = FrameBuffer(width, height)
+        end = addr + size
+        tile_ea = addr - addr % TILE_SIZE
+        while tile_ea < end:
+            key = (fm, state, tile_ea)
+            tile = self.tiles.get(key)
+            if tile is None:
+                tile = self.render_tile(tile_ea, mouse_offs)
+                if tile is None:
+                    return None
+                self.tiles.put(key, tile)
+            colors, mask = tile
+            lo = max(addr, tile_ea) - tile_ea
+            hi = min(end, tile_ea + TILE_SIZE) - tile_ea
+            dst = tile_ea + lo - addr
+            fb.colors[dst:dst + hi - lo] = colors[lo:hi]
+            fb.mask[dst:dst + hi - lo] = mask[lo:hi]
+            tile_ea += TILE_SIZE
+
+        fb.apply_transparency(size)
+        return (buffers, fb)
+
+    def render_tile(self, tile_ea, mouse_offs=None):
+        """colors the TILE_SIZE bytes at 'tile_ea'.
+        returns (colors, mask) or None"""
+        start = time.perf_counter()
+        buffers = self.bh.get_buffers(tile_ea, TILE_SIZE)
+        self.stats.add("buffers", time.perf_counter() - start)
+        part = FrameBuffer(TILE_SIZE, 1)
+        if part.set_mapped(buffers) != TILE_SIZE:
+            return None
+        start = time.perf_counter()
+        result = self.fm.on_fill_buffer(buffers, tile_ea, TILE_SIZE, mouse_offs, part.colors, part.mask)
+        self.stats.add("filter", time.perf_counter() - start)
+        if result is not None and result < TILE_SIZE:
+            return None
+        return (part.colors, part.mask)
+
+# -----------------------------------------------------------------------
+class FrameScheduler():
+    """coalesces the repaint requests of a PixelWidget into at most one
+    frame per 1/MAX_FPS seconds. requests that arrive while a frame is
+    pending are merged into it and counted as dropped"""
+    def __init__(self, pw):
+        self.pw = pw
+        self.pending = False
+        self.last_frame = 0.0
+        self.requested = 0
+        self.frames = 0
+        self.dropped = 0
+        self.late = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.pw.update)
+
+    def get_interval(self):
+        return 1.0 / MAX_FPS if MAX_FPS else 0.0
+
+    def request_frame(self, immediate=False):
+        """schedules a frame. if 'immediate' is True, the widget
+        is repainted synchronously, bypassing the frame rate limit"""
+        self.requested += 1
+        if immediate:
+            self.timer.stop()
+            self.pending = False
+            self.pw.repaint()
+            return
+
+        if self.pending:
+            self.dropped += 1
+            return
+
+        self.pending = True
+        wait = self.last_frame + self.get_interval() - time.perf_counter()
+        self.timer.start(max(0, int(ceil(wait * 1000))))
+
+    def begin_frame(self):
+        """called at the beginning of every paint event"""
+        self.pending = False
+        self.timer.stop()
+        self.last_frame = time.perf_counter()
+        return self.last_frame
+
+    def end_frame(self, start):
+        """called at the end of every paint event"""
+        self.frames += 1
+        interval = self.get_interval()
+        if interval and time.perf_counter() - start > interval:
+            self.late += 1
+
+    def get_stats(self):
+        return {"requested": self.requested,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "late": self.late}
+
+# -----------------------------------------------------------------------
+class SyncPolicy():
+    """debounces and throttles the jumps of IDA's views that follow the
+    address of a PixelWidget. jumps requested while input lasts are merged
+    into the latest one, which is performed once input has been idle for
+    SYNC_DEBOUNCE_MS, or SYNC_MAX_RATE allows for it. merged jumps are
+    counted as elided"""
+    def __init__(self, pw):
+        self.pw = pw
+        self.pending = None
+        # time the oldest pending jump has been requested at
+        self.since = 0.0
+        self.last_jump = 0.0
+        self.requested = 0
+        self.jumps = 0
+        self.elided = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.flush)
+
+    def get_interval(self):
+        return 1.0 / SYNC_MAX_RATE if SYNC_MAX_RATE else None
+
+    def request_jump(self, ea, final=False):
+        """jumps to 'ea' once input has settled. if 'final' is True, e.g.
+        when a mouse button or key has been released, the jump is
+        performed immediately, replacing a pending one"""
+        self.requested += 1
+        now = time.perf_counter()
+        if self.pending is None:
+            self.since = now
+        else:
+            self.elided += 1
+        self.pending = ea
+
+        if final:
+            self.flush()
+            return
+
+        wait = SYNC_DEBOUNCE_MS / 1000
+        interval = self.get_interval()
+        if interval is not None:
+            wait = max(min(wait, self.since + interval - now), self.last_jump + interval - now)
+        self.timer.start(max(0, int(ceil(wait * 1000))))
+
+    def flush(self):
+        """performs the pending jump, if any"""
+        self.timer.stop()
+        if self.pending is not None:
+            ea = self.pending
+            self.pending = None
+            self.jumps += 1
+            self.last_jump = time.perf_counter()
+            ida_kernwin.jumpto(ea, -1, ida_kernwin.UIJMP_ANYVIEW)
+
+    def cancel(self):
+        """drops the pending jump, e.g. in favor of an explicit one"""
+        self.timer.stop()
+        if self.pending is not None:
+            self.pending = None
+            self.elided += 1
+
+    def get_stats(self):
+        return {"requested": self.requested,
+            "jumps": self.jumps,
+            "elided": self.elided}
+
+# -----------------------------------------------------------------------
+class FrameStats():
+    """rolling timings of the stages of a PixelWidget's frames, per filter.
+    stages are timed on the main thread while a frame is painted, the time
+    spent by the render worker and by progressive filters in between frames
+    is recorded as stages of its own"""
+    stages = ("buffers", "filter", "overlay", "image", "data", "annotations",
+        "paint_annotations", "status", "total", "worker", "progressive")
+
+    def __init__(self, window=STATS_WINDOW):
+        # number of samples kept per stage, None keeps all of them
+        self.window = window
+        # filter name -> stage -> deque of seconds
+        self.samples = {}
+        # stage -> seconds of the frame being painted
+        self.frame = None
+        self.lock = threading.Lock()
+
+    def begin_frame(self):
+        self.frame = {}
+
+    def add(self, stage, seconds):
+        """adds to the time spent on 'stage' by the frame being painted.
+        ignored outside of paint events, e.g. while prefetching"""
+        if self.frame is not None:
+            self.frame[stage] = self.frame.get(stage, 0.0) + seconds
+
+    def end_frame(self, name, total):
+        frame = self.frame
+        self.frame = None
+        if frame is None:
+            return
+        frame["total"] = total
+        for stage, seconds in frame.items():
+            self.add_sample(name, stage, seconds)
+
+    def add_sample(self, name, stage, seconds):
+        """records a single timing, may be called from any thread"""
+        with self.lock:
+            samples = self.samples.setdefault(name, {})
+            if stage not in samples:
+                samples[stage] = deque(maxlen=self.window)
+            samples[stage].append(seconds)
+
+    def get_stats(self):
+        """returns {filter: {stage: {"count", "p50", "p95", "p99", "max"}}},
+        times are in milliseconds"""
+        stats = {}
+        with self.lock:
+            for name, samples in self.samples.items():
+                stats[name] = {}
+                for stage in self.stages:
+                    values = sorted(samples.get(stage, ()))
+                    if values:
+                        n = len(values)
+                        stats[name][stage] = {"count": n,
+                            "p50": values[(n - 1) // 2] * 1000,
+                            "p95": values[round(0.95 * (n - 1))] * 1000,
+                            "p99": values[round(0.99 * (n - 1))] * 1000,
+                            "max": values[-1] * 1000}
+        return stats
+
+# -----------------------------------------------------------------------
+class AnimationClock():
+    """drives the timers of animated filters, shared by all IDACyber
+    windows. timers of the same interval tick at the same time in every
+    window, and callbacks are skipped while their widget is not visible,
+    still busy with the previous tick or while IDA is analyzing"""
+    clock = None
+
+    def __init__(self):
+        # id -> [PixelWidget, callback, interval in ms, due time]
+        self.timers = {}
+        self.next_id = 0
+        self.epoch = time.perf_counter()
+        self.ticks = 0
+        self.skipped = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+
+    @staticmethod
+    def get():
+        if AnimationClock.clock is None:
+            AnimationClock.clock = AnimationClock()
+        return AnimationClock.clock
+
+    def _get_due(self, interval, now):
+        """returns the first multiple of 'interval' after 'now',
+        counted from the start of the clock"""
+        interval = max(interval, 1) / 1000.0
+        return self.epoch + (floor((now - self.epoch) / interval) + 1) * interval
+
+    def register(self, pw, interval, callback):
+        """calls 'callback' every 'interval' ms. like IDA's timers, the
+        callback returns the next interval or -1 to unregister itself"""
+        self.next_id += 1
+        self.timers[self.next_id] = [pw, callback, interval, self._get_due(interval, time.perf_counter())]
+        self._schedule()
+        return self.next_id
+
+    def unregister(self, timer_id):
+        if self.timers.pop(timer_id, None) is not None:
+            self._schedule()
+
+    def unregister_all(self, pw):
+        for timer_id in [k for k, v in self.timers.items() if v[0] is pw]:
+            self.unregister(timer_id)
+
+    def _schedule(self):
+        if not self.timers:
+            self.timer.stop()
+            return
+        due = min(t[3] for t in self.timers.values())
+        self.timer.start(max(0, int(ceil((due - time.perf_counter()) * 1000))))
+
+    def _tick(self):
+        now = time.perf_counter()
+        analyzing = not ida_auto.auto_is_ok()
+        # decided once per widget, before its callbacks request frames
+        paused = {}
+        for timer_id, t in list(self.timers.items()):
+            pw, callback, interval, due = t
+            # QTimer may fire up to a millisecond early
+            if due > now + 0.001 or timer_id not in self.timers:
+                continue
+            if pw not in paused:
+                paused[pw] = analyzing or not pw.is_visible() or pw.is_busy()
+            if paused[pw]:
+                self.skipped += 1
+            else:
+                self.ticks += 1
+                try:
+                    interval = callback()
+                except Exception:
+                    ida_kernwin.msg("IDACyber: timer of %s failed:\n%s" % (
+                        pw.fm.name if pw.fm else "filter", traceback.format_exc()))
+                    interval = -1
+                if timer_id not in self.timers:
+                    continue
+                if interval is None:
+                    interval = t[2]
+                if interval < 0:
+                    del self.timers[timer_id]
+                    continue
+            t[2] = interval
+            # ticks that were missed are dropped rather than caught up with
+            t[3] = self._get_due(interval, max(now, due))
+        self._schedule()
+
+    def get_stats(self):
+        return {"timers": len(self.timers),
+            "ticks": self.ticks,
+            "skipped": self.skipped}
+
+# -----------------------------------------------------------------------
+# input events of PixelWidget that are recorded, by name
+SESSION_EVENTS = {QEvent.KeyPress: "key_press",
+    QEvent.KeyRelease: "key_release",
+    QEvent.MouseButtonPress: "mouse_press",
+    QEvent.MouseButtonRelease: "mouse_release",
+    QEvent.MouseButtonDblClick: "mouse_double_click",
+    QEvent.MouseMove: "mouse_move",
+    QEvent.Wheel: "wheel"}
+
+# modifiers of the shortcut that starts and stops recording a session
+SESSION_SHORTCUT_MODIFIERS = int(Qt.ControlModifier | Qt.ShiftModifier)
+
+def get_view_state(pw):
+    """returns what is needed to restore the view of 'pw'"""
+    return {"filter": pw.fm.name if pw.fm else None,
+        "addr": pw.base + pw.offs,
+        "width": pw.get_pixel_qty_per_line(),
+        "zoom": pw.get_zoom(),
+        "size": [pw.width(), pw.height()],
+        "sync": pw.get_sync_state(),
+        "formatter": pw.cur_formatter_idx,
+        "compos": pw.cur_compos_mode}
+
+def event_to_dict(event):
+    """serializes an input event"""
+    etype = event.type()
+    d = {"type": SESSION_EVENTS[etype], "modifiers": int(event.modifiers())}
+    if etype in (QEvent.KeyPress, QEvent.KeyRelease):
+        d.update(key=event.key(), text=event.text(), autorep=event.isAutoRepeat())
+    else:
+        d.update(x=event.pos().x(), y=event.pos().y(), buttons=int(event.buttons()))
+        if etype == QEvent.Wheel:
+            d.update(dx=event.angleDelta().x(), dy=event.angleDelta().y())
+        else:
+            d.update(button=int(event.button()))
+    return d
+
+def dict_to_event(d):
+    """creates the input event serialized by event_to_dict()"""
+    etype = {v: k for k, v in SESSION_EVENTS.items()}[d["type"]]
+    modifiers = Qt.KeyboardModifiers(d["modifiers"])
+    if etype in (QEvent.KeyPress, QEvent.KeyRelease):
+        return QKeyEvent(etype, d["key"], modifiers, d["text"], d["autorep"])
+    pos = QPointF(d["x"], d["y"])
+    buttons = Qt.MouseButtons(d["buttons"])
+    if etype == QEvent.Wheel:
+        delta = QPoint(d["dx"], d["dy"])
+        try:
+            return QWheelEvent(pos, pos, QPoint(), delta, buttons, modifiers, Qt.NoScrollPhase, False)
+        except TypeError:
+            # Qt < 5.12
+            return QWheelEvent(pos, pos, QPoint(), delta, d["dy"], Qt.Vertical, buttons, modifiers)
+    return QMouseEvent(etype, pos, Qt.MouseButton(d["button"]), buttons, modifiers)
+
+# -----------------------------------------------------------------------
+class SessionRecorder(QObject):
+    """writes the input events of a PixelWidget, along with timestamps and
+    the current address, to a file of JSON lines that can be replayed by
+    SessionPlayer. the first and last lines hold the state of the view"""
+    def __init__(self, pw, fname):
+        super(SessionRecorder, self).__init__()
+        self.pw = pw
+        self.fname = fname
+        self.count = 0
+        # presses of Ctrl and Shift are held back until it is known
+        # whether they belong to the shortcut that stops the recording
+        self.held = []
+        # keys whose presses have been written
+        self.pressed = set()
+        self.f = open(fname, "w")
+        self.start = time.perf_counter()
+        self._write(dict(get_view_state(pw), type="state"))
+        pw.installEventFilter(self)
+
+    def _write(self, d):
+        if "t" not in d:
+            d["t"] = round(time.perf_counter() - self.start, 6)
+        self.f.write(json.dumps(d) + "\n")
+
+    def _write_event(self, d):
+        if d["type"] == "key_press":
+            self.pressed.add(d["key"])
+        elif d["type"] == "key_release":
+            self.pressed.discard(d["key"])
+        self._write(d)
+        self.count += 1
+
+    def _flush_held(self):
+        for d in self.held:
+            self._write_event(d)
+        self.held = []
+
+    def eventFilter(self, obj, event):
+        if obj is self.pw and event.type() in SESSION_EVENTS:
+            d = event_to_dict(event)
+            d["addr"] = self.pw.base + self.pw.offs
+            d["t"] = round(time.perf_counter() - self.start, 6)
+            key = d.get("key")
+            if key == Qt.Key_R and (d["modifiers"] & SESSION_SHORTCUT_MODIFIERS) == SESSION_SHORTCUT_MODIFIERS:
+                # leave out the shortcut that stops the recording, modifiers included
+                self.held = []
+            elif key in (Qt.Key_Control, Qt.Key_Shift) and d["type"] == "key_press":
+                self.held.append(d)
+            elif d["type"] == "key_release" and not (key in self.pressed or
+                any(h["key"] == key for h in self.held)):
+                # released after the recording has started, e.g. the
+                # modifiers of the shortcut that started it
+                pass
+            else:
+                self._flush_held()
+                self._write_event(d)
+        return False
+
+    def stop(self):
+        self.pw.removeEventFilter(self)
+        # keys still held down when the recording stops, e.g. Ctrl pressed
+        # long before Shift-R, must not stay pressed once replayed
+        for key in sorted(self.pressed):
+            self._write_event({"type": "key_release", "modifiers": 0, "key": key,
+                "text": "", "autorep": False, "addr": self.pw.base + self.pw.offs})
+        self._write(dict(get_view_state(self.pw), type="state"))
+        self.f.close()
+        return self.count
+
+# -----------------------------------------------------------------------
+class SessionPlayer():
+    """replays a session recorded by SessionRecorder through the regular
+    event handlers of a PixelWidget, at the recorded pace times 'speed'.
+    the timings of all frames painted meanwhile are reported at the end"""
+    def __init__(self, pw, fname, speed=1.0, report=None, form=None):
+        self.pw = pw
+        self.fname = fname
+        self.speed = speed
+        self.report = report
+        self.form = form
+        with open(fname) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        self.state = records[0]
+        self.final = records[-1] if len(records) > 1 and records[-1]["type"] == "state" else None
+        self.events = [r for r in records if r["type"] != "state"]
+        self.idx = 0
+        self.start = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._play)
+        self.result = None
+
+    def _restore_state(self, state):
+        pw = self.pw
+        if self.form is not None and state["filter"] != pw.fm.name:
+            names = [info.name for info, _ in self.form.filterlist]
+            if state["filter"] in names:
+                self.form.filterChoser.setCurrentIndex(names.index(state["filter"]))
+        pw.set_sync_state(state["sync"])
+        pw.set_pixel_qty_per_line(state["width"])
+        pw.set_zoom(state["zoom"])
+        pw.cur_formatter_idx = state["formatter"]
+        pw.cur_compos_mode = state["compos"]
+        pw.set_addr(state["addr"])
+
+    def start_replay(self):
+        self._restore_state(self.state)
+        # all frames of the session are kept
+        self.pw.stats = FrameStats(window=None)
+        self.sched_stats = self.pw.scheduler.get_stats()
+        self.start = time.perf_counter()
+        self.timer.start(0)
+
+    def _play(self):
+        elapsed = (time.perf_counter() - self.start) * self.speed
+        while self.idx < len(self.events) and self.events[self.idx]["t"] <= elapsed:
+            QApplication.sendEvent(self.pw, dict_to_event(self.events[self.idx]))
+            self.idx += 1
+        if self.idx < len(self.events):
+            wait = (self.events[self.idx]["t"] - elapsed) / self.speed
+            self.timer.start(max(0, int(wait * 1000)))
+        elif self.result is None:
+            self.result = {}
+            # let the last full quality frame be painted
+            self.timer.start(INTERACTIVE_IDLE_MS * 2)
+        else:
+            self._finish()
+
+    def _finish(self):
+        pw = self.pw
+        sched = pw.scheduler.get_stats()
+        stats = pw.stats.get_stats()
+        state = self.final or self.state
+        self.result = {"session": self.fname,
+            "events": len(self.events),
+            "duration": time.perf_counter() - self.start,
+            "size_matches": [pw.width(), pw.height()] == self.state["size"],
+            "diverged": self.final is not None and pw.base + pw.offs != state["addr"],
+            "scheduler": {k: sched[k] - self.sched_stats[k] for k in sched},
+            "stages": stats}
+        pw.stats = FrameStats()
+
+        lines = ["IDACyber: replayed %d events of %s" % (len(self.events), self.fname)]
+        for name, stages in stats.items():
+            for stage in FrameStats.stages:
+                if stage in stages:
+                    v = stages[stage]
+                    lines.append("  %-12s %-18s n=%-5d p50 %7.2f  p95 %7.2f  p99 %7.2f  max %7.2f ms" % (
+                        name[:12], stage, v["count"], v["p50"], v["p95"], v["p99"], v["max"]))
+        if not self.result["size_matches"]:
+            lines.append("  warning: the size of the window differs from the recorded one")
+        if self.result["diverged"]:
+            lines.append("  warning: the replay ended at a different address than the recording")
+        ida_kernwin.msg("\n".join(lines) + "\n")
+        if self.report:
+            with open(self.report, "w") as f:
+                json.dump(self.result, f, indent=2)
 
 # -----------------------------------------------------------------------
 class PixelWidget(QWidget):
@@ -234,13 +2285,17 @@ class PixelWidget(QWidget):
         self.prev_mouse_y = 0
         self.key = None
         self.buffers = None
+        self.fb = None
+        # (key, frame) of the last frame rendered on the main thread,
+        # overlays and the cursor are drawn on top of a copy of it
+        self.base_frame = None
         self.offs = 0
         self.base = 0
-        self.fm = None
         self.filter_idx = 0
         self.mouseOffs = 0
         self.sync = True
         self.bh = bufhandler
+        self.engine = RenderEngine(bufhandler)
         self.mouse_abs_x = 0
         self.mouse_abs_y = 0
         self.elemX = 0
@@ -327,12 +2382,38 @@ class PixelWidget(QWidget):
         self.prev_filter = self.sh.pw_prev_filter
 
         self.qp = QPainter()
+        self.prefetcher = Prefetcher(self)
+        self.scheduler = FrameScheduler(self)
+        self.sync_policy = SyncPolicy(self)
+        self.worker = RenderWorker(self)
+        self.progressive = ProgressiveRenderer(self)
+        self.show_hud = False
+        self.recorder = None
+        # True while the user drags or spins the mouse wheel
+        self.interactive = False
+        self.idle_timer = QTimer()
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self._on_input_idle)
+        # measured time it takes to draw one glyph of the data overlay
+        self.glyph_cost = None
         
         self.show()
 
+    def is_data_overlay_affordable(self, num_pixels):
+        """checks whether drawing the data overlay for 'num_pixels' pixels
+        fits into DATA_OVERLAY_BUDGET and DATA_OVERLAY_MAX_PIXELS"""
+        if DATA_OVERLAY_MAX_PIXELS and num_pixels > DATA_OVERLAY_MAX_PIXELS:
+            return False
+        # nothing measured yet, give it a try
+        if self.glyph_cost is None:
+            return True
+        return num_pixels * self.glyph_cost <= DATA_OVERLAY_BUDGET
+
     def paintEvent(self, event):
+        frame_start = self.scheduler.begin_frame()
         if not self.fm:
             return
+        self.stats.begin_frame()
 
         # set leftmost x-coordinate of graph
         zoom_level = self.get_zoom()        
@@ -366,121 +2447,141 @@ class PixelWidget(QWidget):
                 self.qp.setOpacity(1.0-cur_opacity)
             """
             # draw image
+            start = time.perf_counter()
             self.qp.drawImage(
                 QRect(QPoint(self.rect_x, 0), 
                 QPoint(self.rect_x + self.get_pixel_qty_per_line() * zoom_level, floor((self.get_pixel_qty() / self.get_pixel_qty_per_line()) * zoom_level))),
                 img)
+            self.stats.add("image", time.perf_counter() - start)
 
             # TODO: pen color contrast
             # TODO: data export: render data
             # TODO: default fonts / OS?
-            # TODO: optimization
-            # FIXME: there's a bug with gaps/unmapped buffers
+            num_pixels = self.get_pixel_qty()
             if (self.cur_formatter_idx and
+                not self.interactive and
                 not self.fm.disable_data and
                 zoom_level >= 10 and
-                self.get_pixel_qty() < 70*70):
-
-                self.qp.setPen(QColor(Qt.white))
-                fontsize = self.qp.font().pointSizeF()
-                font = self.qp.font()
+                self.buffers and
+                self.is_data_overlay_affordable(num_pixels)):
 
+                font = QFont(self.qp.font())
                 font.setPointSizeF(zoom_level*0.55)
                 #font.setPixelSize(zoom_level)
-                self.qp.setFont(font)
-                
+                atlas = GlyphAtlas.get(self.formatters[self.cur_formatter_idx][0],
+                    zoom_level,
+                    font,
+                    self.devicePixelRatioF())
+
                 opacity = self.qp.opacity()
                 full_opacity_zoom = 28
                 cur_opacity = (1.0 - (full_opacity_zoom - float(min(zoom_level-1, full_opacity_zoom)))/full_opacity_zoom)
                 self.qp.setOpacity(cur_opacity)
-                
-                #m = self.qp.fontMetrics()
-                x = y = 0
-                num_pixels_per_line = self.get_pixel_qty_per_line()
 
                 cm = self.qp.compositionMode()
                 self.qp.setCompositionMode(self.composition_modes[self.cur_compos_mode][0])
 
-                if self.formatters[self.cur_formatter_idx][0] == 1:
-                    fmt = lambda c : "%c" %c if c in range(0x20, 0x7e) else "."
-                elif self.formatters[self.cur_formatter_idx][0] == 2:
-                    fmt = lambda c : "%02X" % c
-
-                for mapped, buf in self.buffers:
-                    for i in range(len(buf)):
-                        if mapped:
-                            b = buf[i]
-                            data = fmt(b)
-
-                            self.qp.drawText(
-                                self.rect_x + x*zoom_level,
-                                y*zoom_level,
-                                zoom_level,
-                                zoom_level,
-                                Qt.AlignCenter,
-                                data)
-
-                        x = (i + 1) % num_pixels_per_line
-                        if not x:
-                            y = y + 1
+                start = time.perf_counter()
+                drawn = atlas.draw(self.qp, self.buffers, self.rect_x, 0,
+                    self.get_pixel_qty_per_line(), num_pixels)
+                self.stats.add("data", time.perf_counter() - start)
+                if drawn:
+                    cost = (time.perf_counter() - start) / drawn
+                    if self.glyph_cost is None:
+                        self.glyph_cost = cost
+                    else:
+                        self.glyph_cost = 0.8 * self.glyph_cost + 0.2 * cost
 
                 # restore attributes
                 self.qp.setCompositionMode(cm)
                 self.qp.setOpacity(opacity)
-                font.setPointSizeF(fontsize)
-                self.qp.setFont(font)
 
         if self.show_address_range and self.fm.link_pixel:
             self.paint_slider(addr=content_addr, buf_size=content_size)
 
-        # get and draw annotations and pointers
-        annotations = self.fm.on_get_annotations(content_addr if content_addr else self.get_address(),
-            self.get_pixel_qty(),
-            self.mouseOffs)
+        # expensive layers are left out while the user drags or scrolls
+        if not self.interactive:
+            # get and draw annotations and pointers
+            start = time.perf_counter()
+            annotations = self.fm.on_get_annotations(content_addr if content_addr else self.get_address(),
+                self.get_pixel_qty(),
+                self.mouseOffs)
+            self.stats.add("annotations", time.perf_counter() - start)
+
+            if annotations:
+                start = time.perf_counter()
+                self.paint_annotations(annotations)
+                self.stats.add("paint_annotations", time.perf_counter() - start)
 
-        if annotations:
-            self.paint_annotations(annotations)
+            start = time.perf_counter()
+            self.paint_status()
+            self.stats.add("status", time.perf_counter() - start)
 
-        self.paint_status()
+        if self.show_hud:
+            self.paint_hud()
 
         if self.textbox_content:
             self.paint_text_box()
 
         self.qp.end()
+        self.scheduler.end_frame(frame_start)
+        self.stats.end_frame(self.fm.name, time.perf_counter() - frame_start)
         return
 
-    def paint_image(self, addr=None, buf_size=None, cursor=True):
+    def paint_image(self, addr=None, buf_size=None, cursor=True, wait=False):
         size = self.size()
-        self.set_pixel_qty(self.get_pixel_qty_per_line() * floor(size.height() / self.pixelSize))
+        width = self.get_pixel_qty_per_line()
+        height = floor(size.height() / self.pixelSize)
+        self.set_pixel_qty(width * height)
         if addr is None or buf_size is None:
             addr = self.base + self.offs
             buf_size = self.get_pixel_qty()
 
-        self.buffers = self.bh.get_buffers(addr, buf_size)
-        img = QImage(self.get_pixel_qty_per_line(), floor(size.height() / self.pixelSize), QImage.Format_RGB32)
-        pixels = self.fm.on_process_buffer(self.buffers, addr, self.get_pixel_qty(), self.mouseOffs)
-
-        x = y = 0
-        # "transparency" effect for unmapped bytes
-        transparency_dark = [qRgb(0x2F,0x4F,0x4F), qRgb(0x00,0x00,0x00)]
-        transparency_err = [qRgb(0x7F,0x00,0x00), qRgb(0x33,0x00,0x00)]
-        for mapped, pix in pixels:
-            if not mapped:
-                if pix is None:
-                    pix = transparency_dark[(x&2 != 0) ^ (y&2 != 0)]
-            img.setPixel(x, y, pix)
-
-            x = (x + 1) % self.get_pixel_qty_per_line()
-            if not x:
-                y = y + 1
-
-        if len(pixels) != self.get_pixel_qty():
-            for i in range(self.get_pixel_qty() - len(pixels)):
-                pix = transparency_err[(x&2 != 0) ^ (y&2 != 0)]
-                img.setPixel(x, y, pix)
-                x = (x + 1) % self.get_pixel_qty_per_line()
-                if not x:
-                    y = y + 1
+        frame = None
+        # True if the frame is kept for later paints and must not be drawn onto
+        shared = False
+        key = (self.fm, addr, buf_size, width, height, self.engine.get_generation())
+        base_key = key + (self.mouseOffs,)
+        preview = self.interactive and self.fm.preview and not wait
+        if preview:
+            frame = self.engine.render_frame(addr, buf_size, width, height, self.mouseOffs, preview=True)
+            if self.fm.threaded:
+                self.worker.set_placeholder(self.fm, frame)
+                frame = (frame[0], frame[1].copy())
+        elif self.base_frame is not None and self.base_frame[0] == base_key:
+            # nothing but the overlay or the cursor changed
+            frame = self.base_frame[1]
+            shared = True
+        elif buf_size == self.get_pixel_qty():
+            frame = self.prefetcher.take_frame(addr, width, height)
+            if frame is not None:
+                self.base_frame = (base_key, frame)
+                shared = True
+        if frame is None:
+            if self.fm.threaded and not wait:
+                frame = self.worker.get_frame(key,
+                    lambda: self.engine.prepare_frame(addr, buf_size, width, height, self.mouseOffs,
+                        snapshot=not self.fm.progressive),
+                    (lambda: self.engine.render_frame(addr, buf_size, width, height, self.mouseOffs, preview=True)) if self.fm.preview else None)
+            elif self.fm.progressive and not wait:
+                frame = self.progressive.get_frame(key,
+                    lambda: self.engine.prepare_frame(addr, buf_size, width, height, self.mouseOffs),
+                    (lambda: self.engine.render_frame(addr, buf_size, width, height, self.mouseOffs, preview=True)) if self.fm.preview else None)
+            else:
+                frame = self.engine.render_view(addr, buf_size, width, height, self.mouseOffs)
+                self.base_frame = (base_key, frame)
+                shared = True
+        self.buffers, fb = frame
+        self.prefetcher.on_frame(addr, buf_size)
+
+        start = time.perf_counter()
+        overlay = self.fm.on_get_overlay(self.buffers, addr, width * height, self.mouseOffs)
+        self.stats.add("overlay", time.perf_counter() - start)
+        if overlay:
+            if shared:
+                fb = fb.copy()
+                shared = False
+            fb.apply_overlay(overlay)
 
         if ((cursor and self.fm.highlight_cursor) and
             self.mouse_abs_x >= self.rect_x and
@@ -492,11 +2593,65 @@ class PixelWidget(QWidget):
             else:
                 x = self.get_elem_x()
                 y = self.get_elem_y()
-            p = QPoint(x, y)
-            img.setPixel(p, (~(img.pixelColor(p)).rgb() & 0xFFFFFFFF))
-
+            if shared:
+                fb = fb.copy()
+            fb.invert_pixel(x, y)
+
+        # the image doesn't own its pixels, keep them alive
+        self.fb = fb
+        start = time.perf_counter()
+        img = fb.get_image()
+        self.stats.add("image", time.perf_counter() - start)
         return img
 
+    @property
+    def fm(self):
+        """the current filter, rendered by the engine"""
+        return self.engine.fm
+
+    @fm.setter
+    def fm(self, fm):
+        self.engine.fm = fm
+
+    @property
+    def stats(self):
+        return self.engine.stats
+
+    @stats.setter
+    def stats(self, stats):
+        self.engine.stats = stats
+
+    def touch_interactive(self):
+        """enters interactive mode, or extends it if already active"""
+        self.interactive = True
+        self.idle_timer.start(INTERACTIVE_IDLE_MS)
+
+    def _on_input_idle(self):
+        self.interactive = False
+        self.request_frame()
+
+    def is_visible(self):
+        """False if the widget is hidden behind another tab or minimized"""
+        return (self.isVisible() and
+            not self.visibleRegion().isEmpty() and
+            not self.window().isMinimized())
+
+    def is_busy(self):
+        """True while the previous frame hasn't been painted yet"""
+        return (self.scheduler.pending or
+            self.progressive.steps is not None or
+            self.worker.snapshot is not None or
+            self.worker.job is not None)
+
+    def discard_frames(self):
+        """drops prefetched frames and forces the current one to be
+        rendered again, e.g. because the filter's parameters changed"""
+        self.prefetcher.reset()
+        self.worker.invalidate()
+        self.progressive.invalidate()
+        self.engine.discard()
+        self.base_frame = None
+
     def paint_annotations(self, annotations=[]):
         a_offs = 20
         base_x = self.rect_x + self.get_pixel_qty_per_line() * self.pixelSize + a_offs + 10
@@ -665,20 +2820,77 @@ class PixelWidget(QWidget):
                 line)
             cur_line += 1
 
+    def paint_hud(self):
+        """draws the frame timings of the current filter"""
+        stats = self.stats.get_stats().get(self.fm.name, {})
+        lines = ["[Frame timings: %s]" % self.fm.name, " %-18s %8s %8s" % ("stage", "p50 ms", "p95 ms")]
+        for stage in FrameStats.stages:
+            if stage in stats:
+                lines.append(" %-18s %8.2f %8.2f" % (stage, stats[stage]["p50"], stats[stage]["p95"]))
+        sched = self.scheduler.get_stats()
+        lines.append(" frames %d, dropped %d, late %d" % (sched["frames"], sched["dropped"], sched["late"]))
+        sync = self.sync_policy.get_stats()
+        lines.append(" sync jumps %d, elided %d" % (sync["jumps"], sync["elided"]))
+
+        prev_font = self.qp.font()
+        font = QFont(FONT_DEFAULT)
+        font.setStyleHint(QFont.Monospace)
+        self.qp.setFont(font)
+        fh = self.qp.fontMetrics().height()
+        width = max(self.qp.fontMetrics().width(line) for line in lines)
+        self.qp.fillRect(QRect(5, 5, width + 10, fh * len(lines) + 10), QColor(0, 0, 0, 0xC0))
+        self.qp.setPen(QColor(Qt.white))
+        for i, line in enumerate(lines):
+            self.qp.drawText(10, 5 + fh * (i + 1), line)
+        self.qp.setFont(prev_font)
+
+    def start_recording(self, fname):
+        self.recorder = SessionRecorder(self, fname)
+        ida_kernwin.msg('Recording session to %s\n' % fname)
+
+    def stop_recording(self):
+        count = self.recorder.stop()
+        ida_kernwin.msg('%d events recorded to %s\n' % (count, self.recorder.fname))
+        self.recorder = None
+
+    def get_stats(self):
+        """returns the statistics of this widget, see get_stats()"""
+        return {"filter": self.fm.name if self.fm else None,
+            "stages": self.stats.get_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "sync": self.sync_policy.get_stats(),
+            "tiles": self.engine.tiles.get_stats(),
+            "worker": {"cancelled": self.worker.cancelled},
+            "glyph_cost": self.glyph_cost}
+
     # functions that can be called by filters
-    # must not be called from within on_process_buffer()
-    def on_filter_request_update(self, ea=None, center=True):
+    # must not be called from within on_fill_buffer()
+    def on_filter_register_timer(self, interval, callback):
+        """replacement for ida_kernwin.register_timer() that is paused
+        while the graph is hidden. returns the id of the timer"""
+        return AnimationClock.get().register(self, interval, callback)
+
+    def on_filter_unregister_timer(self, timer_id):
+        AnimationClock.get().unregister(timer_id)
+
+    def on_filter_request_overlay(self):
+        """repaints the graph, keeping the rendered frame and calling
+        the filter's on_get_overlay() only"""
+        self.request_frame()
+
+    def on_filter_request_update(self, ea=None, center=True, immediate=False):
+        self.discard_frames()
         if not ea:
-            self.repaint()
+            self.request_frame(immediate)
         else:
             curea = self.get_address()
             if ea < curea or ea >= curea + self.get_pixel_qty():
                 # TODO: verify that ea is valid after following operation
                 if center:
                     ea -= floor(self.get_pixel_qty()/2)
-                self.set_addr(ea)
+                self.set_addr(ea, immediate=immediate)
             else:
-                self.repaint()
+                self.request_frame(immediate)
 
     def on_filter_update_zoom(self, zoom):
         self.set_zoom(zoom)
@@ -713,20 +2925,21 @@ class PixelWidget(QWidget):
 
         if key == Qt.Key_F1 and ctrl_pressed:
             self.display_help_box(PLUGIN_HELP)
-            self.repaint()
+            self.request_frame()
 
         elif key == Qt.Key_F2 and ctrl_pressed:
             self.display_help_box(self.get_filter_helptext(), isFilter=True)
-            self.repaint()
+            self.request_frame()
 
         elif key == Qt.Key_Escape:
             self.display_help_box(None)
-            self.repaint()
+            self.request_frame()
 
         elif key == Qt.Key_G:
             addr = ida_kernwin.ask_addr(self.base + self.offs, 'Jump to address')
             if addr is not None:
                 if self.sync:
+                    self.sync_policy.cancel()
                     ida_kernwin.jumpto(addr)
                 else:
                     minea = ida_ida.inf_get_min_ea()
@@ -741,11 +2954,24 @@ class PixelWidget(QWidget):
 
         elif key == Qt.Key_D:
             self.cur_formatter_idx = (self.cur_formatter_idx + 1) % self.max_formatters
-            self.repaint()
+            self.request_frame()
 
         elif key == Qt.Key_T:
             self.cur_compos_mode = (self.cur_compos_mode + 1) % len(self.composition_modes)
-            self.repaint()
+            self.request_frame()
+
+        elif key == Qt.Key_P:
+            self.show_hud = not self.show_hud
+            self.request_frame()
+
+        elif key == Qt.Key_R and shift_pressed and ctrl_pressed:
+            if self.recorder is None:
+                i = 0
+                while os.path.isfile('IDACyber_session_%04d.jsonl' % i):
+                    i += 1
+                self.start_recording('IDACyber_session_%04d.jsonl' % i)
+            else:
+                self.stop_recording()
 
         elif key == Qt.Key_N:
             self.next_filter.emit()
@@ -754,7 +2980,7 @@ class PixelWidget(QWidget):
             self.prev_filter.emit()
 
         elif key == Qt.Key_F12 and shift_pressed and ctrl_pressed:
-            img = self.paint_image(cursor = False)
+            img = self.paint_image(cursor = False, wait=True)
             img = img.scaled(img.width()*self.pixelSize, img.height()*self.pixelSize, Qt.KeepAspectRatio, Qt.FastTransformation)
             done = False
             i = 0
@@ -807,14 +3033,16 @@ class PixelWidget(QWidget):
 
         if update:
             if self.get_sync_state():
-                ida_kernwin.jumpto(self.base + self.offs, -1, ida_kernwin.UIJMP_ANYVIEW)
+                # keys that are held down repeat until they are released
+                self.sync_policy.request_jump(self.base + self.offs, final=not event.isAutoRepeat())
             self.statechanged.emit()
-            self.repaint()
+            self.request_frame()
 
         return
 
     def wheelEvent(self, event):
         delta = floor(event.angleDelta().y()/120)
+        self.touch_interactive()
 
         # zoom
         if self.key == Qt.Key_Control:
@@ -830,7 +3058,7 @@ class PixelWidget(QWidget):
             self.set_offset_delta(delta)
 
             if self.get_sync_state():
-                ida_kernwin.jumpto(self.base + self.offs, -1, ida_kernwin.UIJMP_ANYVIEW)
+                self.sync_policy.request_jump(self.base + self.offs)
 
         elif self.key == Qt.Key_H:
             if not self.lock_width:
@@ -843,10 +3071,10 @@ class PixelWidget(QWidget):
             self.set_offset_delta(delta * self.get_pixel_qty_per_line())
             
             if self.get_sync_state():
-                ida_kernwin.jumpto(self.base + self.offs, -1, ida_kernwin.UIJMP_ANYVIEW)
+                self.sync_policy.request_jump(self.base + self.offs)
 
         self.statechanged.emit()
-        self.repaint()
+        self.request_frame()
         return
 
     def mousePressEvent(self, event):
@@ -858,11 +3086,14 @@ class PixelWidget(QWidget):
 
         self.is_dragging_graph = (within_graph and event.button() == Qt.LeftButton)
         self.is_scrolling = (within_slider and event.button() == Qt.LeftButton)
+        if self.is_dragging_graph or self.is_scrolling:
+            self.touch_interactive()
         return
 
     def mouseDoubleClickEvent(self, event):
         if self.link_pixel and event.button() == Qt.LeftButton:
             addr = self.base + self.offs + self._get_offs_by_pos(event.pos())
+            self.sync_policy.cancel()
             ida_kernwin.jumpto(addr)        
         return
 
@@ -874,10 +3105,14 @@ class PixelWidget(QWidget):
                 self.is_scrolling = False
 
         self.prev_mouse_y = event.pos().y()
+        state = self.fm.get_state()
         self.fm.on_mb_click(event, self.get_address(), self.get_pixel_qty(), self.mouseOffs)
+        if self.fm.get_state() != state:
+            # the filter changed its parameters
+            self.discard_frames()
         
         if self.get_sync_state():
-            ida_kernwin.jumpto(self.base + self.offs, -1, ida_kernwin.UIJMP_ANYVIEW)
+            self.sync_policy.request_jump(self.base + self.offs, final=True)
             self.statechanged.emit()
         return
         
@@ -886,6 +3121,8 @@ class PixelWidget(QWidget):
         y = event.pos().y()
         within_graph = (x >= self.rect_x and x < self.rect_x + self.rect_x_width)
         update_state = self.is_dragging_graph or within_graph or self.is_scrolling
+        if self.is_dragging_graph or self.is_scrolling:
+            self.touch_interactive()
 
         if self.is_scrolling:
             if y != self.prev_mouse_y:
@@ -941,7 +3178,7 @@ class PixelWidget(QWidget):
             self.prev_mouse_y = y
             self.x = x
             self.statechanged.emit()
-            self.repaint()
+            self.request_frame()
 
         return
 
@@ -959,6 +3196,7 @@ class PixelWidget(QWidget):
             self.fm.on_deactivate()
         if fltobj:
             self.fm = fltobj
+            self.discard_frames()
 
             """load filter config"""
             self.set_sync_state(self.fm.sync)
@@ -976,13 +3214,17 @@ class PixelWidget(QWidget):
             self.fm.on_activate(idx)
             self.filter_idx = idx
             unhighlight_item()
-            self.repaint()
+            self.request_frame()
 
-    def set_addr(self, ea, new_cursor=None):
+    def set_addr(self, ea, new_cursor=None, immediate=False, selection=None):
+        """'selection' is the result of read_range_selection(), which is
+        called if it isn't given"""
         _ea = ea
 
-        selection, start, end = ida_kernwin.read_range_selection(None)
-        if selection:
+        if selection is None:
+            selection = ida_kernwin.read_range_selection(None)
+        selected, start, end = selection
+        if selected:
             _ea = start
 
         base = self.bh.get_base(_ea)
@@ -994,7 +3236,11 @@ class PixelWidget(QWidget):
             if self.highlight_cursor:
                 highlight_item(_ea)
 
-        self.repaint()
+        self.request_frame(immediate)
+
+    def request_frame(self, immediate=False):
+        """repaints the widget, rate-limited to MAX_FPS unless 'immediate'"""
+        self.scheduler.request_frame(immediate)
 
     def get_zoom(self):
         return self.pixelSize
@@ -1095,17 +3341,28 @@ class PixelWidget(QWidget):
 
 # -----------------------------------------------------------------------
 class IDACyberForm(ida_kernwin.PluginForm):
-    idbh = None
     hook = None
     ui_hook = None
+    idb_hook = None
+    dbg_hook = None
     windows = []
+    # window index -> IDACyberForm
+    instances = {}
+    # FilterInfo of the modules in the "cyber" folder, imported once per session
+    filters = None
 
     def __init__(self):
-        if IDACyberForm.idbh is None:
-            IDACyberForm.idbh = IDBBufHandler(True)
+        if IDACyberForm.idb_hook is None:
+            IDACyberForm.idb_hook = IDBHook(SharedCache.get())
+            IDACyberForm.idb_hook.hook()
+
+        if IDACyberForm.dbg_hook is None:
+            IDACyberForm.dbg_hook = DbgMemHook(SharedCache.get())
+            IDACyberForm.dbg_hook.hook()
 
         if IDACyberForm.hook is None:
             IDACyberForm.hook = ScreenEAHook()
+            IDACyberForm.hook.new_ea.connect(IDACyberForm._sync_windows)
             IDACyberForm.hook.hook()
         
         if IDACyberForm.ui_hook is None:
@@ -1124,12 +3381,17 @@ class IDACyberForm(ida_kernwin.PluginForm):
         self.parent = None
         self.form = None
         self.clean_init = False
+        # SessionPlayer of replay_session()
+        self.player = None
+        # seconds OnCreate() took
+        self.open_latency = None
 
     def _update_widget(self):
         lbl_address = 'Address '
         lbl_cursor = 'Cursor '
         lbl_zoom = 'Zoom '
         lbl_pixel = 'Pixels '
+        lbl_tiles = 'Tiles '
         
         if self.pw.link_pixel:
             val_address = '%Xh' % self.pw.get_address()
@@ -1139,17 +3401,26 @@ class IDACyberForm(ida_kernwin.PluginForm):
         width = self.pw.get_pixel_qty_per_line()
         val_zoom = '%d:1 ' % self.pw.get_zoom()
         val_pixel = '%dx%d ' % (width, floor(self.pw.get_pixel_qty()/width))
+        stats = self.pw.engine.tiles.get_stats()
+        val_tiles = '%d/%d (%d%% hits) ' % (stats['tiles'], stats['max_tiles'], round(stats['hit_rate'] * 100))
 
         status_text = ' | '.join((lbl_address + val_address,
             lbl_cursor + val_cursor,
             lbl_pixel + val_pixel,
-            lbl_zoom + val_zoom))
+            lbl_zoom + val_zoom,
+            lbl_tiles + val_tiles))
         # TODO: move code to separate, new signal handler
         self.cb.setChecked(self.pw.sync)
         self.cb.setEnabled(not self.pw.lock_sync)
         self.status.setText(status_text)
 
-    def _load_filters(self, pw):
+    @staticmethod
+    def _discover_filters():
+        """imports the modules of the "cyber" folder, once per session.
+        returns a list of FilterInfo"""
+        if IDACyberForm.filters is not None:
+            return IDACyberForm.filters
+
         filters = []
         filterdir = os.path.join(ida_diskio.idadir('plugins'), 'cyber')
         if not os.path.exists(filterdir):
@@ -1162,26 +3433,83 @@ class IDACyberForm(ida_kernwin.PluginForm):
                     mod = os.path.splitext(entry)[0]
                     fmod = __import__(mod, globals(), locals(), [], 0)
                     if fmod is not None:
-                        flt = fmod.FILTER_INIT(pw)
-                        if flt is not None:
-                            filters.append((fmod, flt))
+                        filters.append(FilterInfo(fmod))
+        IDACyberForm.filters = filters
         return filters
 
+    def _load_filters(self, pw):
+        """returns a list of [FilterInfo, filter] of this window.
+        filters are created on first selection, see _get_filter()"""
+        return [[info, None] for info in self._discover_filters()]
+
+    def _get_filter(self, idx):
+        """returns the filter at 'idx', creating it if necessary. filters
+        that turn out to be unavailable are removed from the list and
+        the filter chooser, in which case None is returned"""
+        entry = self.filterlist[idx]
+        if entry[1] is None:
+            entry[1] = entry[0].create(self.pw)
+            if entry[1] is None:
+                del self.filterlist[idx]
+            if self.filterChoser is not None:
+                # editing the chooser must not select another filter meanwhile
+                blocked = self.filterChoser.blockSignals(True)
+                if entry[1] is None:
+                    self.filterChoser.removeItem(idx)
+                else:
+                    self.filterChoser.setItemText(idx, entry[0].get_label())
+                    self.filterChoser.setItemData(idx, entry[0].help, Qt.ToolTipRole)
+                self.filterChoser.blockSignals(blocked)
+        return entry[1]
+
     def _unload_filters(self):
-        for fmod, obj in self.filterlist:
-            obj.on_deactivate()
-            fmod.FILTER_EXIT()
+        for info, obj in self.filterlist:
+            if obj is not None:
+                obj.on_deactivate()
+                info.fmod.FILTER_EXIT()
+
+    def _change_screen_ea(self, ea, selection=None, immediate=False):
+        self.pw.set_addr(ea, new_cursor=ea + self.pw.get_cursor_offset(),
+            immediate=immediate, selection=selection)
+        # TODO
+        self._update_widget()
+
+    def _get_sync_priority(self):
+        """0 if the window has the focus, 1 if it is visible, 2 otherwise"""
+        if self.pw.hasFocus() or (self.parent.isActiveWindow() and self.pw.is_visible()):
+            return 0
+        return 1 if self.pw.is_visible() else 2
+
+    @staticmethod
+    def _sync_windows():
+        """moves all synchronized windows to the screen ea. the screen ea
+        and the selection are read once, the bytes of all windows are
+        fetched in one go, then the windows are rendered in the order of
+        their priority, the focused one immediately"""
+        forms = [frm for frm in IDACyberForm.instances.values()
+            if frm.clean_init and frm.pw.get_sync_state()]
+        if not forms:
+            return
 
-    def _change_screen_ea(self):
-        if self.pw.get_sync_state():
-            ea = ida_kernwin.get_screen_ea()
-            self.pw.set_addr(ea, new_cursor=ea + self.pw.get_cursor_offset())
-            # TODO
-            self._update_widget()
+        ea = ida_kernwin.get_screen_ea()
+        selection = ida_kernwin.read_range_selection(None)
+        addr = selection[1] if selection[0] else ea
+        forms = sorted((frm._get_sync_priority(), i, frm) for i, frm in enumerate(forms))
+        count = max(frm.pw.get_pixel_qty() for _, _, frm in forms)
+        SharedCache.get().bytes.prefetch(addr, count)
+        for priority, _, frm in forms:
+            frm._change_screen_ea(ea, selection, immediate=priority == 0)
 
     def _select_filter(self, idx):
-        self.pw.set_filter(self.filterlist[idx][1], idx)
-        self.pw.repaint()
+        while idx >= 0:
+            flt = self._get_filter(idx)
+            if flt is not None:
+                self.pw.set_filter(flt, idx)
+                self.pw.request_frame()
+                return
+            # the filter is unavailable and has been removed, try the one
+            # that has taken its place
+            idx = self.filterChoser.currentIndex()
 
     def _select_next_filter(self):
         next_idx = (self.pw.get_filter_idx() + 1) % len(self.filterlist)
@@ -1204,16 +3532,22 @@ class IDACyberForm(ida_kernwin.PluginForm):
                 title = 'IDACyber [%d]' % i
                 caption = title
                 IDACyberForm.windows.append(i)
+                IDACyberForm.instances[i] = self
                 self.windowidx = i
                 break        
         return ida_kernwin.plgform_show(self.__clink__, self, caption, options)
 
     def OnClose(self, options):
-        if self.clean_init and IDACyberForm.hook is not None:
-                IDACyberForm.hook.new_ea.disconnect(self._change_screen_ea)
-
         IDACyberForm.windows.remove(self.windowidx)
+        IDACyberForm.instances.pop(self.windowidx, None)
+        self.pw.worker.stop()
+        self.pw.progressive.stop()
+        self.pw.sync_policy.cancel()
+        self.pw.engine.tiles.clear()
+        if self.pw.recorder is not None:
+            self.pw.stop_recording()
         self._unload_filters()
+        AnimationClock.get().unregister_all(self.pw)
         unhighlight_item()
 
         # once all idacyber forms are closed
@@ -1224,8 +3558,16 @@ class IDACyberForm(ida_kernwin.PluginForm):
             if IDACyberForm.ui_hook:
                 IDACyberForm.ui_hook.unhook()
                 IDACyberForm.ui_hook = None
+            if IDACyberForm.idb_hook:
+                IDACyberForm.idb_hook.unhook()
+                IDACyberForm.idb_hook = None
+            if IDACyberForm.dbg_hook:
+                IDACyberForm.dbg_hook.unhook()
+                IDACyberForm.dbg_hook = None
+        SharedCache.get().release(self)
 
     def OnCreate(self, form):
+        start = time.perf_counter()
         self.form = form
         self.parent = self.FormToPyQtWidget(form)
 
@@ -1248,7 +3590,7 @@ class IDACyberForm(ida_kernwin.PluginForm):
         self.status.setText('Cyber, cyber!')
         hl4.addWidget(self.status)
 
-        self.pw = PixelWidget(self.parent, IDACyberForm.idbh)
+        self.pw = PixelWidget(self.parent, SharedCache.get().acquire(self).bytes)
         self.pw.setFocusPolicy(Qt.StrongFocus | Qt.WheelFocus)
 
         self.pw.statechanged.connect(self._update_widget)
@@ -1256,6 +3598,8 @@ class IDACyberForm(ida_kernwin.PluginForm):
         self.pw.prev_filter.connect(self._select_prev_filter)
 
         self.filterlist = self._load_filters(self.pw)
+        while len(self.filterlist) and self._get_filter(0) is None:
+            pass
         if not len(self.filterlist):
             ida_kernwin.warning("IDACyber: no filters found within /plugins/cyber/")
             return
@@ -1264,7 +3608,10 @@ class IDACyberForm(ida_kernwin.PluginForm):
         self.pw.set_addr(ida_kernwin.get_screen_ea())
 
         self.filterChoser = QComboBox()
-        self.filterChoser.addItems([obj.name for filter, obj in self.filterlist])
+        for i, (info, _) in enumerate(self.filterlist):
+            self.filterChoser.addItem(info.get_label())
+            if info.help:
+                self.filterChoser.setItemData(i, info.help, Qt.ToolTipRole)
         self.filterChoser.currentIndexChanged.connect(self._select_filter)
         hl.addWidget(self.filterChoser)
         hl.addStretch(1)
@@ -1277,9 +3624,8 @@ class IDACyberForm(ida_kernwin.PluginForm):
         vl.addLayout(hl4)
 
         self.parent.setLayout(vl)
-        if IDACyberForm.hook is not None:
-                IDACyberForm.hook.new_ea.connect(self._change_screen_ea)
         self.clean_init = True
+        self.open_latency = time.perf_counter() - start
         return
 
 # -----------------------------------------------------------------------
@@ -1319,6 +3665,40 @@ class IDACyberPlugin(ida_idaapi.plugin_t):
             if frm:
                 frm.Close(options = self.options)
 
+# -----------------------------------------------------------------------
+def get_stats():
+    """returns frame timings and cache statistics of all open IDACyber
+    windows as a dict that can be serialized to JSON. e.g. from the
+    IDAPython console: idacyber.get_stats()"""
+    clock = AnimationClock.clock
+    cache = SharedCache.cache
+    return {"windows": {"IDACyber [%d]" % idx: dict(frm.pw.get_stats(),
+                open_ms=frm.open_latency * 1000 if frm.open_latency is not None else None)
+            for idx, frm in IDACyberForm.instances.items() if frm.pw},
+        "cache": cache.get_stats() if cache else None,
+        "clock": clock.get_stats() if clock else None,
+        "sync": IDACyberForm.hook.get_stats() if IDACyberForm.hook else None}
+
+def dump_stats(fname):
+    """writes the output of get_stats() to the JSON file 'fname'"""
+    with open(fname, "w") as f:
+        json.dump(get_stats(), f, indent=2)
+
+def replay_session(fname, window=1, speed=1.0, report=None):
+    """replays a session recorded with Ctrl-Shift-R in the IDACyber window
+    titled "IDACyber [window]". frame timings are printed to the output
+    window once done and, if 'report' is given, written to that JSON file.
+    returns the SessionPlayer"""
+    frm = IDACyberForm.instances.get(window)
+    if frm is None or frm.pw is None:
+        ida_kernwin.warning('IDACyber [%d] is not open.' % window)
+        return None
+    player = SessionPlayer(frm.pw, fname, speed, report, frm)
+    # keep the player alive until it is done
+    frm.player = player
+    player.start_replay()
+    return player
+
 # -----------------------------------------------------------------------
 def PLUGIN_ENTRY():   
     return IDACyberPlugin()
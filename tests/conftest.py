@@ -0,0 +1,81 @@
+"""runs IDACyber and its filters on the stand-in IDA modules of
+bench/idastubs.py, using Qt's offscreen platform"""
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'bench'), os.path.join(ROOT_DIR, 'cyber')]
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import idastubs
+idastubs.install()
+
+from PyQt5.QtCore import QTimer, QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+app = QApplication.instance() or QApplication([])
+
+import idacyber
+from bench_filters import BenchEngine
+
+def run_events(ms):
+    """runs the Qt event loop for 'ms' milliseconds"""
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec_()
+
+@pytest.fixture
+def db():
+    """a synthetic database of mixed content, with fresh shared caches"""
+    db = idastubs.make_database('mixed', 0x40000)
+    idastubs.use(db)
+    idacyber.SharedCache.cache = None
+    yield db
+    idacyber.SharedCache.cache = None
+
+@pytest.fixture
+def bh(db):
+    return idacyber.SharedCache.get().bytes
+
+@pytest.fixture
+def ida_kernwin(monkeypatch):
+    """the stand-in ida_kernwin module, whose functions may be patched"""
+    return sys.modules['ida_kernwin']
+
+def make_engine(bh, fmod):
+    """returns a RenderEngine running the filter of module 'fmod',
+    ignoring its timers"""
+    engine = BenchEngine(bh)
+    engine.fm = fmod.FILTER_INIT(engine)
+    engine.fm.on_activate(0)
+    return engine
+
+@pytest.fixture
+def pw(bh):
+    """a PixelWidget of 64x32 pixels, see set_filter()"""
+    from PyQt5.QtWidgets import QWidget
+    pw = idacyber.PixelWidget(QWidget(), bh)
+    pw.set_zoom(1)
+    pw.resize(64, 32)
+    pw.set_addr(idastubs.DB.min_ea)
+    yield pw
+    pw.worker.stop()
+    pw.progressive.stop()
+    pw.sync_policy.cancel()
+    idacyber.AnimationClock.get().unregister_all(pw)
+    close_widget(pw)
+
+def close_widget(widget):
+    """hides and deletes 'widget', so it doesn't get painted by later tests"""
+    widget.hide()
+    widget.deleteLater()
+    run_events(0)
+
+def set_filter(pw, fmod):
+    """creates the filter of module 'fmod' for 'pw' and selects it"""
+    fm = fmod.FILTER_INIT(pw)
+    pw.set_filter(fm, 0)
+    return fm
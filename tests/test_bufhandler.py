@@ -0,0 +1,102 @@
+import pytest
+
+import idastubs
+import idacyber
+from idacyber import unpack_mask, get_runs, slice_buffers
+
+@pytest.fixture(params=["numpy", "bytes"])
+def impl(request, monkeypatch):
+    """runs a test with and without numpy"""
+    if request.param == "bytes":
+        monkeypatch.setattr(idacyber, "np", None)
+    return request.param
+
+def test_unpack_mask(impl):
+    assert unpack_mask(b'\x05\xff', 10) == b'\x01\x00\x01\x00\x00\x00\x00\x00\x01\x01'
+    assert unpack_mask(b'\x80', 8) == b'\x00' * 7 + b'\x01'
+    assert unpack_mask(b'', 0) == b''
+
+def test_get_runs(impl):
+    assert get_runs(b'') == []
+    assert get_runs(b'\x01\x01\x01') == [(True, 0, 3)]
+    assert get_runs(b'\x00') == [(False, 0, 1)]
+    assert get_runs(b'\x01\x01\x00\x01') == [(True, 0, 2), (False, 2, 3), (True, 3, 4)]
+    assert get_runs(b'\x00\x01\x01\x00\x00') == [(False, 0, 1), (True, 1, 3), (False, 3, 5)]
+
+def test_slice_buffers():
+    buffers = [(True, b'abc'), (False, b'\x00\x00'), (True, b'de')]
+    assert slice_buffers(buffers, 0, 7) == buffers
+    assert slice_buffers(buffers, 2, 6) == [(True, b'c'), (False, b'\x00\x00'), (True, b'd')]
+    assert slice_buffers(buffers, 3, 5) == [(False, b'\x00\x00')]
+
+def read(bh, ea, count):
+    """returns the bytes and the unpacked mask that 'bh' reads"""
+    buffers = bh.get_buffers(ea, count)
+    return (b''.join(buf for _, buf in buffers),
+        b''.join((b'\x01' if mapped else b'\x00') * len(buf) for mapped, buf in buffers))
+
+def test_get_buffers(db):
+    bh = idacyber.IDBBufHandler()
+    seg = db.segments[0]
+    # across the uninitialized end of the first segment and the gap after it
+    ea = seg.end_ea - 0x3000 - 5
+    count = 0x6000
+    buf, mask = db.get_bytes_and_mask(ea, count)
+    assert read(bh, ea, count) == (buf, unpack_mask(mask, len(buf)))
+    # past the end of the database
+    assert read(bh, db.max_ea - 3, 8)[0] == db.get_bytes_and_mask(db.max_ea - 3, 3)[0]
+
+def test_page_cache(db):
+    bh = idacyber.IDBBufHandler(cache_size=4 * idacyber.PAGE_SIZE)
+    ea = db.min_ea
+    bh.get_buffers(ea, 2 * idacyber.PAGE_SIZE)
+    assert (bh.hits, bh.misses) == (0, 2)
+    bh.get_buffers(ea + 0x10, 0x10)
+    assert (bh.hits, bh.misses) == (1, 2)
+    # least recently used pages are dropped first
+    bh.get_buffers(ea + 2 * idacyber.PAGE_SIZE, 3 * idacyber.PAGE_SIZE)
+    assert list(bh.pages) == [ea + i * idacyber.PAGE_SIZE for i in (0, 2, 3, 4)]
+    bh.set_cache_size(2 * idacyber.PAGE_SIZE)
+    assert bh.get_cache_stats()['pages'] == 2
+
+def test_invalidate(db):
+    bh = idacyber.IDBBufHandler()
+    ea = db.min_ea
+    bh.get_buffers(ea, 4 * idacyber.PAGE_SIZE)
+    generation = bh.generation
+    bh.invalidate(ea + idacyber.PAGE_SIZE + 1, ea + idacyber.PAGE_SIZE + 2)
+    assert bh.generation > generation
+    assert ea + idacyber.PAGE_SIZE not in bh.pages
+    assert len(bh.pages) == 3
+    generation = bh.generation
+    bh.invalidate()
+    assert bh.generation > generation
+    assert not bh.pages
+
+def test_prefetch(db):
+    bh = idacyber.IDBBufHandler(cache_size=8 * idacyber.PAGE_SIZE)
+    ea = db.min_ea
+    bh.prefetch(ea, 16 * idacyber.PAGE_SIZE)
+    # never more than half of the cache, so prefetching doesn't evict what's shown
+    assert list(bh.pages) == [ea + i * idacyber.PAGE_SIZE for i in range(4)]
+    bh.get_buffers(ea, 4 * idacyber.PAGE_SIZE)
+    assert (bh.hits, bh.misses) == (4, 0)
+
+def test_get_base(db):
+    bh = idacyber.IDBBufHandler()
+    for seg in db.segments:
+        assert bh.get_base(seg.start_ea) == seg.start_ea
+        assert bh.get_base(seg.end_ea - 1) == seg.start_ea
+        # the gap after the segment
+        assert bh.get_base(seg.end_ea) == idastubs.BADADDR
+    assert bh.get_base(db.min_ea - 1) == idastubs.BADADDR
+
+def test_invalidate_segments(db):
+    bh = idacyber.IDBBufHandler()
+    seg = db.segments[1]
+    assert bh.get_base(seg.start_ea) == seg.start_ea
+    idastubs.use(idastubs.Database(db.segments[:1]))
+    # the index is kept until the segments are known to have changed
+    assert bh.get_base(seg.start_ea) == seg.start_ea
+    bh.invalidate_segments()
+    assert bh.get_base(seg.start_ea) == idastubs.BADADDR
@@ -0,0 +1,113 @@
+import pytest
+
+import idastubs
+import idacyber
+from idacyber import SharedCache, IDBHook, DbgMemHook
+from conftest import set_filter, run_events
+
+import mountain
+import xrefsto
+
+class Insn():
+    def __init__(self, ea, size):
+        self.ea = ea
+        self.size = size
+
+def count_calls(fm, name):
+    calls = []
+    func = getattr(fm, name)
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return func(*args, **kwargs)
+    setattr(fm, name, wrapper)
+    return calls
+
+def test_metadata_generation(db):
+    cache = SharedCache.get()
+    hook = IDBHook(cache)
+    generation = cache.meta.generation
+    hook.make_code(Insn(db.min_ea, 2))
+    assert cache.meta.generation > generation
+    generation = cache.meta.generation
+    hook.func_added(None)
+    assert cache.meta.generation > generation
+
+@pytest.mark.parametrize("event, args", [("dbg_bpt", (1, 0)), ("dbg_step_into", ()),
+    ("dbg_step_over", ()), ("dbg_run_to", (1, 1, 0)), ("dbg_request_error", (0, 0))])
+def test_debugger_write_invalidates_bytes(db, event, args):
+    cache = SharedCache.get()
+    seg = db.segments[0]
+    ea = seg.start_ea + 0x1234
+    before = cache.bytes.get_buffers(ea, 1)
+    # the debuggee writes to its memory
+    seg.data = seg.data[:0x1234] + bytes([seg.data[0x1234] ^ 0xFF]) + seg.data[0x1235:]
+    assert cache.bytes.get_buffers(ea, 1) == before
+    getattr(DbgMemHook(cache), event)(*args)
+    assert cache.bytes.get_buffers(ea, 1) == [(True, seg.data[0x1234:0x1235])]
+
+def test_base_frame_outdated_by_metadata(pw, db):
+    fm = set_filter(pw, xrefsto)
+    calls = count_calls(fm, "on_fill_progressive")
+    pw.paint_image(wait=True)
+    pw.paint_image(wait=True)
+    assert len(calls) == 1
+    IDBHook(SharedCache.get()).make_code(Insn(db.min_ea, 2))
+    pw.paint_image(wait=True)
+    assert len(calls) == 2
+
+def test_progressive_frame_outdated_by_metadata(pw, db):
+    fm = set_filter(pw, mountain)
+    assert fm.progressive
+    pw.paint_image()
+    while pw.progressive.steps is not None:
+        run_events(5)
+    key = pw.progressive.frame[0]
+    pw.paint_image()
+    assert pw.progressive.steps is None
+    IDBHook(SharedCache.get()).func_added(None)
+    pw.paint_image()
+    assert pw.progressive.key != key
+    assert pw.progressive.steps is not None
+
+def test_metadata_lookups(db):
+    meta = idacyber.MetadataCache()
+    seg = db.segments[0]
+    for ea in range(seg.start_ea + 0x800, seg.start_ea + 0x2800, 3):
+        head = db.get_item(ea)[0]
+        assert meta.get_item(ea) == (head, sum(db.get_item(ea)[:2]), db.get_flags(head))
+        func = db.get_func(ea)
+        assert meta.get_func_chunk(ea) == (func and (func.start_ea, func.end_ea))
+        assert meta.get_xref_count(ea) == len(db.get_xrefs_to(ea))
+    # three pages of every kind
+    assert meta.get_cache_stats()["misses"] == 9
+
+def test_metadata_invalidate(db):
+    meta = idacyber.MetadataCache()
+    for ea in range(db.min_ea, db.min_ea + 3 * idacyber.PAGE_SIZE, idacyber.PAGE_SIZE):
+        meta.get_item(ea)
+        meta.get_xref_count(ea)
+    meta.invalidate(db.min_ea + idacyber.PAGE_SIZE, db.min_ea + idacyber.PAGE_SIZE + 1, kinds=("xrefs",))
+    assert ("xrefs", db.min_ea + idacyber.PAGE_SIZE) not in meta.pages
+    assert len(meta.pages) == 5
+    meta.invalidate(kinds=("items",))
+    assert sorted(meta.pages) == [("xrefs", db.min_ea), ("xrefs", db.min_ea + 2 * idacyber.PAGE_SIZE)]
+    assert meta.size == 2 * 2 * idacyber.PAGE_SIZE
+    meta.invalidate()
+    assert not meta.pages and meta.size == 0
+
+def test_metadata_cache_size(db):
+    meta = idacyber.MetadataCache(cache_size=2 * 2 * idacyber.PAGE_SIZE)
+    for i in range(3):
+        meta.get_xref_count(db.min_ea + i * idacyber.PAGE_SIZE)
+    assert [ea for _, ea in meta.pages] == [db.min_ea + i * idacyber.PAGE_SIZE for i in (1, 2)]
+
+def test_shared_cache_released(db):
+    cache = SharedCache.get().acquire("a")
+    assert SharedCache.get().acquire("b") is cache
+    cache.bytes.get_buffers(db.min_ea, 0x10)
+    cache.meta.get_item(db.min_ea)
+    cache.release("a")
+    assert cache.bytes.pages and cache.meta.pages
+    # everything is dropped along with the last window
+    cache.release("b")
+    assert not cache.bytes.pages and not cache.meta.pages
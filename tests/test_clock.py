@@ -0,0 +1,52 @@
+import time
+
+import idacyber
+from idacyber import AnimationClock
+from conftest import run_events
+
+class Widget():
+    """stands in for a PixelWidget"""
+    def __init__(self, visible=True, busy=False):
+        self.visible = visible
+        self.busy = busy
+        self.fm = None
+
+    def is_visible(self):
+        return self.visible
+
+    def is_busy(self):
+        return self.busy
+
+def test_timers_aligned():
+    clock = AnimationClock()
+    now = time.perf_counter()
+    assert clock._get_due(100, now) == clock._get_due(100, now + 0.01)
+    due = clock._get_due(100, now)
+    assert now < due <= now + 0.1
+
+def test_hidden_and_busy_widgets_skipped():
+    clock = AnimationClock()
+    ticks = {'visible': 0, 'hidden': 0, 'busy': 0}
+    for name, pw in (('visible', Widget()), ('hidden', Widget(visible=False)), ('busy', Widget(busy=True))):
+        clock.register(pw, 10, lambda name=name: ticks.__setitem__(name, ticks[name] + 1))
+    run_events(100)
+    assert ticks['visible'] > 2
+    assert ticks['hidden'] == ticks['busy'] == 0
+    assert clock.get_stats()['skipped'] > 0
+    for timer_id in list(clock.timers):
+        clock.unregister(timer_id)
+
+def test_callback_unregisters(ida_kernwin, monkeypatch):
+    messages = []
+    monkeypatch.setattr(ida_kernwin, 'msg', messages.append)
+    clock = AnimationClock()
+    pw = Widget()
+    calls = []
+    clock.register(pw, 5, lambda: calls.append(1) or -1)
+    def fail():
+        raise ValueError('broken')
+    clock.register(pw, 5, fail)
+    run_events(50)
+    assert calls == [1]
+    assert not clock.timers
+    assert 'ValueError: broken' in messages[0]
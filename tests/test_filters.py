@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+import idastubs
+import idacyber
+from conftest import ROOT_DIR, make_engine
+
+import hubert
+
+FILTERS = sorted(os.path.splitext(entry)[0] for entry in os.listdir(os.path.join(ROOT_DIR, 'cyber'))
+    if entry.endswith('.py') and entry != '__init__.py')
+
+@pytest.mark.parametrize('name', FILTERS)
+def test_render_every_filter(bh, db, name):
+    fmod = __import__(name)
+    engine = make_engine(bh, fmod)
+    # the mixed database starts with a segment followed by a gap
+    addr = db.segments[0].end_ea - 0x800
+    colors, annotations = engine.render(addr, 64, 64 * 64, 0)
+    assert len(colors) == 64 * 64
+    assert all(c >> 24 == 0xFF for c in colors)
+
+def test_hubert_background_black(bh, db):
+    engine = make_engine(bh, hubert)
+    width, count = hubert.Hubert.width, hubert.Hubert.width * 64
+    colors, _ = engine.render(db.min_ea, width, count, 0)
+    frame = hubert.hubert[engine.fm.idx_frame]
+    start = (count // 2 - len(frame) // 2) // width * width
+    assert list(colors[start:start + len(frame)]) == [c | 0xFF000000 for c in frame]
+    # the background is opaque, not the transparency pattern
+    assert set(colors[:start]) == set(colors[start + len(frame):]) == {0xFF000000}
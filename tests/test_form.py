@@ -0,0 +1,116 @@
+import types
+
+import pytest
+from PyQt5.QtWidgets import QWidget
+
+import idacyber
+from idacyber import ColorFilter, FilterInfo, IDACyberForm
+from conftest import close_widget, run_events
+
+def make_module(name, classes, available=True):
+    """returns a filter module defining 'classes', the last of which
+    FILTER_INIT() creates"""
+    fmod = types.ModuleType(name)
+    for cls in classes:
+        cls.__module__ = name
+        setattr(fmod, cls.__name__, cls)
+    fmod.FILTER_INIT = lambda pw: classes[-1]() if available else None
+    fmod.FILTER_EXIT = lambda: None
+    return fmod
+
+def make_filter(name, **attrs):
+    return type(name.replace(' ', ''), (ColorFilter,), dict(attrs, name=name))
+
+@pytest.fixture
+def form(db, monkeypatch):
+    monkeypatch.setattr(IDACyberForm, 'FormToPyQtWidget', lambda self, form: QWidget(), raising=False)
+    def open_form(modules):
+        monkeypatch.setattr(IDACyberForm, 'filters', [FilterInfo(fmod) for fmod in modules])
+        frm = IDACyberForm()
+        frm.Show(None, 0)
+        frm.OnCreate(None)
+        forms.append(frm)
+        return frm
+    forms = []
+    yield open_form
+    for frm in forms:
+        frm.OnClose(0)
+        close_widget(frm.pw)
+
+def test_filter_info():
+    base = make_filter('Base')
+    derived = type('Derived', (base,), {'name': 'Derived', 'help': 'derived', 'threaded': True})
+    info = FilterInfo(make_module('several', [base, derived]))
+    assert info.name == 'Derived'
+    assert info.help == 'derived'
+    assert info.caps == ['threaded']
+
+def test_filter_info_name_of_created_filter():
+    a, b = make_filter('A'), make_filter('B')
+    info = FilterInfo(make_module('unrelated', [a, b]))
+    # nothing tells which of the classes FILTER_INIT() creates
+    assert info.name is None
+    assert info.get_label() == 'unrelated'
+    assert info.create(None).name == 'B'
+    assert info.name == info.get_label() == 'B'
+
+def test_filters_created_on_selection(form):
+    frm = form([make_module('a', [make_filter('A')]), make_module('b', [make_filter('B')])])
+    assert [obj is not None for _, obj in frm.filterlist] == [True, False]
+    frm.filterChoser.setCurrentIndex(1)
+    assert frm.pw.fm.name == 'B'
+    assert frm.pw.get_filter_idx() == 1
+
+def test_unavailable_filter_removed(form, monkeypatch):
+    frm = form([make_module('a', [make_filter('A')]),
+        make_module('b', [make_filter('B')], available=False),
+        make_module('c', [make_filter('C')])])
+    selected = []
+    set_filter = frm.pw.set_filter
+    monkeypatch.setattr(frm.pw, 'set_filter', lambda fm, idx: (selected.append(fm.name), set_filter(fm, idx)))
+    changes = []
+    frm.filterChoser.currentIndexChanged.connect(changes.append)
+    frm.filterChoser.setCurrentIndex(1)
+    # removing B from the chooser doesn't select a filter by itself
+    assert changes == [1]
+    assert selected == ['C']
+    assert frm.pw.get_filter_idx() == 1
+    assert [frm.filterChoser.itemText(i) for i in range(frm.filterChoser.count())] == ['A', 'C']
+    assert [info.name for info, _ in frm.filterlist] == ['A', 'C']
+
+def test_restore_state_by_name(form, tmp_path):
+    base = make_filter('Base')
+    derived = type('Derived', (base,), {'name': 'Derived'})
+    frm = form([make_module('a', [make_filter('A')]),
+        make_module('several', [base, derived])])
+    state = dict(idacyber.get_view_state(frm.pw), filter='Derived', type='state')
+    session = tmp_path / 'session.jsonl'
+    session.write_text(idacyber.json.dumps(state) + '\n')
+    player = idacyber.SessionPlayer(frm.pw, str(session), form=frm)
+    player._restore_state(player.state)
+    assert frm.pw.fm.name == 'Derived'
+
+def test_screen_ea_changes_batched(form, ida_kernwin, monkeypatch):
+    modules = [make_module('a', [make_filter('A')])]
+    forms = [form(modules) for _ in range(3)]
+    reads = []
+    monkeypatch.setattr(ida_kernwin, 'read_range_selection', lambda *args: reads.append(1) or (False, 0, 0))
+    calls = []
+    for i, frm in enumerate(forms):
+        frm.pw.set_sync_state(True)
+        # the second window has the focus, the third one is hidden
+        monkeypatch.setattr(frm, '_get_sync_priority', lambda i=i: (calls.append(i), [1, 0, 2][i])[1])
+        change = frm._change_screen_ea
+        monkeypatch.setattr(frm, '_change_screen_ea', lambda *args, i=i, change=change, **kwargs:
+            (order.append((i, kwargs['immediate'])), change(*args, **kwargs)))
+    order = []
+    hook = IDACyberForm.hook
+    for i in range(10):
+        hook.screen_ea_changed(idacyber.ida_kernwin.get_screen_ea() + i, 0)
+    # nothing happens within IDA's callback
+    assert order == []
+    run_events(10)
+    assert order == [(1, True), (0, False), (2, False)]
+    assert len(reads) == 1
+    assert sorted(calls) == [0, 1, 2]
+    assert hook.get_stats()['coalesced'] == 9
@@ -0,0 +1,83 @@
+from array import array
+
+import pytest
+
+import idacyber
+from idacyber import FrameBuffer, TRANSPARENCY_ERR, TRANSPARENCY_DARK
+from conftest import make_engine
+
+def test_set_mapped():
+    fb = FrameBuffer(4, 2)
+    assert fb.set_mapped([(True, b'ab'), (False, b'cd'), (True, b'e')]) == 5
+    assert fb.mask == bytearray(b'\x01\x01\x00\x00\x01\x00\x00\x00')
+
+def test_apply_transparency():
+    fb = FrameBuffer(4, 2)
+    fb.set_mapped([(True, b'ab'), (False, b'cd'), (True, b'ef')])
+    fb.colors[:] = array('I', range(1, 9))
+    fb.apply_transparency(6)
+    assert fb.count == 6
+    dark = fb.get_pattern(TRANSPARENCY_DARK)
+    err = fb.get_pattern(TRANSPARENCY_ERR)
+    # opaque pixels are kept, with alpha set
+    assert [c & 0xFFFFFF for c in fb.colors[:2]] == [1, 2]
+    assert list(fb.colors[2:4]) == [c | 0xFF000000 for c in dark[2:4]]
+    assert list(fb.colors[6:]) == [c | 0xFF000000 for c in err[6:]]
+    assert all(c >> 24 == 0xFF for c in fb.colors)
+
+def test_apply_transparency_capacity():
+    # filters are passed all bytes of a selection larger than the canvas
+    fb = FrameBuffer(4, 4, capacity=100)
+    fb.set_mapped([(True, bytes(100))])
+    fb.apply_transparency(100)
+    assert len(fb.colors) == len(fb.mask) == fb.size == 16
+    assert fb.count == 16
+    assert fb.get_image().width() == 4
+
+def test_apply_overlay():
+    fb = FrameBuffer(4, 1)
+    fb.set_mapped([(True, b'ab'), (False, b'cd')])
+    fb.apply_transparency(4)
+    before = fb.colors[2]
+    fb.apply_overlay([(1, [0x123456, 0x654321])])
+    assert fb.colors[1] == 0xFF123456
+    # transparent pixels aren't drawn onto
+    assert fb.colors[2] == before
+
+def test_copy():
+    fb = FrameBuffer(2, 2)
+    fb2 = fb.copy()
+    fb2.colors[0] = 1
+    assert fb.colors[0] == 0
+
+@pytest.mark.parametrize('name', ['autoxor', 'histogram', 'NES'])
+def test_selection_larger_than_canvas(bh, db, name):
+    fmod = __import__(name)
+    engine = make_engine(bh, fmod)
+    engine.width = 16
+    engine.count = 256
+    for _ in range(2):
+        buffers, fb = engine.render_view(db.min_ea, 5000, 16, 16, 0)
+        assert len(fb.colors) == 256
+        assert fb.get_image().width() == 16
+
+@pytest.mark.parametrize("impl", ["numpy", "bytes"])
+def test_lut_fill(monkeypatch, impl):
+    if impl == "bytes":
+        monkeypatch.setattr(idacyber, "np", None)
+    lut = idacyber.ColorLUT([0xFF000000 | c << 16 | 0x100 | c for c in range(256)])
+    colors = array('I', [7] * 6)
+    lut.fill([(True, b'\x00\x01'), (False, b'\x02'), (True, b'\xfe\xff')], colors)
+    # unmapped bytes are left alone
+    assert list(colors) == [0xFF000100, 0xFF010101, 7, 0xFFFE01FE, 0xFFFF01FF, 7]
+
+def test_get_lut():
+    import xor
+    fm = xor.FILTER_INIT(None)
+    lut = fm.get_lut()
+    assert fm.get_lut() is lut
+    assert [lut[c] for c in (0, 0x12)] == [fm.on_get_color(0), fm.on_get_color(0x12)]
+    # rebuilt once the filter's parameters change
+    fm.key = 0x12
+    assert fm.get_lut() is not lut
+    assert fm.get_lut()[0x12] == lut[0]
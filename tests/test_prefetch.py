@@ -0,0 +1,60 @@
+import idacyber
+from conftest import set_filter, make_engine, run_events
+
+import ascii
+import heatmap
+
+def show(pw, fmod):
+    """selects the filter of module 'fmod' and paints the first frame,
+    which sets the number of pixels of 'pw'"""
+    set_filter(pw, fmod)
+    pw.paint_image(wait=True)
+    # frames scheduled meanwhile would be taken for a jump
+    run_events(10)
+    return pw.get_pixel_qty()
+
+def scroll(pw, addr, steps):
+    """reports 'steps' frames, one view apart, to the prefetcher of 'pw'"""
+    size = pw.get_pixel_qty()
+    for i in range(steps):
+        pw.prefetcher.on_frame(addr + i * size, size)
+    return addr + (steps - 1) * size
+
+def test_prefetch_bytes_ahead(pw, db, bh):
+    size = show(pw, heatmap)
+    addr = scroll(pw, db.min_ea + 0x8000, 3)
+    bh.invalidate()
+    assert pw.prefetcher.queue and not any(render for render, _ in pw.prefetcher.queue)
+    run_events(10)
+    assert not pw.prefetcher.queue
+    ahead = addr + size
+    assert ahead - ahead % idacyber.PAGE_SIZE in bh.pages
+
+def test_turning_around_resets(pw, db):
+    size = show(pw, heatmap)
+    addr = scroll(pw, db.min_ea + 0x8000, 3)
+    assert pw.prefetcher.queue
+    pw.prefetcher.on_frame(addr - size, size)
+    assert not pw.prefetcher.queue
+    assert pw.prefetcher.direction == -1
+
+def test_prefetch_frames(pw, db, bh):
+    size = show(pw, ascii)
+    width = pw.get_pixel_qty_per_line()
+    addr = scroll(pw, db.min_ea + 0x8000, 3)
+    run_events(10)
+    frame = pw.prefetcher.take_frame(addr + size, width, size // width)
+    assert frame is not None
+    # a frame is handed out once
+    assert pw.prefetcher.take_frame(addr + size, width, size // width) is None
+
+    _, expected = make_engine(bh, ascii).render_frame(addr + size, size, width, size // width, pw.mouseOffs)
+    assert frame[1].colors == expected.colors
+
+def test_prefetched_frames_outdated(pw, db, bh):
+    size = show(pw, ascii)
+    width = pw.get_pixel_qty_per_line()
+    addr = scroll(pw, db.min_ea + 0x8000, 3)
+    run_events(10)
+    bh.invalidate(addr, addr + 1)
+    assert pw.prefetcher.take_frame(addr + size, width, size // width) is None
@@ -0,0 +1,288 @@
+import time
+import threading
+
+import pytest
+from PyQt5.QtCore import Qt, QEvent, QPointF
+from PyQt5.QtGui import QMouseEvent
+
+import idastubs
+import idacyber
+from conftest import set_filter, make_engine, run_events
+
+import vrop
+import mov
+import mountain
+import NES
+import xor
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        run_events(5)
+    return condition()
+
+def test_threaded_filters_use_render_worker(pw, db):
+    fm = set_filter(pw, vrop)
+    assert fm.threaded and fm.progressive
+    # the preview is shown while the snapshot of the first frame is taken
+    pw.paint_image()
+    assert pw.worker.frame[0] == (fm,) and pw.worker.snapshot is not None
+    key = pw.worker.key
+    assert wait_for(lambda: pw.worker.frame[0] == key)
+    assert pw.worker.thread is not None
+
+    pw.set_addr(db.min_ea + 0x100)
+    pw.paint_image()
+    key = pw.worker.key
+    assert wait_for(lambda: pw.worker.frame[0] == key)
+
+def test_worker_matches_synchronous_rendering(pw, db, bh):
+    set_filter(pw, mov)
+    addr = db.min_ea + 0x200
+    pw.paint_image()
+    pw.set_addr(addr)
+    pw.paint_image()
+    key = pw.worker.key
+    assert wait_for(lambda: pw.worker.frame[0] == key)
+    _, fb = pw.worker.frame[1]
+
+    engine = make_engine(bh, mov)
+    _, expected = engine.render_frame(addr, fb.size, fb.width, fb.height, pw.mouseOffs)
+    assert fb.colors == expected.colors
+
+def test_progressive_matches_synchronous_rendering(pw, db, bh):
+    fm = set_filter(pw, mountain)
+    assert fm.progressive and not fm.threaded
+    pw.paint_image()
+    assert wait_for(lambda: pw.progressive.steps is None)
+    _, fb = pw.progressive.frame[1]
+
+    engine = make_engine(bh, mountain)
+    _, expected = engine.render_frame(db.min_ea, fb.size, fb.width, fb.height, pw.mouseOffs)
+    assert fb.colors == expected.colors
+
+def test_render(bh, db):
+    engine = make_engine(bh, NES)
+    colors, annotations = engine.render(db.min_ea, 16, 100)
+    assert len(colors) == 100
+    # rendering the same view again reuses the previous frame
+    assert engine.render(db.min_ea, 16, 100)[0] == colors
+
+class Failing(idacyber.ColorFilter):
+    name = 'Failing'
+    progressive = True
+
+    def __init__(self, error):
+        self.error = error
+
+    def on_fill_progressive(self, buffers, addr, size, mouse_offs, colors, mask):
+        yield 1
+        raise self.error
+
+def test_progressive_failure_keeps_partial_frame(pw, db, ida_kernwin, monkeypatch):
+    messages = []
+    monkeypatch.setattr(ida_kernwin, 'msg', messages.append)
+    pw.set_filter(Failing(ValueError('broken')), 0)
+    pw.paint_image()
+    assert wait_for(lambda: pw.progressive.steps is None)
+    assert pw.progressive.frame is not None
+    assert 'ValueError: broken' in messages[0]
+
+def test_progressive_does_not_swallow_interrupts(pw, db):
+    pw.set_filter(Failing(KeyboardInterrupt()), 0)
+    pw.paint_image()
+    # raising from the timer's slot would abort
+    pw.progressive.timer.stop()
+    with pytest.raises(KeyboardInterrupt):
+        for _ in range(3):
+            pw.progressive._work()
+
+def test_snapshot_results_published_on_main_thread(pw, db, bh):
+    fm = set_filter(pw, vrop)
+    width = pw.get_pixel_qty_per_line()
+    job = pw.engine.prepare_frame(db.min_ea, 4096, width, 4096 // width, 0)
+    fm.ret_locs = before = []
+    thread = threading.Thread(target=job.run)
+    thread.start()
+    thread.join()
+    # the worker thread leaves the filter alone
+    assert fm.ret_locs is before and fm.glow is None
+    job.publish()
+    assert fm.ret_locs and fm.ret_locs == job.snapshot["ret_locs"]
+    assert fm.glow[0] is job.buffers
+
+def test_stale_worker_results_not_published(pw, db):
+    fm = set_filter(pw, mov)
+    pw.paint_image()
+    pw.set_addr(db.min_ea + 0x100)
+    pw.paint_image()
+    # the view moves on before the worker is done
+    pw.set_addr(db.min_ea + 0x200)
+    pw.paint_image()
+    key = pw.worker.key
+    assert wait_for(lambda: pw.worker.frame[0] == key)
+    buffers = pw.worker.frame[1][0]
+    addr = db.min_ea + 0x200
+    expected = [ea for _, _, ea in fm.annotations]
+    assert expected
+    assert all(addr <= ea < addr + sum(len(buf) for _, buf in buffers) for ea in expected)
+
+def release(pw, button):
+    """sends the release of mouse button 'button' to 'pw'"""
+    pw.mouseReleaseEvent(QMouseEvent(QEvent.MouseButtonRelease, QPointF(1, 1), button, button, Qt.NoModifier))
+
+def test_click_keeps_frames_in_flight(pw, db, ida_kernwin, monkeypatch):
+    monkeypatch.setattr(ida_kernwin, 'jumpto', lambda *args: True)
+    set_filter(pw, mountain)
+    pw.paint_image()
+    steps = pw.progressive.steps
+    assert steps is not None
+    release(pw, Qt.LeftButton)
+    assert pw.progressive.steps is steps
+
+def test_click_changing_state_discards_frames(pw, db, ida_kernwin, monkeypatch):
+    monkeypatch.setattr(ida_kernwin, 'jumpto', lambda *args: True)
+    fm = set_filter(pw, xor)
+    pw.paint_image(wait=True)
+    assert pw.base_frame is not None
+    release(pw, Qt.LeftButton)
+    assert pw.base_frame is not None
+    # picks the byte under the cursor as the key
+    fm.key = idastubs.DB.get_byte(pw.get_cursor_address()) ^ 1
+    release(pw, Qt.RightButton)
+    assert pw.base_frame is None
+
+def count_filled(fm):
+    """returns a list that receives the number of bytes of every call
+    to the on_fill_buffer() method of 'fm'"""
+    counts = []
+    fill = fm.on_fill_buffer
+    def wrapper(buffers, *args):
+        counts.append(sum(len(buf) for _, buf in buffers))
+        return fill(buffers, *args)
+    fm.on_fill_buffer = wrapper
+    return counts
+
+@pytest.mark.parametrize("delta", [10, -10, 300])
+def test_scroll_frame(bh, db, delta):
+    engine = make_engine(bh, xor)
+    counts = count_filled(engine.fm)
+    # the view crosses the uninitialized end of the first segment and the gap after it
+    addr = db.segments[0].end_ea - 0x600
+    engine.render_view(addr, 32 * 16, 32, 16)
+    del counts[:]
+    buffers, fb = engine.scroll_frame(addr + delta, 32, 16)
+    assert counts == [abs(delta)]
+
+    _, expected = make_engine(bh, xor).render_frame(addr + delta, 32 * 16, 32, 16)
+    assert fb.colors == expected.colors
+    assert fb.mask == expected.mask
+
+def test_scroll_frame_outdated(bh, db):
+    engine = make_engine(bh, xor)
+    engine.render_view(db.min_ea, 32 * 16, 32, 16)
+    # the bytes changed
+    bh.invalidate(db.min_ea, db.min_ea + 1)
+    assert engine.scroll_frame(db.min_ea + 1, 32, 16) is None
+    # jumped farther than a view
+    engine.render_view(db.min_ea, 32 * 16, 32, 16)
+    assert engine.scroll_frame(db.min_ea + 32 * 16, 32, 16) is None
+    # the geometry changed
+    assert engine.scroll_frame(db.min_ea + 1, 16, 32) is None
+
+def test_render_tiles(bh, db):
+    engine = make_engine(bh, xor)
+    counts = count_filled(engine.fm)
+    addr = db.min_ea + 0x800
+    buffers, fb = engine.render_tiles(addr, 64, 64)
+    # the view spans two tiles
+    assert counts == [idacyber.TILE_SIZE] * 2
+    _, expected = make_engine(bh, xor).render_frame(addr, 64 * 64, 64, 64)
+    assert fb.colors == expected.colors
+    assert fb.mask == expected.mask
+
+    engine.render_tiles(addr + 0x100, 64, 64)
+    assert len(counts) == 2
+    assert engine.tiles.get_stats()["hits"] == 2
+
+def test_tiles_outdated(bh, db):
+    engine = make_engine(bh, xor)
+    engine.render_tiles(db.min_ea, 64, 64)
+    assert len(engine.tiles.tiles) == 1
+    # the filter's parameters changed
+    engine.fm.key = 0x12
+    engine.render_tiles(db.min_ea, 64, 64)
+    assert engine.tiles.get_stats()["misses"] == 2
+    assert list(engine.tiles.tiles) == [(engine.fm, 0x12, db.min_ea)]
+    # the bytes changed
+    bh.invalidate(db.min_ea, db.min_ea + 1)
+    engine.render_tiles(db.min_ea, 64, 64)
+    assert engine.tiles.get_stats()["misses"] == 3
+
+def test_tile_cache_lru():
+    tiles = idacyber.TileCache(2 * 5 * idacyber.TILE_SIZE)
+    tiles.put(1, 'a')
+    tiles.put(2, 'b')
+    assert tiles.get(1) == 'a'
+    tiles.put(3, 'c')
+    assert list(tiles.tiles) == [1, 3]
+    assert tiles.get(2) is None
+    assert tiles.get_stats()["hit_rate"] == 0.5
+
+class Sliced(idacyber.ColorFilter):
+    name = 'Sliced'
+    threaded = True
+    progressive = True
+
+    def __init__(self, pw=None):
+        # threads the snapshot was taken on
+        self.threads = set()
+
+    def on_snapshot_progressive(self, buffers, addr, size, mouse_offs):
+        sums = []
+        for _, buf in buffers:
+            for i in range(0, len(buf), 0x100):
+                self.threads.add(threading.get_ident())
+                sums.append(sum(buf[i:i + 0x100]))
+                time.sleep(idacyber.PROGRESSIVE_BUDGET / 2)
+                yield
+        return sums
+
+    def on_fill_snapshot(self, snapshot, buffers, addr, size, mouse_offs, colors, mask):
+        for i in range(len(colors)):
+            colors[i] = snapshot[i // 0x100 % len(snapshot)]
+
+def test_progressive_snapshot_taken_in_slices(pw, db, bh):
+    fm = Sliced()
+    pw.set_filter(fm, 0)
+    pw.paint_image()
+    addr = db.min_ea + 0x100
+    pw.set_addr(addr)
+    pw.paint_image()
+    # the snapshot isn't taken while painting
+    assert pw.worker.snapshot is not None and pw.worker.job is None
+    assert pw.is_busy()
+    pw.worker.timer.stop()
+    pw.worker._take_snapshot()
+    assert pw.worker.snapshot is not None
+    key = pw.worker.key
+    pw.worker.timer.start(0)
+    assert wait_for(lambda: pw.worker.frame[0] == key)
+    assert fm.threads == {threading.get_ident()}
+    _, fb = pw.worker.frame[1]
+
+    _, expected = idacyber.RenderEngine(bh, Sliced()).render_frame(addr, fb.size, fb.width, fb.height, pw.mouseOffs)
+    assert fb.colors == expected.colors
+
+def test_view_change_cancels_snapshot(pw, db):
+    pw.set_filter(Sliced(), 0)
+    pw.paint_image()
+    pw.set_addr(db.min_ea + 0x100)
+    pw.paint_image()
+    job, steps = pw.worker.snapshot
+    cancelled = pw.worker.cancelled
+    pw.set_addr(db.min_ea + 0x200)
+    pw.paint_image()
+    assert steps.gi_frame is None
+    assert pw.worker.snapshot[0] is not job
+    assert pw.worker.cancelled == cancelled + 1
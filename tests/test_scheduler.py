@@ -0,0 +1,97 @@
+import pytest
+
+import idacyber
+from idacyber import FrameScheduler
+from conftest import run_events
+
+class Widget():
+    """counts the repaints a scheduler asks for"""
+    def __init__(self):
+        self.updates = 0
+        self.repaints = 0
+
+    def update(self):
+        self.updates += 1
+
+    def repaint(self):
+        self.repaints += 1
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(idacyber, "MAX_FPS", 20)
+    scheduler = FrameScheduler(Widget())
+    yield scheduler
+    scheduler.timer.stop()
+
+def test_requests_coalesced(scheduler):
+    for _ in range(3):
+        scheduler.request_frame()
+    assert scheduler.pending
+    run_events(80)
+    assert scheduler.pw.updates == 1
+    assert scheduler.get_stats() == {"requested": 3, "frames": 0, "dropped": 2, "late": 0}
+
+def test_frame_rate_limited(scheduler):
+    start = scheduler.begin_frame()
+    scheduler.end_frame(start)
+    scheduler.request_frame()
+    # the next frame is due 1/MAX_FPS seconds after the previous one
+    assert scheduler.timer.remainingTime() > 20
+    run_events(10)
+    assert scheduler.pw.updates == 0
+    run_events(60)
+    assert scheduler.pw.updates == 1
+
+def test_immediate_frame(scheduler):
+    scheduler.request_frame()
+    scheduler.request_frame(immediate=True)
+    assert scheduler.pw.repaints == 1
+    assert not scheduler.pending and not scheduler.timer.isActive()
+
+def test_late_frames(scheduler):
+    scheduler.end_frame(scheduler.begin_frame())
+    scheduler.end_frame(scheduler.begin_frame() - 1.0)
+    assert scheduler.get_stats()["frames"] == 2
+    assert scheduler.get_stats()["late"] == 1
+
+@pytest.fixture
+def sync(monkeypatch, ida_kernwin):
+    """a SyncPolicy that collects the addresses jumped to"""
+    monkeypatch.setattr(idacyber, "SYNC_DEBOUNCE_MS", 30)
+    monkeypatch.setattr(idacyber, "SYNC_MAX_RATE", 10)
+    jumps = []
+    monkeypatch.setattr(ida_kernwin, "jumpto", lambda ea, *args: jumps.append(ea))
+    sync = idacyber.SyncPolicy(None)
+    sync.jumped = jumps
+    yield sync
+    sync.timer.stop()
+
+def test_jumps_debounced(sync):
+    for ea in range(3):
+        sync.request_jump(ea)
+    assert sync.jumped == []
+    run_events(80)
+    assert sync.jumped == [2]
+    assert sync.get_stats() == {"requested": 3, "jumps": 1, "elided": 2}
+
+def test_jumps_throttled(sync):
+    # input that never settles still moves IDA's views at SYNC_MAX_RATE
+    for ea in range(30):
+        sync.request_jump(ea)
+        run_events(10)
+    assert 1 <= len(sync.jumped) <= 4
+    assert sync.jumped == sorted(sync.jumped)
+
+def test_final_jump(sync):
+    sync.request_jump(1)
+    sync.request_jump(2, final=True)
+    assert sync.jumped == [2]
+    assert not sync.timer.isActive()
+    assert sync.get_stats()["elided"] == 1
+
+def test_jump_cancelled(sync):
+    sync.request_jump(1)
+    sync.cancel()
+    run_events(80)
+    assert sync.jumped == []
+    assert sync.get_stats() == {"requested": 1, "jumps": 0, "elided": 1}
@@ -0,0 +1,78 @@
+import json
+
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF
+from PyQt5.QtGui import QKeyEvent, QWheelEvent
+from PyQt5.QtWidgets import QApplication
+
+import idacyber
+from idacyber import SessionPlayer, dict_to_event, event_to_dict
+from conftest import set_filter, run_events
+
+import NES
+
+CTRL_SHIFT = Qt.ControlModifier | Qt.ShiftModifier
+
+def key(pw, etype, key, modifiers=Qt.NoModifier, autorep=False):
+    QApplication.sendEvent(pw, QKeyEvent(etype, key, modifiers, '', autorep))
+
+def shortcut(pw):
+    """presses and releases Ctrl-Shift-R"""
+    key(pw, QEvent.KeyPress, Qt.Key_Control, Qt.ControlModifier)
+    key(pw, QEvent.KeyPress, Qt.Key_Shift, CTRL_SHIFT)
+    key(pw, QEvent.KeyPress, Qt.Key_R, CTRL_SHIFT)
+    key(pw, QEvent.KeyRelease, Qt.Key_R, CTRL_SHIFT)
+    key(pw, QEvent.KeyRelease, Qt.Key_Shift, Qt.ControlModifier)
+    key(pw, QEvent.KeyRelease, Qt.Key_Control)
+
+def wheel(pw, delta=-120):
+    pos = QPointF(5, 5)
+    QApplication.sendEvent(pw, QWheelEvent(pos, pos, QPoint(), QPoint(0, delta),
+        Qt.NoButton, Qt.NoModifier, Qt.NoScrollPhase, False))
+
+def read_session(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_event_round_trip():
+    event = QKeyEvent(QEvent.KeyPress, Qt.Key_PageDown, Qt.ShiftModifier, '', True)
+    d = event_to_dict(event)
+    assert event_to_dict(dict_to_event(d)) == d
+
+def test_record_leaves_out_shortcut(pw, db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    set_filter(pw, NES)
+    shortcut(pw)
+    assert pw.recorder is not None
+    key(pw, QEvent.KeyPress, Qt.Key_R)
+    key(pw, QEvent.KeyRelease, Qt.Key_R)
+    key(pw, QEvent.KeyPress, Qt.Key_Control, Qt.ControlModifier)
+    wheel(pw, 120)
+    key(pw, QEvent.KeyRelease, Qt.Key_Control)
+    shortcut(pw)
+    assert pw.recorder is None
+
+    records = read_session(tmp_path / 'IDACyber_session_0000.jsonl')
+    assert records[0]['type'] == records[-1]['type'] == 'state'
+    events = [(r['type'], r.get('key')) for r in records[1:-1]]
+    # R on its own is recorded, the modifiers of both shortcuts aren't
+    assert events == [('key_press', Qt.Key_R), ('key_release', Qt.Key_R),
+        ('key_press', Qt.Key_Control), ('wheel', None), ('key_release', Qt.Key_Control)]
+
+def test_replay_restores_keys(pw, db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    set_filter(pw, NES)
+    shortcut(pw)
+    for _ in range(3):
+        wheel(pw)
+    addr = pw.get_address()
+    shortcut(pw)
+    assert pw.key is None
+
+    pw.set_addr(db.min_ea)
+    player = SessionPlayer(pw, str(tmp_path / 'IDACyber_session_0000.jsonl'), speed=100.0)
+    player.start_replay()
+    while player.result is None or 'events' not in player.result:
+        run_events(10)
+    assert pw.key is None
+    assert pw.get_address() == addr
+    assert not player.result['diverged']